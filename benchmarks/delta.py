@@ -0,0 +1,74 @@
+"""
+Measures how fast Chunker splits a file into content-defined chunks, against
+rolling the hash one byte at a time in Python, and checks that both find the
+same chunks.
+
+    $ python -m benchmarks.delta [megabytes]
+"""
+
+import io
+import random
+import sys
+import time
+
+from poster.delta import Chunker
+
+
+def rolling_cuts(chunker, data):
+    """
+    Splits ``data`` by rolling the hash a byte at a time
+
+    :rtype: list
+    """
+
+    cuts = []
+    start = 0
+
+    while start < len(data):
+        limit = min(len(data), start + chunker.max_size)
+        end = limit
+        h = 0
+
+        for position in range(start + chunker.min_size, limit):
+            h = ((h << 1) + chunker.gear[data[position]]) & 0xFFFFFFFF
+
+            if not h & chunker.mask:
+                end = position + 1
+                break
+
+        cuts.append(end - start)
+        start = end
+
+    return cuts
+
+
+def chunker_cuts(chunker, data):
+    return [length for _, length, _ in chunker.split(io.BytesIO(data))]
+
+
+def throughput(function, chunker, data):
+    start = time.time()
+    cuts = function(chunker, data)
+
+    return cuts, len(data) / (time.time() - start) / 1024 ** 2
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    size = int(argv[0]) if argv else 16
+
+    data = random.Random(0).getrandbits(8 * size * 1024 ** 2).to_bytes(size * 1024 ** 2, 'little')
+    chunker = Chunker()
+
+    rolling, rolling_rate = throughput(rolling_cuts, chunker, data)
+    split, split_rate = throughput(chunker_cuts, chunker, data)
+
+    if rolling != split:
+        raise SystemExit('Chunker.split() found different chunks than the rolling hash')
+
+    print('Rolling hash:    {:>8.1f} MB/s'.format(rolling_rate))
+    print('Chunker.split(): {:>8.1f} MB/s ({:.1f}x, with SHA-256)'.format(split_rate, split_rate / rolling_rate))
+
+
+if __name__ == '__main__':
+    main()
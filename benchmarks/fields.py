@@ -0,0 +1,63 @@
+"""
+Measures the memory and encoding time of forms with very many small text
+fields, built from FormData objects or from a FieldTable, and encoded as
+multipart/form-data or application/x-www-form-urlencoded.
+
+    $ python -m benchmarks.fields [fields]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from poster import Form, FormData, FieldTable
+
+
+def build_form_data(count):
+    form = Form()
+
+    for i in range(count):
+        form.add_form_data(FormData('record[{}]'.format(i), 'value {}'.format(i)))
+
+    return form
+
+
+def build_field_table(count):
+    form = Form()
+    form.add_field_table(FieldTable(('record[{}]'.format(i), 'value {}'.format(i)) for i in range(count)))
+
+    return form
+
+
+def build_urlencoded(count):
+    form = build_field_table(count)
+    form.encoding = 'urlencoded'
+
+    return form
+
+
+def measure(label, build, count):
+    tracemalloc.start()
+    form = build(count)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.time()
+    length = sum(len(block) for block in form.iter_encode())
+    elapsed = time.time() - start
+
+    print('{:<24} {:>8.0f} bytes/field {:>8.1f}ms to encode {} bytes'.format(
+        label, float(memory) / count, elapsed * 1000, length))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 50000
+
+    measure('FormData', build_form_data, count)
+    measure('FieldTable', build_field_table, count)
+    measure('FieldTable, urlencoded', build_urlencoded, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Measures the cold start cost of ``import poster``.
+
+Each sample runs a fresh interpreter, so the numbers include everything a
+short-lived process pays before it can build its first form.
+
+    $ python -m benchmarks.import_time [samples]
+"""
+
+import subprocess
+import sys
+import time
+
+
+def measure(code, samples):
+    """
+    Runs ``code`` in a fresh interpreter ``samples`` times.
+
+    :returns: The fastest wall clock time, in milliseconds
+    :rtype: float
+    """
+
+    timings = []
+
+    for _ in range(samples):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code])
+        timings.append((time.time() - start) * 1000)
+
+    return min(timings)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    samples = int(argv[0]) if argv else 20
+
+    baseline = measure('pass', samples)
+    poster = measure('import poster', samples)
+
+    print('interpreter:   {:.2f}ms'.format(baseline))
+    print('import poster: {:.2f}ms (+{:.2f}ms)'.format(poster, poster - baseline))
+
+
+if __name__ == '__main__':
+    main()
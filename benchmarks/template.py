@@ -0,0 +1,55 @@
+"""
+Compares building and encoding a new Form for every request with rendering
+a precompiled FormTemplate.
+
+    $ python -m benchmarks.template [requests]
+"""
+
+import sys
+import time
+
+from poster import Form, FormTemplate
+
+STATIC = [('field{}'.format(i), 'static value {}'.format(i)) for i in range(10)]
+
+
+def build_forms(count):
+    for i in range(count):
+        form = Form(boundary='benchmark')
+
+        for name, value in STATIC:
+            form.add_data(name, value)
+
+        form.add_data('user', str(i))
+        form.add_data('event', 'event {}'.format(i))
+
+        form.encode()
+
+
+def render_template(count):
+    template = FormTemplate(STATIC + ['user', 'event'], boundary='benchmark')
+
+    for i in range(count):
+        template.render(user=str(i), event='event {}'.format(i))
+
+
+def rate(function, count):
+    start = time.time()
+    function(count)
+
+    return count / (time.time() - start)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 20000
+
+    forms = rate(build_forms, count)
+    templates = rate(render_template, count)
+
+    print('Form.encode():         {:>10.0f} requests/s'.format(forms))
+    print('FormTemplate.render(): {:>10.0f} requests/s ({:.1f}x)'.format(templates, templates / forms))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,13 @@ Support for streaming HTTP uploads, and multipart/form-data encoding
 Copyright (c) 2016 Evan Darwin
 """
 
+from .field_table import FieldTable
 from .form import Form
 from .form_data import FormData
+from .incremental import IncrementalForm
+from .prepare import FormSpec
+from .spool import SpooledForm
+from .template import FormTemplate
 
 # -------- NOTICE --------
 # This version indicator will be deprecated in version 1.0.0
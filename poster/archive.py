@@ -0,0 +1,324 @@
+"""
+Archive sources, which stream a tar or zip archive of a directory or a list
+of files straight into a form, without writing the archive to disk first.
+
+    >>> form.add_file('backup', TarSource('/srv/data'), filename='data.tar')
+    >>> form.add_file('photos', ZipSource(['a.jpg', 'b.jpg']), filename='photos.zip')
+
+Only the files are stat()ed when the source is created. Tar archives and
+stored (uncompressed) zip archives know their exact size up front, so the
+form still has a Content-Length. A deflated zip archive can't know its size
+until it has been compressed, so its size is None and forms that contain one
+are sent with chunked transfer encoding.
+"""
+
+from .form_data import CHUNK_SIZE
+from .sources import ContentSource, _IterReader
+
+import os
+import stat
+
+# Tar archives are made of 512 byte blocks, and are padded to a whole record
+_BLOCK_SIZE = 512
+_RECORD_SIZE = 20 * _BLOCK_SIZE
+
+# The largest value that fits in the fields of a zip archive without the
+# ZIP64 extensions
+_ZIP_LIMIT = 0xFFFFFFFF
+_ZIP_MAX_ENTRIES = 0xFFFF
+
+
+class Member(object):
+    def __init__(self, path, arcname, st):
+        """
+        A file or directory in an archive
+
+        :param path:    The path on disk
+        :param arcname: The name in the archive, using / as the separator
+        :param st:      The result of stat()ing the path
+        """
+
+        self.path = path
+        self.arcname = arcname
+        self.stat = st
+        self.is_dir = stat.S_ISDIR(st.st_mode)
+        self.size = 0 if self.is_dir else st.st_size
+
+
+def collect(paths):
+    """
+    Lists the members of an archive.
+
+    ``paths`` is either the path of a directory, whose contents are stored
+    relative to it, or a list of paths and ``(path, arcname)`` tuples, which
+    are stored under their basename (or ``arcname``). Directories in the list
+    are stored with everything in them.
+
+    :rtype: list
+    """
+
+    if isinstance(paths, str):
+        if os.path.isdir(paths):
+            return _walk(paths, '')
+
+        paths = [paths]
+
+    members = []
+
+    for item in paths:
+        path, arcname = item if isinstance(item, tuple) else (item, os.path.basename(os.path.normpath(item)))
+
+        if not os.path.exists(path):
+            raise IOError('\'{}\' could not be located'.format(path))
+
+        members.append(Member(path, arcname, os.stat(path)))
+
+        if members[-1].is_dir:
+            members.extend(_walk(path, arcname + '/'))
+
+    return members
+
+
+def _walk(directory, prefix):
+    """
+    Lists everything in a directory, in a stable order
+    """
+
+    members = []
+
+    for root, directories, files in os.walk(directory):
+        directories.sort()
+
+        for name in directories + sorted(files):
+            path = os.path.join(root, name)
+            arcname = prefix + os.path.relpath(path, directory).replace(os.sep, '/')
+
+            members.append(Member(path, arcname, os.stat(path)))
+
+    return members
+
+
+def _read_member(member, chunk_size):
+    """
+    Yields the content of a file, which must still be the size it was when
+    the archive was created, since the size is already in the archive.
+    """
+
+    remaining = member.size
+
+    if member.is_dir:
+        return
+
+    with open(member.path, 'rb') as fh:
+        while remaining:
+            block = fh.read(min(chunk_size, remaining))
+
+            if not block:
+                raise IOError('\'{}\' shrank by {} bytes while it was being archived'.format(member.path, remaining))
+
+            remaining -= len(block)
+
+            yield block
+
+
+class TarSource(ContentSource):
+    def __init__(self, paths, name='archive.tar', chunk_size=CHUNK_SIZE):
+        """
+        A tar archive of a directory or a list of files, see :func:`collect`.
+        The headers are built, and the exact size is known, when the source is
+        created.
+
+        :param paths:       The directory, or the list of files, to archive
+        :param name:        The filename of the part
+        :param chunk_size:  The number of bytes to read from a file at once
+        """
+
+        import tarfile
+
+        self.name = name
+        self.chunk_size = chunk_size
+
+        self.members = collect(paths)
+        """ list: The members of the archive, in order """
+
+        self.headers = [self._header(tarfile, member) for member in self.members]
+        """ list: The encoded tar header of every member """
+
+        size = 2 * _BLOCK_SIZE
+
+        for member, header in zip(self.members, self.headers):
+            size += len(header) + _padded(member.size, _BLOCK_SIZE)
+
+        self.size = _padded(size, _RECORD_SIZE)
+
+    @staticmethod
+    def _header(tarfile, member):
+        info = tarfile.TarInfo(member.arcname)
+        info.size = member.size
+        info.mtime = int(member.stat.st_mtime)
+        info.mode = stat.S_IMODE(member.stat.st_mode)
+        info.uid = member.stat.st_uid
+        info.gid = member.stat.st_gid
+        info.type = tarfile.DIRTYPE if member.is_dir else tarfile.REGTYPE
+
+        # PAX headers handle long and non-ASCII names, and huge files
+        return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+    def _generate(self):
+        position = 0
+
+        for member, header in zip(self.members, self.headers):
+            yield header
+
+            for block in _read_member(member, self.chunk_size):
+                yield block
+
+            position += len(header) + member.size
+            padding = _padded(member.size, _BLOCK_SIZE) - member.size
+
+            if padding:
+                yield b'\0' * padding
+                position += padding
+
+        # The end of the archive, padded to a whole record
+        yield b'\0' * (self.size - position)
+
+    def open(self):
+        return _IterReader(self._generate())
+
+
+class ZipSource(ContentSource):
+    def __init__(self, paths, name='archive.zip', compress=False, level=6, chunk_size=CHUNK_SIZE):
+        """
+        A zip archive of a directory or a list of files, see :func:`collect`.
+
+        Stored archives know their exact size when the source is created,
+        deflated ones (``compress=True``) have a size of None. Archives that
+        would need the ZIP64 extensions (files or archives of 4GB or more, or
+        more than 65535 members) aren't supported.
+
+        :param paths:       The directory, or the list of files, to archive
+        :param name:        The filename of the part
+        :param compress:    Whether to deflate the files
+        :param level:       The zlib compression level, when compressing
+        :param chunk_size:  The number of bytes to read from a file at once
+        """
+
+        self.name = name
+        self.compress = compress
+        self.level = level
+        self.chunk_size = chunk_size
+
+        self.members = collect(paths)
+        """ list: The members of the archive, in order """
+
+        if len(self.members) > _ZIP_MAX_ENTRIES or any(m.size >= _ZIP_LIMIT for m in self.members):
+            raise ValueError('Archives with more than 65535 members or files of 4GB are not supported')
+
+        self.names = [self._encode_name(member) for member in self.members]
+        """ list: The encoded name of every member """
+
+        if compress:
+            self.size = None
+        else:
+            # Local header (30) + name + content + data descriptor (16), then
+            # central directory header (46) + name, then the end record (22)
+            self.size = sum(92 + 2 * len(name) + member.size for member, name in zip(self.members, self.names)) + 22
+
+            if self.size >= _ZIP_LIMIT:
+                raise ValueError('Archives of 4GB or more are not supported')
+
+    @staticmethod
+    def _encode_name(member):
+        return (member.arcname + ('/' if member.is_dir else '')).encode('utf-8')
+
+    @staticmethod
+    def _dos_time(mtime):
+        """
+        Returns the MS-DOS (time, date) of a timestamp
+        """
+
+        import time
+
+        t = time.localtime(mtime)
+
+        # MS-DOS dates start in 1980
+        if t.tm_year < 1980:
+            return 0, (1 << 5) | 1
+
+        return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+               ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+    def _generate(self):
+        import struct
+        import zlib
+
+        method = 8 if self.compress else 0
+        central = []
+        offset = 0
+
+        for member, name in zip(self.members, self.names):
+            # The sizes and CRC follow the content in a data descriptor, and
+            # names are flagged as UTF-8
+            flags = 0x08 | 0x800
+            dos_time, dos_date = self._dos_time(member.stat.st_mtime)
+
+            header = struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, flags, method, dos_time, dos_date, 0, 0, 0,
+                                 len(name), 0)
+
+            yield header + name
+
+            crc = 0
+            compressed = 0
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15) if self.compress else None
+
+            for block in _read_member(member, self.chunk_size):
+                crc = zlib.crc32(block, crc)
+
+                if compressor:
+                    block = compressor.compress(block)
+
+                if block:
+                    compressed += len(block)
+                    yield block
+
+            if compressor:
+                block = compressor.flush()
+                compressed += len(block)
+                yield block
+
+            crc &= 0xFFFFFFFF
+
+            yield struct.pack('<IIII', 0x08074b50, crc, compressed, member.size)
+
+            # Unix permissions, and the MS-DOS directory attribute
+            attributes = (member.stat.st_mode & 0xFFFF) << 16 | (0x10 if member.is_dir else 0)
+
+            central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 20, 20, flags, method,
+                                       dos_time, dos_date, crc, compressed, member.size, len(name), 0, 0, 0, 0,
+                                       attributes, offset) + name)
+
+            offset += len(header) + len(name) + compressed + 16
+
+            if offset >= _ZIP_LIMIT:
+                raise IOError('Archives of 4GB or more are not supported')
+
+        directory_size = sum(len(entry) for entry in central)
+
+        for entry in central:
+            yield entry
+
+        yield struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central), len(central), directory_size, offset, 0)
+
+    def open(self):
+        return _IterReader(self._generate())
+
+
+def _padded(size, block_size):
+    """
+    Rounds ``size`` up to a whole number of blocks
+
+    :rtype: int
+    """
+
+    return (size + block_size - 1) // block_size * block_size
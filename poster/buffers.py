@@ -0,0 +1,118 @@
+"""
+A pool of reusable buffers for reading file content with ``readinto()``,
+instead of allocating a new bytes object for every chunk.
+
+    >>> pool = BufferPool(count=8, size=1024 * 1024)
+    >>> send(url, form, pool=pool)
+    >>> pool.stats()
+
+Chunks read through a pool are ``memoryview`` slices of a pooled buffer. A
+buffer only goes back to the pool when it is released after its chunk has
+been sent, which :func:`poster.streaminghttp.send` does. Chunks that are never
+released stay valid, the pool just allocates new buffers in their place.
+"""
+
+from .form_data import CHUNK_SIZE
+
+
+class BufferPool(object):
+    def __init__(self, count=8, size=CHUNK_SIZE):
+        """
+        Preallocates ``count`` buffers of ``size`` bytes each.
+
+        :param count:   The number of buffers to keep in the pool
+        :param size:    The size of every buffer, which is also the number of
+                        bytes read from a file at once
+        """
+
+        import threading
+
+        self.count = count
+        """ int: The maximum number of free buffers kept in the pool """
+
+        self.size = size
+        """ int: The size of every buffer, in bytes """
+
+        self.free = [bytearray(size) for _ in range(count)]
+        """ list: The buffers that are ready to be used """
+
+        self.acquisitions = 0
+        """ int: The number of buffers handed out """
+
+        self.allocations = count
+        """ int: The number of buffers created, including the preallocated ones """
+
+        self.releases = 0
+        """ int: The number of buffers given back """
+
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a buffer from the pool, or creates a new one if they are all in use.
+
+        :rtype: bytearray
+        """
+
+        with self.lock:
+            self.acquisitions += 1
+
+            if self.free:
+                return self.free.pop()
+
+            self.allocations += 1
+
+        return bytearray(self.size)
+
+    def release(self, chunk):
+        """
+        Gives a buffer back to the pool, once nothing uses it anymore.
+
+        :param chunk:   The buffer, or a memoryview of it as yielded when encoding
+        """
+
+        if isinstance(chunk, memoryview):
+            chunk = chunk.obj
+
+        # Only take back our own buffers
+        if not isinstance(chunk, bytearray) or len(chunk) != self.size:
+            return
+
+        with self.lock:
+            self.releases += 1
+
+            if len(self.free) < self.count:
+                self.free.append(chunk)
+
+    def read(self, fh):
+        """
+        Reads the next chunk of ``fh`` into a pooled buffer.
+
+        :returns: A memoryview of the bytes read, empty at the end of the file
+        :rtype: memoryview
+        """
+
+        buffer = self.acquire()
+        length = fh.readinto(buffer)
+
+        if not length:
+            self.release(buffer)
+            return memoryview(b'')
+
+        return memoryview(buffer)[:length]
+
+    def stats(self):
+        """
+        Returns how often buffers were reused instead of allocated.
+
+        :rtype: dict
+        """
+
+        with self.lock:
+            return {
+                'acquisitions': self.acquisitions,
+                'allocations': self.allocations,
+                'reuses': self.acquisitions - (self.allocations - self.count),
+                'releases': self.releases,
+                'free': len(self.free),
+            }
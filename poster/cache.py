@@ -0,0 +1,231 @@
+"""
+A process-wide cache of the metadata (and optionally the content) of files
+attached to forms, so that attaching the same file to many forms only stats,
+guesses the MIME type of and scans the file once.
+
+The cache is disabled by default, turn it on with :func:`configure`:
+
+    >>> from poster import cache
+    >>> cache.configure(max_entries=1024, max_payload_size=64 * 1024)
+    >>> cache.get_cache().stats()
+
+Entries are keyed by the device, inode, size and modification time of the
+file, so a file that changes on disk is simply treated as a new file. Only
+sources and plain binary files are cached, since a text mode handle or a
+GzipFile reads different content from the same file.
+"""
+
+from .cursor import _raw_file
+from io import UnsupportedOperation
+
+import os
+
+_cache = None
+
+
+class PartInfo(object):
+    def __init__(self, filesize, mime_type, payload=None):
+        """
+        The information computed for a file the first time it is attached.
+
+        :param filesize:    The size of the file, in bytes
+        :param mime_type:   The MIME type of the file, None if it couldn't be guessed
+        :param payload:     The content of the file, if it is small enough to cache
+        """
+
+        self.filesize = filesize
+        """ int: The size of the file, in bytes """
+
+        self.mime_type = mime_type
+        """ str: The MIME type of the file """
+
+        self.payload = payload
+        """ bytes: The content of the file, or None if it isn't cached """
+
+
+class PartCache(object):
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, max_payload_size=0):
+        """
+        A thread-safe LRU cache of :class:`PartInfo` objects.
+
+        :param max_entries:         The maximum number of files to remember
+        :param max_bytes:           The maximum number of payload bytes to hold in total
+        :param max_payload_size:    Files up to this size have their content cached
+                                    too, 0 disables payload caching
+        """
+
+        from collections import OrderedDict
+
+        import threading
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_payload_size = max_payload_size
+
+        self.entries = OrderedDict()
+        """ OrderedDict: The cached entries, the least recently used first """
+
+        self.size = 0
+        """ int: The number of payload bytes currently held """
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(fh, *extra):
+        """
+        Builds the cache key for a file handler or a source that has already
+        been stat()ed, or returns None if the content isn't backed by a real
+        file on disk, or is read through something that decodes it.
+
+        :param fh:      The file handler or source
+        :param extra:   Any other values that the cached information depends on
+
+        :rtype: tuple
+        """
+
+        stat = getattr(fh, 'stat', None)
+
+        if not isinstance(stat, os.stat_result):
+            if _raw_file(fh) is None:
+                return None
+
+            try:
+                stat = os.fstat(fh.fileno())
+            except (OSError, AttributeError, UnsupportedOperation):
+                return None
+
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+
+        return (stat.st_dev, stat.st_ino, stat.st_size, mtime) + extra
+
+    def get(self, key):
+        """
+        Looks up an entry, marking it as recently used.
+
+        :rtype: PartInfo
+        """
+
+        with self.lock:
+            info = self.entries.pop(key, None)
+
+            if info is None:
+                self.misses += 1
+                return None
+
+            self.entries[key] = info
+            self.hits += 1
+
+            return info
+
+    def put(self, key, info, fh=None):
+        """
+        Stores an entry, reading the payload from ``fh`` if the file is small
+        enough, then evicts the least recently used entries to stay in bounds.
+
+        :param key:     The key returned by :meth:`key`
+        :param info:    The information to store
+        :type info:     PartInfo
+        :param fh:      The file handler or source to read the payload from
+        """
+
+        if fh is not None and info.payload is None and 0 < info.filesize <= self.max_payload_size:
+            if hasattr(fh, 'open'):
+                with fh.open() as source:
+                    payload = source.read()
+            else:
+                fh.seek(0)
+                payload = fh.read()
+                fh.seek(0)
+
+            # Text mode files and short reads aren't worth the trouble
+            if isinstance(payload, bytes) and len(payload) == info.filesize:
+                info.payload = payload
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+
+            if previous is not None and previous.payload is not None:
+                self.size -= len(previous.payload)
+
+            self.entries[key] = info
+
+            if info.payload is not None:
+                self.size += len(info.payload)
+
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.evictions += 1
+
+                if evicted.payload is not None:
+                    self.size -= len(evicted.payload)
+
+    def clear(self):
+        """
+        Removes every entry and resets the statistics.
+        """
+
+        with self.lock:
+            self.entries.clear()
+            self.size = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the hit rate and usage of the cache.
+
+        :rtype: dict
+        """
+
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            }
+
+
+def configure(**kwargs):
+    """
+    Enables the process-wide cache, replacing any existing one.
+
+    Accepts the same parameters as :class:`PartCache`.
+
+    :rtype: PartCache
+    """
+
+    global _cache
+
+    _cache = PartCache(**kwargs)
+
+    return _cache
+
+
+def disable():
+    """
+    Disables the process-wide cache.
+    """
+
+    global _cache
+
+    _cache = None
+
+
+def get_cache():
+    """
+    Returns the process-wide cache, or None if it is disabled.
+
+    :rtype: PartCache
+    """
+
+    return _cache
@@ -0,0 +1,351 @@
+"""
+The ``poster`` command line uploader, also available as ``python -m poster``.
+
+    $ poster https://example.com/upload -F foo=bar -F image=@photo.jpg
+
+Fields are given curl style, ``name=value`` for text and ``name=@path`` for
+files, optionally followed by ``;type=<mime type>`` and ``;filename=<name>``.
+The body is always streamed, so memory usage does not depend on file size.
+
+With ``--split`` every file field is uploaded in its own request (together
+with all of the text fields), ``--jobs`` of them at a time. Passing
+``--resume <journal>`` records each finished file in the journal, so that
+running the same command again only uploads the files that are left.
+
+``poster loadgen`` runs a load test against an upload endpoint instead, see
+:mod:`poster.loadgen`.
+"""
+
+import os
+import sys
+import time
+
+from .form import Form
+from .readahead import ReadAhead
+from .streaminghttp import send
+
+
+class Field(object):
+    def __init__(self, name, value=None, path=None, mime_type=None, filename=None):
+        """
+        A single ``-F`` argument from the command line.
+
+        :param name:        The name of the field
+        :param value:       The text value, for text fields
+        :param path:        The path of the file, for file fields
+        :param mime_type:   The ``;type=`` override for file fields
+        :param filename:    The ``;filename=`` override for file fields
+        """
+
+        self.name = name
+        self.value = value
+        self.path = path
+        self.mime_type = mime_type
+        self.filename = filename
+
+    @classmethod
+    def parse(cls, argument):
+        """
+        Parses a ``name=value`` or ``name=@path[;type=...][;filename=...]`` argument
+
+        :rtype: Field
+        """
+
+        name, sep, value = argument.partition('=')
+
+        if not name or not sep:
+            raise ValueError('Invalid field \'{}\', expected name=value or name=@path'.format(argument))
+
+        if not value.startswith('@'):
+            return cls(name, value=value)
+
+        options = value[1:].split(';')
+        field = cls(name, path=options[0])
+
+        for option in options[1:]:
+            key, _, option_value = option.partition('=')
+
+            if key == 'type':
+                field.mime_type = option_value
+            elif key == 'filename':
+                field.filename = option_value
+            else:
+                raise ValueError('Unknown file option \'{}\''.format(key))
+
+        return field
+
+
+class Journal(object):
+    def __init__(self, path):
+        """
+        A plain text file listing the files that have already been uploaded,
+        one path per line, used by ``--resume``.
+
+        :param path: The path of the journal file
+        """
+
+        import threading
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.completed = set()
+
+        if os.path.exists(path):
+            with open(path) as fh:
+                self.completed = set(line.rstrip('\n') for line in fh if line.strip())
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self.completed
+
+    def add(self, path):
+        """
+        Records that a file has been uploaded successfully
+        """
+
+        path = os.path.abspath(path)
+
+        with self.lock:
+            self.completed.add(path)
+
+            with open(self.path, 'a') as fh:
+                fh.write(path + '\n')
+
+
+def build_parser():
+    """
+    Creates the argument parser for the command line uploader
+
+    :rtype: argparse.ArgumentParser
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='poster', description='Stream a multipart/form-data upload to a URL.')
+    parser.add_argument('url', help='The URL to upload to')
+    parser.add_argument('-F', '--form', dest='fields', action='append', default=[], metavar='NAME=VALUE',
+                        help='A form field, use NAME=@PATH to upload a file')
+    parser.add_argument('-H', '--header', dest='headers', action='append', default=[], metavar='HEADER',
+                        help='An extra request header, e.g. "Authorization: Bearer ..."')
+    parser.add_argument('-X', '--request', dest='method', default='POST', help='The HTTP method (default: POST)')
+    parser.add_argument('--split', action='store_true', help='Upload every file field in its own request')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='The number of concurrent uploads, implies --split when above 1')
+    parser.add_argument('--retries', type=int, default=0, help='Retry failed uploads this many times')
+    parser.add_argument('--retry-delay', type=float, default=1.0,
+                        help='Seconds to wait before the first retry, doubled on every attempt')
+    parser.add_argument('--resume', metavar='JOURNAL', help='Skip and record finished files, requires --split')
+    parser.add_argument('--timeout', type=float, default=None, help='The socket timeout, in seconds')
+    parser.add_argument('--progress', action='store_true', help='Print upload progress to stderr')
+    parser.add_argument('--readahead', type=int, default=0, metavar='CHUNKS',
+                        help='Read up to this many chunks ahead in a background thread')
+    parser.add_argument('--expect-continue', action='store_true',
+                        help='Wait for "100 Continue" before sending the body, so rejected uploads fail early')
+
+    return parser
+
+
+def build_form(fields):
+    """
+    Creates a Form from a list of fields, the files are only opened while
+    they are being sent
+
+    :rtype: Form
+    """
+
+    form = Form()
+
+    for field in fields:
+        if field.path is None:
+            form.add_data(field.name, field.value)
+        else:
+            form.add_file(field.name, field.path,
+                          filename=field.filename or os.path.basename(field.path),
+                          mime_type=field.mime_type)
+
+    return form
+
+
+class Uploader(object):
+    def __init__(self, args, out=sys.stdout, err=sys.stderr):
+        """
+        Sends forms built from the command line arguments, with retries.
+
+        :param args:    The parsed command line arguments
+        :param out:     Where response bodies are written
+        :param err:     Where progress and errors are written
+        """
+
+        import threading
+
+        self.args = args
+        self.out = out
+        self.err = err
+        self.lock = threading.Lock()
+        self.headers = {}
+
+        for header in args.headers:
+            key, _, value = header.partition(':')
+            self.headers[key.strip()] = value.strip()
+
+    def log(self, message, end='\n'):
+        with self.lock:
+            self.err.write(message + end)
+            self.err.flush()
+
+    def progress(self, label):
+        """
+        Returns a send() callback that prints the progress of an upload
+        """
+
+        def cb(form, current, total):
+            if total:
+                self.log('\r{}: {}/{} bytes'.format(label, current, total), end='')
+            else:
+                self.log('\r{}: {} bytes'.format(label, current), end='')
+
+        return cb
+
+    def upload(self, fields, label):
+        """
+        Builds and sends a form, retrying on connection errors and 5xx responses
+
+        :returns: The final response, or None if every attempt failed
+        :rtype: poster.streaminghttp.Response
+        """
+
+        try:  # pragma: no cover
+            from httplib import HTTPException
+        except ImportError:  # pragma: no cover
+            from http.client import HTTPException
+
+        cb = self.progress(label) if self.args.progress else None
+        delay = self.args.retry_delay
+        last = None
+
+        for attempt in range(self.args.retries + 1):
+            if attempt:
+                self.log('{}: retrying in {:.1f}s'.format(label, delay))
+                time.sleep(delay)
+                delay *= 2
+
+            form = build_form(fields)
+
+            if self.args.readahead:
+                form = ReadAhead(form, depth=self.args.readahead)
+
+            try:
+                response = send(self.args.url, form, method=self.args.method, headers=self.headers,
+                                timeout=self.args.timeout, cb=cb, expect_continue=self.args.expect_continue)
+            except (IOError, OSError, HTTPException) as e:
+                self.log('{}: {}'.format(label, e))
+                continue
+            except ValueError as e:
+                # Such as an unsupported URL scheme, retrying won't help
+                self.log('{}: {}'.format(label, e))
+                return last
+
+            if cb:
+                self.log('')
+
+            if response.status < 500:
+                return response
+
+            # Keep the last 5xx response so that it can be reported
+            self.log('{}: {} {}'.format(label, response.status, response.reason))
+            last = response
+
+        return last
+
+    def run_single(self, fields):
+        response = self.upload(fields, self.args.url)
+
+        if response is None:
+            return 1
+
+        with self.lock:
+            self.out.write(response.body.decode('utf-8', 'replace'))
+            self.out.flush()
+
+        return 0 if response.ok else 1
+
+    def run_split(self, fields):
+        text = [f for f in fields if f.path is None]
+        files = [f for f in fields if f.path is not None]
+
+        # Without files there is nothing to split, the text fields are one request
+        if not files:
+            return self.run_single(text)
+
+        journal = Journal(self.args.resume) if self.args.resume else None
+
+        if journal:
+            files = [f for f in files if f.path not in journal]
+
+        def upload_one(field):
+            response = self.upload(text + [field], field.path)
+
+            if response is None:
+                self.log('{}: failed'.format(field.path))
+                return False
+
+            self.log('{}: {} {}'.format(field.path, response.status, response.reason))
+
+            if response.ok and journal:
+                journal.add(field.path)
+
+            return response.ok
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max(1, self.args.jobs)) as pool:
+            results = list(pool.map(upload_one, files))
+
+        return 0 if all(results) else 1
+
+
+def main(argv=None, out=sys.stdout, err=sys.stderr):
+    """
+    The entry point of the ``poster`` command
+
+    :param argv: The command line arguments, defaults to ``sys.argv[1:]``
+
+    :returns: The exit status
+    :rtype: int
+    """
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv[:1] == ['loadgen']:
+        from .loadgen import main as loadgen
+
+        return loadgen(argv[1:], out=out, err=err)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        fields = [Field.parse(f) for f in args.fields]
+    except ValueError as e:
+        parser.error(str(e))
+
+    for field in fields:
+        if field.path is not None and not os.path.isfile(field.path):
+            parser.error('\'{}\' could not be located'.format(field.path))
+
+    # Catch invalid fields, such as empty values, before sending anything
+    try:
+        build_form(fields)
+    except ValueError as e:
+        parser.error(str(e))
+
+    split = args.split or args.jobs > 1
+
+    if args.resume and not split:
+        parser.error('--resume requires --split')
+
+    uploader = Uploader(args, out=out, err=err)
+
+    if split:
+        return uploader.run_split(fields)
+
+    return uploader.run_single(fields)
@@ -0,0 +1,134 @@
+"""
+Position-independent reads from a shared file object.
+
+A :class:`Cursor` keeps its own offset into a file instead of using the file
+position, so any number of threads can read the same file at once, for
+example to encode one Form for several requests in parallel. Files with a
+descriptor are read with ``os.pread()``, which never touches the file
+position. Anything else (in-memory files, text mode files, platforms without
+``pread``) is read with a seek and a read while holding a lock.
+"""
+
+import io
+import os
+
+try:  # pragma: no cover
+    import _thread
+except ImportError:  # pragma: no cover
+    import thread as _thread
+
+_LOCK = _thread.allocate_lock()
+""" lock: Held around the seek and read of files that can't be read with pread() """
+
+
+def _raw_file(fh):
+    """
+    Returns the plain binary file under ``fh``, whose descriptor reads the same
+    bytes as ``fh`` does, or None. Wrappers such as GzipFile or BZ2File decode
+    what they read, and text mode files decode it too.
+
+    :rtype: io.FileIO
+    """
+
+    # The objects returned by tempfile wrap a real file
+    if type(fh).__module__ == 'tempfile' and hasattr(fh, 'file'):
+        fh = fh.file
+
+    if isinstance(fh, (io.BufferedReader, io.BufferedRandom)):
+        fh = fh.raw
+
+    return fh if isinstance(fh, io.FileIO) else None
+
+
+class Cursor(object):
+    def __init__(self, fh, offset=0):
+        """
+        Reads ``fh`` from ``offset`` onwards, without using or changing its
+        file position (apart from the locked fallback, which leaves it at the
+        end of the last read).
+
+        :param fh:      The file-like object to read
+        :param offset:  Where to start reading
+        """
+
+        self.fh = fh
+        """ file: The file that is read """
+
+        self.offset = offset
+        """ int: Where the next read starts, an opaque tell() cookie for text mode files """
+
+        self.fd = self._descriptor(fh)
+        """ int: The file descriptor to pread() from, or None to use the locked fallback """
+
+    @staticmethod
+    def _descriptor(fh):
+        """
+        Returns the file descriptor of ``fh`` if it can be read with pread()
+
+        :rtype: int
+        """
+
+        if not hasattr(os, 'pread'):  # pragma: no cover
+            return None
+
+        raw = _raw_file(fh)
+
+        if raw is None:
+            return None
+
+        try:
+            fd = raw.fileno()
+        except (IOError, OSError, ValueError):
+            return None
+
+        # Anything written through fh and still in its buffer isn't in the file yet
+        if hasattr(fh, 'flush'):
+            fh.flush()
+
+        return fd
+
+    def read(self, size):
+        """
+        Reads up to ``size`` bytes and moves the cursor past them
+
+        :rtype: bytes
+        """
+
+        if self.fd is not None:
+            block = os.pread(self.fd, size, self.offset)
+            self.offset += len(block)
+
+            return block
+
+        with _LOCK:
+            self.fh.seek(self.offset)
+            block = self.fh.read(size)
+            self.offset = self.fh.tell()
+
+        return block
+
+    def readinto(self, buffer):
+        """
+        Reads into ``buffer`` and moves the cursor past the bytes read
+
+        :returns: The number of bytes read, 0 at the end of the file
+        :rtype: int
+        """
+
+        if self.fd is not None and hasattr(os, 'preadv'):
+            length = os.preadv(self.fd, [buffer], self.offset)
+        elif self.fd is not None:  # pragma: no cover
+            block = os.pread(self.fd, len(buffer), self.offset)
+            length = len(block)
+            buffer[:length] = block
+        else:
+            with _LOCK:
+                self.fh.seek(self.offset)
+                length = self.fh.readinto(buffer)
+                self.offset = self.fh.tell()
+
+            return length
+
+        self.offset += length
+
+        return length
@@ -0,0 +1,457 @@
+"""
+Delta uploads, which only send the parts of large files that changed since
+they were last uploaded.
+
+Files are split into chunks at positions chosen by their content (with a
+rolling "gear" hash), so inserting or removing bytes only changes the chunks
+around the edit rather than shifting every chunk after it. The hash of every
+chunk that has been sent is kept in a local :class:`ChunkIndex`, and each
+upload carries only the chunks the index doesn't know about, plus a JSON
+manifest listing the chunks that make up every file:
+
+    >>> index = ChunkIndex('/var/lib/backups/sent.idx')
+    >>> upload = DeltaUpload(index)
+    >>> upload.add_file('dump', '/backups/db.dump')
+    >>> response = send(url, upload.build())
+    >>> if response.ok:
+    ...     upload.commit()
+
+The server keeps every chunk it receives, and rebuilds each file from the
+manifest. :class:`DeltaReceiver` is a local stand-in for such a server.
+"""
+
+from .form import Form
+from .sources import FileRangeSource
+
+import os
+
+MANIFEST_VERSION = 1
+""" int: The version of the manifest format """
+
+_GEAR_SEED = 0x706f73746572
+""" int: Seeds the table of the rolling hash, it must never change or old chunks won't match """
+
+_WINDOW = 32
+""" int: The number of bytes the rolling hash depends on, a byte is shifted out of it after 32 steps """
+
+_SCAN_BLOCK = 8192
+""" int: The number of positions whose hash is computed at once, small enough to stay in the CPU cache """
+
+
+def _gear_table():
+    """
+    The random 32 bit value of every byte, used by the rolling hash
+
+    :rtype: list
+    """
+
+    import random
+
+    generator = random.Random(_GEAR_SEED)
+
+    return [generator.getrandbits(32) for _ in range(256)]
+
+
+class Chunker(object):
+    def __init__(self, min_size=16 * 1024, avg_size=64 * 1024, max_size=256 * 1024):
+        """
+        Splits files into content-defined chunks.
+
+        A chunk ends where the rolling hash of the bytes before it has its top
+        bits clear, which happens on average every ``avg_size`` bytes, but no
+        sooner than ``min_size`` and no later than ``max_size``.
+
+        :param min_size:    The smallest chunk, apart from the last one of a file
+        :param avg_size:    The average size of a chunk, must be a power of two
+        :param max_size:    The largest chunk
+        """
+
+        if avg_size & (avg_size - 1) or not min_size <= avg_size <= max_size:
+            raise ValueError('avg_size must be a power of two between min_size and max_size')
+
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+
+        bits = avg_size.bit_length() - 1
+
+        self.mask = ((1 << bits) - 1) << (32 - bits)
+        """ int: The bits of the hash that must be clear at the end of a chunk """
+
+        self.gear = _gear_table()
+
+        # bytes.translate() tables that map every byte to one of the four
+        # bytes of its gear value
+        self._planes = [bytes(value >> shift & 0xFF for value in self.gear) for shift in (0, 8, 16, 24)]
+
+        lanes = _SCAN_BLOCK + _WINDOW - 1
+
+        # The mask, and the value that carries a non-zero masked hash into
+        # bit 32, repeated in every 64 bit lane of a block
+        self._lane_masks = int.from_bytes(self.mask.to_bytes(8, 'little') * lanes, 'little')
+        self._lane_carries = int.from_bytes((0xFFFFFFFF).to_bytes(8, 'little') * lanes, 'little')
+
+    def _cut(self, data, start, end):
+        """
+        Finds the length of the chunk that starts at ``start``, with at most
+        ``end - start`` bytes available
+
+        :rtype: int
+        """
+
+        available = end - start
+
+        if available <= self.min_size:
+            return available
+
+        limit = start + min(available, self.max_size)
+        position = start + self.min_size
+        gear = self.gear
+        mask = self.mask
+        h = 0
+
+        # Until the hash has seen a whole window, it also depends on where
+        # it started, so the first bytes are hashed one at a time
+        for byte in data[position:min(position + _WINDOW - 1, limit)]:
+            h = ((h << 1) + gear[byte]) & 0xFFFFFFFF
+            position += 1
+
+            if not h & mask:
+                return position - start
+
+        return self._scan(data, position, limit) - start
+
+    def _scan(self, data, position, limit):
+        """
+        Finds the end of the first chunk that ends after ``position``, where the
+        hash of the window of bytes up to it has the bits of :attr:`mask` clear,
+        or returns ``limit`` if there is none before it.
+
+        The hash of a window is ``sum(gear[byte] << age)``, for the last 32
+        bytes and their age in steps, modulo 2 ** 32. Instead of rolling it
+        one byte at a time, the gear values of a block are laid out in the
+        64 bit lanes of a single integer, and shifted and added onto
+        themselves so that every lane holds the hash of the window that ends
+        there, which leaves the per-byte work to C.
+
+        :rtype: int
+        """
+
+        planes = self._planes
+        lanes = _SCAN_BLOCK + _WINDOW - 1
+        buffer = bytearray(8 * lanes)
+
+        while position < limit:
+            stop = min(position + _SCAN_BLOCK, limit)
+            window = bytes(data[position - _WINDOW + 1:stop])
+            count = len(window)
+
+            for index, plane in enumerate(planes):
+                buffer[index:8 * count:8] = window.translate(plane)
+
+            # The lanes past the end of a short block hold the previous
+            # block's values, they are never looked at
+            hashes = int.from_bytes(buffer, 'little')
+            shift = 65
+
+            # Add every lane, shifted by one bit, to the next one, then the
+            # result to the lane two further on, and so on up to 32 lanes
+            while shift < 65 * _WINDOW:
+                hashes += hashes << shift
+                shift *= 2
+
+            # The lanes of a cut are zero once masked, the others carry into
+            # their bit 32, which is the fifth byte of the lane
+            hashes = ((hashes & self._lane_masks) + self._lane_carries).to_bytes(8 * lanes, 'little')
+            found = hashes[4::8].find(b'\0', _WINDOW - 1, count)
+
+            if found >= 0:
+                return position + found - _WINDOW + 2
+
+            position = stop
+
+        return limit
+
+    def split(self, fh, read_size=1024 * 1024):
+        """
+        Yields the chunks of a binary file as (offset, length, digest) tuples,
+        where the digest is the hex SHA-256 of the chunk.
+
+        :param fh:          The file to split, read from its current position
+        :param read_size:   The number of bytes to read at once
+
+        :rtype: generator
+        """
+
+        import hashlib
+
+        buffer = b''
+        offset = 0
+        eof = False
+
+        while True:
+            # Keep at least a whole maximum sized chunk in the buffer
+            while not eof and len(buffer) < self.max_size:
+                block = fh.read(read_size)
+
+                if not block:
+                    eof = True
+
+                buffer += block
+
+            if not buffer:
+                return
+
+            view = memoryview(buffer)
+            position = 0
+
+            while len(buffer) - position >= (1 if eof else self.max_size):
+                length = self._cut(view, position, len(buffer))
+
+                yield offset, length, hashlib.sha256(view[position:position + length]).hexdigest()
+
+                offset += length
+                position += length
+
+            view.release()
+            buffer = buffer[position:]
+
+
+class ChunkIndex(object):
+    def __init__(self, path=None):
+        """
+        The hashes of every chunk that has been uploaded, kept in a text file
+        with one hash per line.
+
+        :param path:    The path of the index file, or None to only keep it in memory
+        """
+
+        self.path = path
+        self.hashes = set()
+
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                self.hashes = set(line.strip() for line in fh if line.strip())
+
+    def __contains__(self, digest):
+        return digest in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, digests):
+        """
+        Records that chunks were uploaded, appending the new ones to the file
+
+        :param digests: The hashes of the chunks
+        """
+
+        new = [digest for digest in digests if digest not in self.hashes]
+        self.hashes.update(new)
+
+        if self.path and new:
+            with open(self.path, 'a') as fh:
+                fh.write(''.join(digest + '\n' for digest in new))
+
+
+class DeltaUpload(object):
+    def __init__(self, index, chunker=None, boundary=None):
+        """
+        Builds a form that only carries the chunks of its files that aren't
+        in the index, and a manifest of the chunks of every file.
+
+        :param index:       The index of the chunks that were already uploaded
+        :type index:        ChunkIndex
+        :param chunker:     How to split the files, the default Chunker otherwise
+        :param boundary:    The boundary of the form, see :class:`poster.Form`
+        """
+
+        self.index = index
+        self.chunker = chunker or Chunker()
+        self.boundary = boundary
+
+        self.files = []
+        """ list: The manifest entry of every file """
+
+        self.new_chunks = []
+        """ list: A (digest, path, offset, length) tuple for every chunk to send """
+
+        self.total_bytes = 0
+        """ int: The combined size of the files """
+
+        self.new_bytes = 0
+        """ int: The combined size of the chunks to send """
+
+    def add_file(self, name, path, filename=None):
+        """
+        Splits a file into chunks, which reads the whole file once. Only the
+        new chunks are read again when the form is sent.
+
+        :param name:        The name of the file, in the manifest
+        :param path:        The path of the file
+        :param filename:    The filename in the manifest, defaults to the basename
+        """
+
+        if not os.path.isfile(path):
+            raise IOError('\'{}\' could not be located'.format(path))
+
+        queued = set(digest for digest, _, _, _ in self.new_chunks)
+        chunks = []
+        size = 0
+
+        with open(path, 'rb') as fh:
+            for offset, length, digest in self.chunker.split(fh):
+                chunks.append([digest, length])
+                size += length
+
+                # Chunks repeated within the upload are only sent once
+                if digest not in self.index and digest not in queued:
+                    queued.add(digest)
+                    self.new_chunks.append((digest, path, offset, length))
+                    self.new_bytes += length
+
+        self.files.append({
+            'name': name,
+            'filename': filename or os.path.basename(path),
+            'size': size,
+            'chunks': chunks,
+        })
+
+        self.total_bytes += size
+
+    def manifest(self):
+        """
+        The manifest, which lists the chunks that make up every file
+
+        :rtype: dict
+        """
+
+        return {'version': MANIFEST_VERSION, 'algorithm': 'sha256', 'files': self.files}
+
+    def build(self):
+        """
+        Builds the form, with the manifest as its first field and a ``chunk``
+        file field, named after its hash, for every new chunk. The chunks are
+        read from the files when the form is encoded.
+
+        :rtype: poster.Form
+        """
+
+        import json
+
+        form = Form(boundary=self.boundary)
+        form.add_data('manifest', json.dumps(self.manifest(), sort_keys=True))
+
+        for digest, path, offset, length in self.new_chunks:
+            form.add_file('chunk', FileRangeSource(path, offset, length), filename=digest,
+                          mime_type='application/octet-stream')
+
+        return form
+
+    def commit(self):
+        """
+        Records the new chunks in the index, call this once the form was accepted
+        """
+
+        self.index.add(digest for digest, _, _, _ in self.new_chunks)
+
+
+class DeltaReceiver(object):
+    def __init__(self, directory):
+        """
+        A local stand-in for a server that accepts delta uploads, for tests.
+        It stores every chunk it receives under ``directory/chunks``, and
+        rebuilds the files of every upload under ``directory/files``.
+
+        :param directory:   Where to keep the chunks and the rebuilt files
+        """
+
+        self.chunks = os.path.join(directory, 'chunks')
+        self.files = os.path.join(directory, 'files')
+
+        for path in (self.chunks, self.files):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+        self.received_bytes = 0
+        """ int: The combined size of every chunk received """
+
+    def receive(self, body):
+        """
+        Stores the chunks of an encoded form, and rebuilds its files from them.
+
+        :param body:    The encoded form
+        :type body:     bytes
+
+        :returns: The path of every rebuilt file, by name
+        :rtype: dict
+        """
+
+        import hashlib
+        import json
+
+        manifest = None
+
+        for name, filename, content in _parse_multipart(body):
+            if name == 'manifest':
+                manifest = json.loads(content.decode('utf-8'))
+            elif name == 'chunk':
+                if hashlib.sha256(content).hexdigest() != filename:
+                    raise ValueError('Chunk {} does not match its hash'.format(filename))
+
+                with open(os.path.join(self.chunks, filename), 'wb') as fh:
+                    fh.write(content)
+
+                self.received_bytes += len(content)
+
+        if manifest is None or manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError('The form has no manifest this receiver understands')
+
+        missing = [digest for entry in manifest['files'] for digest, _ in entry['chunks']
+                   if not os.path.exists(os.path.join(self.chunks, digest))]
+
+        if missing:
+            raise ValueError('{} chunks are missing, such as {}'.format(len(missing), missing[0]))
+
+        paths = {}
+
+        for entry in manifest['files']:
+            path = os.path.join(self.files, os.path.basename(entry['filename']))
+
+            with open(path, 'wb') as out:
+                for digest, _ in entry['chunks']:
+                    with open(os.path.join(self.chunks, digest), 'rb') as fh:
+                        out.write(fh.read())
+
+            if os.path.getsize(path) != entry['size']:
+                raise ValueError('\'{}\' was rebuilt with the wrong size'.format(entry['filename']))
+
+            paths[entry['name']] = path
+
+        return paths
+
+
+def _parse_multipart(body):
+    """
+    Yields the (name, filename, content) of every part of an encoded form,
+    using the delimiter on its first line.
+
+    :rtype: generator
+    """
+
+    import re
+
+    delimiter = body.split(b'\r\n', 1)[0]
+
+    for part in body.split(b'\r\n' + delimiter)[:-1]:
+        if part.startswith(delimiter):
+            part = part[len(delimiter):]
+
+        headers, _, content = part[2:].partition(b'\r\n\r\n')
+
+        name = re.search(b'name="([^"]*)"', headers)
+        filename = re.search(b'filename="([^"]*)"', headers)
+
+        yield (name.group(1).decode('utf-8') if name else None,
+               filename.group(1).decode('utf-8') if filename else None,
+               content)
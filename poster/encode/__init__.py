@@ -1,26 +1,151 @@
+"""
+DEPRECATED - The API of the original poster package, kept for backwards
+compatibility, which will be removed in version 1.0.0. Use :class:`poster.Form`
+instead.
+
+    >>> datagen, headers = multipart_encode({'foo': 'bar', 'image': open('photo.jpg', 'rb')})
+    >>> request = urllib.request.Request(url, datagen, headers)
+
+As in the original package, :func:`multipart_encode` returns a generator that
+encodes the body a chunk at a time while it is sent, and headers with the exact
+Content-Length, which is worked out without reading any of the files.
+"""
+
 from poster import Form, FormData
+from poster.form_data import CHUNK_SIZE
+from poster.sources import FileSource
+
+
+def _build_form(params, boundary=None):
+    """
+    Creates a Form from the parameters of the original API, which are either a
+    dict or a list of FormData objects and (name, value) tuples, where a value
+    is a string or a file object.
+
+    :rtype: Form
+    """
+
+    form = Form(boundary=boundary)
+
+    if isinstance(params, dict):
+        params = list(params.items())
+    elif not isinstance(params, (list, tuple)):
+        raise ValueError('Parameters must be a dict or a list, not {}'.format(type(params).__name__))
+
+    for param in params:
+        if isinstance(param, FormData):
+            form.add_form_data(param)
+            continue
+
+        try:
+            name, value = param
+        except (TypeError, ValueError):
+            raise ValueError('All parameters must be FormData objects or (name, value) tuples')
+
+        if isinstance(value, FormData):
+            form.add_form_data(value)
+        elif hasattr(value, 'read'):
+            form.add_file(name, value)
+        else:
+            form.add_data(name, value)
+
+    return form
+
+
+def gen_boundary():
+    """
+    Returns a new random boundary
+
+    :rtype: str
+    """
+
+    return Form().boundary
+
+
+def get_body_size(params, boundary):
+    """
+    Returns the exact size of the encoded body, without encoding it
+
+    :rtype: int
+    """
+
+    return _build_form(params, boundary).content_length
+
+
+def get_headers(params, boundary):
+    """
+    Returns the Content-Type and Content-Length headers for the encoded body,
+    without encoding it
+
+    :rtype: dict
+    """
+
+    return _build_form(params, boundary).headers
+
+
+class multipart_yielder(object):
+    def __init__(self, form, cb=None, chunk_size=CHUNK_SIZE):
+        """
+        Yields the encoded body of a form a chunk at a time, as returned by
+        :func:`multipart_encode`.
+
+        :param form:        The form to encode
+        :param cb:          Called with ``(field, current, total)`` after every field,
+                            and with ``(None, total, total)`` once the body is done
+        :param chunk_size:  The number of bytes to read from a file at once
+        """
+
+        self.form = form
+        self.cb = cb
+        self.chunk_size = chunk_size
+        self.blocks = None
+
+        self.reset()
+
+    def _generate(self):
+        total = self.form.content_length
+        position = 0
+
+        for block in self.form.iter_encode(cb=self.cb, chunk_size=self.chunk_size):
+            position += len(block)
+
+            yield block
+
+        if self.cb:
+            self.cb(None, position, total)
+
+    def reset(self):
+        """
+        Starts the body again from the beginning, so it can be sent again
+        """
+
+        self.blocks = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.blocks)
 
+    next = __next__
 
-def multipart_encode(parameters):
-    # TODO: REWRITE CODE
 
-    form = Form()
+def multipart_encode(params, boundary=None, cb=None):
+    """
+    Encodes a form lazily, in the style of the original poster API.
 
-    if isinstance(parameters, list):
-        if not all([isinstance(x, FormData) for x in parameters]):
-            raise ValueError('All instances must be of type Parameter when providing a list')
+    :param params:      A dict, or a list of FormData objects and (name, value)
+                        tuples, where a value is a string or a file object
+    :param boundary:    The boundary to use, a random one is generated by default
+    :param cb:          The progress callback, see :class:`multipart_yielder`
 
-        form.parameters += parameters
-    elif isinstance(parameters, dict):
-        for name, content in parameters.items():
-            try:
-                content.seek(0)
+    :returns: A generator of the encoded body, and the headers to send with it
+    :rtype: tuple
+    """
 
-                form.add_file(name, content)
-            except AttributeError:
-                form.add_data(name, content)
+    form = _build_form(params, boundary)
 
-    return form.encode()
+    return multipart_yielder(form, cb), form.headers
 
 
 class MultipartParam(object):
@@ -32,6 +157,7 @@ class MultipartParam(object):
             if not os.path.exists(path):
                 raise IOError('\'{}\' could not be located'.format(path))
 
-            return FormData(name, open(path, 'rb'))
+            # The file is only opened while the form is being encoded
+            return FormData(name, FileSource(path))
         else:
             return FormData(name, path)
@@ -0,0 +1,245 @@
+from .form_data import CHUNK_SIZE, FormData
+
+# Every row of a table is a plain text field, so everything but the name and
+# value is the same for each of them
+_DISPOSITION = b'\r\nContent-Disposition: form-data; name="'
+_CONTENT_TYPE = b'"\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n'
+_ROW_OVERHEAD = 2 + len(_DISPOSITION) + len(_CONTENT_TYPE) + 2
+
+
+def _escape_name(name):
+    """
+    Escapes an encoded name for the Content-Disposition header, like
+    :func:`poster.form_data._escape_param`
+
+    :rtype: bytes
+    """
+
+    if b'"' in name or b'\r' in name or b'\n' in name:
+        return name.replace(b'"', b'%22').replace(b'\r', b'%0D').replace(b'\n', b'%0A')
+
+    return name
+
+
+class FieldTable(object):
+    __slots__ = ('data', 'offsets', 'boundary', 'file', '_length')
+
+    def __init__(self, fields=None):
+        """
+        A compact, columnar store for a large number of plain text fields,
+        which encodes to exactly the same output as adding every field to a
+        Form with :meth:`poster.Form.add_data`.
+
+        The encoded names and values are all kept in a single bytearray, with
+        an array of where each of them ends, instead of creating a FormData
+        object (or even a bytes object) for every field.
+
+            >>> table = FieldTable([('id[]', '1'), ('id[]', '2')])
+            >>> form.add_field_table(table)
+
+        :param fields:  An iterable of (name, value) tuples to add
+        """
+
+        from array import array
+
+        self.data = bytearray()
+        """ bytearray: The encoded name and value of every field, one after the other """
+
+        self.offsets = array('I')
+        """ array: Where the name, then the value, of every field ends in :attr:`data` """
+
+        self.boundary = None
+        """ str: The boundary of the form this table belongs to """
+
+        self.file = None
+        """ None: Tables never contain files """
+
+        self._length = 0
+        """ int: The combined length of all of the escaped names and values """
+
+        if fields:
+            self.extend(fields)
+
+    def __len__(self):
+        """
+        The number of fields in the table
+
+        :rtype: int
+        """
+
+        return len(self.offsets) // 2
+
+    def _rows(self):
+        """
+        Yields the encoded (name, value) of every field, as bytearrays
+        """
+
+        data = self.data
+        offsets = self.offsets
+        start = 0
+
+        for index in range(0, len(offsets), 2):
+            middle = offsets[index]
+            end = offsets[index + 1]
+
+            yield data[start:middle], data[middle:end]
+
+            start = end
+
+    def __iter__(self):
+        """
+        Iterates over the fields, as (name, value) tuples of strings
+        """
+
+        for name, value in self._rows():
+            yield name.decode('utf-8'), value.decode('utf-8')
+
+    def rows(self, boundary=None):
+        """
+        Yields a FormData object for every field, with ``boundary`` or the
+        table's own, which encodes exactly like that row of the table
+
+        :rtype: generator
+        """
+
+        for name, value in self:
+            field = FormData(name, value)
+            field.boundary = self.boundary if boundary is None else boundary
+
+            yield field
+
+    def add(self, name, value):
+        """
+        Adds a single text field to the table.
+
+        :param name:    The name to identify the content
+        :param value:   The content to encode
+        """
+
+        # Validate that the name is valid
+        if not name or not isinstance(name, str):
+            raise ValueError('You must provide a valid name')
+
+        # Validate that the content is valid
+        if not value or not isinstance(value, str):
+            raise ValueError('You must provide a valid content as a string')
+
+        name = name.encode('utf-8')
+        value = value.encode('utf-8')
+
+        data = self.data
+        data += name
+        middle = len(data)
+        data += value
+
+        # Offsets past 4GB need 64 bit integers
+        if len(data) > 0xFFFFFFFF and self.offsets.typecode == 'I':
+            from array import array
+
+            self.offsets = array('Q', self.offsets)
+
+        self.offsets.append(middle)
+        self.offsets.append(len(data))
+
+        # The names are only escaped when they're encoded
+        self._length += len(_escape_name(name)) + len(value)
+
+    def extend(self, fields):
+        """
+        Adds many text fields to the table.
+
+        :param fields: An iterable of (name, value) tuples
+        """
+
+        for name, value in fields:
+            self.add(name, value)
+
+    @property
+    def payload_length(self):
+        """
+        The combined size of the values in the table, in bytes
+
+        :rtype: int
+        """
+
+        return sum(len(value) for _, value in self._rows())
+
+    @property
+    def content_length(self):
+        """
+        The exact number of bytes that :meth:`iter_encode` yields for the
+        current boundary.
+
+        :rtype: int
+        """
+
+        return self.encoded_length()
+
+    def encoded_length(self, boundary=None):
+        """
+        The exact number of bytes that :meth:`iter_encode` yields for
+        ``boundary``, our own by default.
+
+        :rtype: int
+        """
+
+        return len(self) * (_ROW_OVERHEAD + len(self.boundary if boundary is None else boundary)) + self._length
+
+    def row_lengths(self, boundary=None):
+        """
+        Yields the header and payload length of every row, for ``boundary``
+        or our own, as tuples.
+        """
+
+        overhead = _ROW_OVERHEAD - 2 + len(self.boundary if boundary is None else boundary)
+
+        for name, value in self._rows():
+            yield overhead + len(_escape_name(name)), len(value)
+
+    def iter_encode(self, chunk_size=CHUNK_SIZE, pool=None, splice=False, boundary=None):
+        """
+        Yields the encoded fields, with as many rows as fit joined together
+        into each chunk of about ``chunk_size`` bytes.
+
+        The ``pool`` and ``splice`` are accepted for compatibility with FormData
+        and ignored, since there are no files to read.
+
+        :rtype: generator
+        """
+
+        if boundary is None:
+            boundary = self.boundary
+
+        count = len(self)
+
+        if not count:
+            return
+
+        delimiter = b'--' + boundary.encode('utf-8') + _DISPOSITION
+        offsets = self.offsets
+        cut = self.data.__getitem__
+
+        # No name needs escaping if escaping them added nothing
+        escape = self._length != len(self.data)
+
+        # Every chunk gets the same number of rows, about chunk_size bytes
+        batch = max(1, chunk_size * count // self.encoded_length(boundary))
+
+        for first in range(0, count, batch):
+            last = min(first + batch, count)
+
+            # The names and values are cut out of the data and slotted in
+            # between the constant parts of the rows by C loops, rather than
+            # one row at a time
+            ends = offsets[2 * first:2 * last]
+            starts = offsets[2 * first - 1:2 * last - 1] if first else [0] + offsets[:2 * last - 1].tolist()
+            pieces = list(map(cut, map(slice, starts, ends)))
+
+            if escape:
+                pieces[0::2] = map(_escape_name, pieces[0::2])
+
+            rows = [delimiter, None, _CONTENT_TYPE, None, b'\r\n'] * (last - first)
+            rows[1::5] = pieces[0::2]
+            rows[3::5] = pieces[1::2]
+
+            yield b''.join(rows)
@@ -1,54 +1,270 @@
-from .form_data import FormData
+from .field_table import FieldTable
+from .form_data import FormData, CHUNK_SIZE, _quote_plus
+from .sources import ContentSource, FileSource
+from . import urlencoded
 
-import uuid
+import binascii
+import os
 
-try:  # pragma: no cover
-    from urllib import quote_plus
-except ImportError:  # pragma: no cover
-    from urllib.parse import quote_plus
+MULTIPART = 'multipart'
+""" str: Always encode the form as multipart/form-data """
+
+URLENCODED = 'urlencoded'
+""" str: Always encode the form as application/x-www-form-urlencoded, it must not contain files """
+
+AUTO = 'auto'
+""" str: Encode the form as application/x-www-form-urlencoded if it only contains text fields """
+
+
+class PartPlan(object):
+    def __init__(self, field, offset, header_length, payload_length):
+        """
+        Describes where a FormData object is in the encoded form, returned by
+        :meth:`Form.plan`.
+
+        :param field:           The FormData object, or a (name, value) tuple for a
+                                row of a FieldTable
+        :param offset:          The position of its boundary line in the encoded form
+        :param header_length:   The size of the boundary line and headers
+        :param payload_length:  The size of the content
+        """
+
+        self.field = field
+        """ FormData: The FormData object, or a (name, value) tuple for a row of a FieldTable """
+
+        self.offset = offset
+        """ int: The position of the boundary line in the encoded form """
+
+        self.header_length = header_length
+        """ int: The size of the boundary line and headers, including the blank line """
+
+        self.payload_length = payload_length
+        """ int: The size of the content """
+
+    @property
+    def payload_offset(self):
+        """
+        The position of the content in the encoded form
+
+        :rtype: int
+        """
+
+        return self.offset + self.header_length
+
+    @property
+    def length(self):
+        """
+        The size of the whole part, including the line break after the content
+
+        :rtype: int
+        """
+
+        return self.header_length + self.payload_length + 2
+
+    @property
+    def end(self):
+        """
+        The position just after this part in the encoded form
+
+        :rtype: int
+        """
+
+        return self.offset + self.length
 
 
 class Form(object):
-    def __init__(self, data=None, boundary=None):
+    def __init__(self, data=None, boundary=None, encoding=MULTIPART):
         """
         Creates a new Form object, which is used to generate the
         multipart http form response.
 
         :param data:    The data parameter should be left blank, or if you
-                        have pre-existing FormData objects, you can pass them
-                        in as a list.
+                        have pre-existing FormData (or FieldTable) objects, you
+                        can pass them in as a list.
 
                         Example:
                         >>> form = Form([FormData('a', 'b')])
 
         :type data:     list
+
+        :param boundary:    The boundary to use, a random one is generated by default
+        :param encoding:    ``'multipart'`` (the default), ``'urlencoded'`` to send the
+                            form as application/x-www-form-urlencoded, which is a lot
+                            smaller for short text fields, or ``'auto'`` to use
+                            urlencoded only when the form doesn't contain any files
         """
 
+        if encoding not in (MULTIPART, URLENCODED, AUTO):
+            raise ValueError('encoding must be one of \'{}\', \'{}\' or \'{}\''.format(MULTIPART, URLENCODED, AUTO))
+
+        self.encoding = encoding
+        """ str: How the form is encoded, multipart, urlencoded or auto """
+
         # See if the user provided data, otherwise fallback
         self.data = data or []
 
         if boundary and isinstance(boundary, str):
             # Use the user provided boundary
-            self.boundary = quote_plus(boundary.replace(' ', '+'))
+            self.boundary = _quote_plus(boundary.replace(' ', '+'))
         else:
-            # Generate a new unique random string for the boundary
-            self.boundary = quote_plus(uuid.uuid4().hex)
+            # Generate a new unique random string for the boundary, this is the
+            # same 32 hex characters as uuid4().hex without importing uuid
+            self.boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
 
         # Check that the parameters given is a list
         if not isinstance(self.data, list):
             raise ValueError('data list must be of type list, is type {}'.format(type(self.data).__name__))
 
-        # Check that all of the items are the FormData type
-        if not all([isinstance(x, FormData) for x in self.data]):
-            raise TypeError('All objects in list must be of type FormData')
+        # Check that all of the items are the FormData type, tables of text
+        # fields are the data of forms built by add_many()
+        if not all(isinstance(x, (FormData, FieldTable)) for x in self.data):
+            raise TypeError('All objects in list must be of type FormData or FieldTable')
+
+    @classmethod
+    def from_mapping(cls, mapping, boundary=None, encoding=MULTIPART):
+        """
+        Creates a new Form from a dictionary, or a multi-value dictionary such
+        as the ones used by webob and werkzeug, with :meth:`add_many`.
+
+        Values that are lists or tuples add one field per item, with the same name.
+
+            >>> form = Form.from_mapping({'foo': 'bar', 'id[]': ['1', '2']})
+
+        :param mapping:     The fields to add
+        :param boundary:    The boundary to use, see :class:`Form`
+        :param encoding:    How to encode the form, see :class:`Form`
+
+        :rtype: Form
+        """
+
+        try:
+            # werkzeug's MultiDict only returns every value when asked to
+            items = mapping.items(multi=True)
+        except TypeError:
+            items = mapping.items()
+
+        def expand():
+            for name, value in items:
+                if isinstance(value, (list, tuple)):
+                    for item in value:
+                        yield name, item
+                else:
+                    yield name, value
+
+        form = cls(boundary=boundary, encoding=encoding)
+        form.add_many(expand())
+
+        return form
+
+    @classmethod
+    def from_directory(cls, path, pattern='*', recursive=False, name='file', boundary=None):
+        """
+        Creates a new Form with a file field for every file in a directory.
+
+        Only the size of every file is looked up here, the files are opened one
+        at a time when the form is encoded, so the number of files isn't limited
+        by the number of file descriptors a process may have open.
+
+        :param path:        The directory to upload
+        :param pattern:     Only include files whose name matches this glob pattern
+        :param recursive:   Whether or not to include the files in subdirectories
+        :param name:        The name of every file field
+        :param boundary:    The boundary to use, see :class:`Form`
+
+        :returns: The Form, with the path relative to ``path`` as the filename of each file
+        :rtype: Form
+        """
+
+        if not os.path.isdir(path):
+            raise IOError('\'{}\' could not be located'.format(path))
+
+        from fnmatch import fnmatch
+
+        def walk():
+            for root, directories, files in os.walk(path):
+                # Visit everything in a stable order
+                directories.sort()
+
+                if not recursive:
+                    del directories[:]
+
+                for filename in sorted(files):
+                    if fnmatch(filename, pattern):
+                        full_path = os.path.join(root, filename)
+                        relative = os.path.relpath(full_path, path).replace(os.sep, '/')
+
+                        yield name, FileSource(full_path, filename=relative)
+
+        form = cls(boundary=boundary)
+        form.add_many(walk())
+
+        return form
+
+    def add_many(self, fields):
+        """
+        Adds many fields to the Form at once, from an iterable of (name, value)
+        tuples. A value can be a string, a file-like object or a
+        :class:`poster.sources.ContentSource`.
+
+        The fields are validated in a single pass as they are consumed, and
+        nothing is added to the Form if any of them is invalid. Consecutive text
+        fields are stored in a :class:`poster.FieldTable`, which encodes them
+        exactly like :meth:`add_data` but with a lot less memory per field.
+
+        :param fields:  The (name, value) tuples to add
+        """
+
+        start = len(self.data)
+
+        try:
+            self._add_many(fields)
+        except Exception:
+            # Drop whatever was added before the invalid field
+            del self.data[start:]
+            raise
+
+    def _add_many(self, fields):
+        table = None
+
+        for index, field in enumerate(fields):
+            try:
+                name, value = field
+            except (TypeError, ValueError):
+                raise ValueError('Field {} must be a (name, value) tuple'.format(index))
+
+            # Validate that the name is valid
+            if not name or not isinstance(name, str):
+                raise ValueError('Field {} does not have a valid name'.format(index))
+
+            if isinstance(value, str):
+                if not value:
+                    raise ValueError('Field {} (\'{}\') must have a valid content'.format(index, name))
+
+                if table is None:
+                    table = FieldTable()
+                    self.data.append(table)
+
+                table.add(name, value)
+            elif isinstance(value, ContentSource) or hasattr(value, 'read'):
+                table = None
+                self.data.append(FormData(name, value))
+            else:
+                raise ValueError('Field {} (\'{}\') must be a string, a file-like object or a ContentSource'.format(
+                    index, name))
 
     def add_file(self, name, fh, filename=None, mime_type=None):
         """
         Adds a new FormData object that uses a file handler for the content,
         allowing for buffered input.
 
+        If ``fh`` is the path of a file instead, the file is only stat()ed now,
+        and is opened just before its content is encoded and closed straight
+        after, so forms with any number of files only ever have one of them
+        open at a time.
+
         :param name:        A name used by multipart to identify the content
-        :param fh:          The file(-like) handler that allows for buffered reading
+        :param fh:          The file(-like) handler that allows for buffered reading,
+                            or the path of the file
         :param filename:    If not provided, will attempt to determine it automatically
         :param mime_type:   The MIME type of the document, with also automatically detect
                             based on the file extension of the ``filename``
@@ -61,8 +277,15 @@ class Form(object):
         if not name or not isinstance(name, str):
             raise ValueError('You must provide a valid name')
 
+        # Paths are read lazily
+        if fh and isinstance(fh, str):
+            if not os.path.isfile(fh):
+                raise IOError('\'{}\' could not be located'.format(fh))
+
+            fh = FileSource(fh)
+
         # Validate that the file buffer is valid
-        if not fh or not hasattr(fh, 'read'):
+        if not fh or not (hasattr(fh, 'read') or isinstance(fh, ContentSource)):
             raise ValueError('You must provide a valid file handler')
 
         # Create a new FormData object
@@ -119,6 +342,253 @@ class Form(object):
         # Add the FormData to our data
         self.data.append(form_data)
 
+    def add_field_table(self, table):
+        """
+        Adds a FieldTable of plain text fields to the form, which is encoded
+        exactly as if every field had been added with :meth:`add_data`.
+
+        :param table:   The table of fields to add
+        :type table:    poster.FieldTable
+        """
+
+        if not isinstance(table, FieldTable):
+            raise ValueError('table must be of type FieldTable, is \'{}\''.format(type(table).__name__))
+
+        self.data.append(table)
+
+    @property
+    def urlencoded(self):
+        """
+        Whether the form is encoded as application/x-www-form-urlencoded
+        instead of multipart/form-data, see the ``encoding`` parameter.
+
+        :rtype: bool
+        """
+
+        if self.encoding == MULTIPART:
+            return False
+
+        if self.encoding == AUTO:
+            return all(field.file is None for field in self.data)
+
+        if any(field.file is not None for field in self.data):
+            raise ValueError('A urlencoded form can\'t contain files')
+
+        return True
+
+    def _text_fields(self):
+        """
+        Yields the fields of a file-less form as (name, value) tuples of
+        UTF-8 encoded strings.
+
+        :rtype: generator
+        """
+
+        for field in self.data:
+            if isinstance(field, FieldTable):
+                for name, value in field:
+                    yield name.encode('utf-8'), value.encode('utf-8')
+            else:
+                yield field.name.encode('utf-8'), field.content.encode('utf-8')
+
+    @property
+    def content_type(self):
+        """
+        The value of the Content-Type header for this form.
+
+        :rtype: str
+        """
+
+        if self.urlencoded:
+            return urlencoded.CONTENT_TYPE
+
+        return 'multipart/form-data; boundary=--{}'.format(self.boundary)
+
+    @property
+    def headers(self):
+        """
+        The HTTP headers to send with the encoded form.
+
+        :rtype: dict
+        """
+
+        headers = {'Content-Type': self.content_type}
+        content_length = self.content_length
+
+        if content_length is not None:
+            headers['Content-Length'] = str(content_length)
+
+        return headers
+
+    def _terminator(self):
+        """
+        Returns the --[boundary]-- line that ends the form
+
+        :rtype: bytes
+        """
+
+        return '--{}--'.format(self.boundary).encode('utf-8')
+
+    def plan(self):
+        """
+        Works out where every FormData object will be in the encoded form, using
+        only the sizes found when the data was added, so no files are read.
+
+        :returns: A PartPlan for each FormData object, in order
+        :rtype: list
+        """
+
+        if self.urlencoded:
+            raise ValueError('Only multipart forms have parts')
+
+        parts = []
+        offset = 0
+
+        for field in self.data:
+            if isinstance(field, FieldTable):
+                rows = zip(field, field.row_lengths(self.boundary))
+
+                for row, (header_length, payload_length) in rows:
+                    part = PartPlan(row, offset, header_length, payload_length)
+                    offset += part.length
+
+                    parts.append(part)
+            elif field.payload_length is None:
+                raise ValueError('The size of \'{}\' isn\'t known in advance'.format(field.name))
+            else:
+                part = PartPlan(field, offset, len(field.encode_headers(self.boundary)), field.payload_length)
+                offset += part.length
+
+                parts.append(part)
+
+        return parts
+
+    @property
+    def content_length(self):
+        """
+        The exact size of the encoded form in bytes, worked out from the sizes
+        found when the data was added, without encoding the form.
+
+        This is None if the form contains a source that can't tell its size in
+        advance, such as a compressed archive, and the form then has to be
+        sent with chunked transfer encoding.
+
+        :rtype: int
+        """
+
+        if self.urlencoded:
+            return urlencoded.fields_length(self._text_fields())
+
+        length = len(self._terminator())
+
+        for field in self.data:
+            field_length = field.encoded_length(self.boundary)
+
+            if field_length is None:
+                return None
+
+            length += field_length
+
+        return length
+
+    def iter_encode(self, cb=None, chunk_size=CHUNK_SIZE, pool=None, splice=False):
+        """
+        Yields the encoded form as a series of byte strings, without ever
+        holding the whole form (or any whole file) in memory.
+
+        Joining the chunks together gives the same output as :meth:`encode`.
+
+        :param cb:          The callback function, called after each FormData object
+                            has been encoded, see :meth:`encode`
+        :param chunk_size:  The maximum number of bytes to read from a file at once
+        :type chunk_size:   int
+        :param pool:        A pool of buffers to read files into, file content is
+                            then yielded as memoryviews, see :mod:`poster.buffers`
+        :type pool:         poster.buffers.BufferPool
+        :param splice:      Yield :class:`poster.sources.Splice` objects for sources
+                            that read from a pipe, see :meth:`FormData.iter_encode`
+
+        :rtype: generator
+        """
+
+        if self.urlencoded:
+            for block in self._iter_urlencoded(cb):
+                yield block
+
+            return
+
+        position = 0
+
+        total = self.content_length
+
+        # Iterate through the data, a part may be shared with other forms, so
+        # it is given our boundary instead of keeping it
+        for field in self.data:
+            for part in _callback_parts(field, cb, self.boundary):
+                for block in part.iter_encode(chunk_size, pool, splice, self.boundary):
+                    yield block
+
+                    # Track the size of our output, a Splice only knows its
+                    # length once it has been written
+                    position += len(block)
+
+                # If we have a callback, call it
+                if cb:
+                    cb(part, position, total)
+
+        # Print a --[boundary]-- at the end to terminate the sequence
+        yield self._terminator()
+
+    def _iter_urlencoded(self, cb=None):
+        """
+        Yields the body of a urlencoded form, all at once unless there is a
+        callback to call after every field.
+
+        :rtype: generator
+        """
+
+        pieces = urlencoded.encode_fields(self._text_fields())
+
+        if not cb:
+            yield b'&'.join(pieces)
+            return
+
+        total = sum(len(piece) for piece in pieces) + max(len(pieces) - 1, 0)
+        position = 0
+        index = 0
+
+        for field in self.data:
+            for part in _callback_parts(field, cb):
+                block = pieces[index]
+
+                if index:
+                    block = b'&' + block
+
+                index += 1
+                position += len(block)
+
+                yield block
+
+                cb(part, position, total)
+
+    def spool(self, path, cb=None, chunk_size=CHUNK_SIZE):
+        """
+        Encodes the form once into a file on disk, together with its metadata,
+        so the same body can be sent many times without encoding it again.
+
+        :param path:        Where to write the encoded body, the metadata is written
+                            to the same path with a ``.json`` suffix
+        :param cb:          The callback function, see :meth:`encode`
+        :param chunk_size:  The maximum number of bytes to read from a file at once
+
+        :returns: The spooled form
+        :rtype: poster.SpooledForm
+        """
+
+        from .spool import SpooledForm
+
+        return SpooledForm.write(self, path, cb=cb, chunk_size=chunk_size)
+
     def encode(self, cb=None):
         """
         Encodes the FormData object into something that can be joined together to
@@ -142,37 +612,22 @@ class Form(object):
                     files.
         """
 
-        content = ''
-        position = 0
-
-        # The sum of all of our data + 38
-        # -- (2) + [uuid boundary] (32) + -- (2) + \r\n (2) = 38 bytes
-        total = sum(len(p) for p in self.data) + 38
-
-        # Iterate through the data
-        for field in self.data:
-            # Set the boundary for this Form on the FormData
-            field.set_boundary(self.boundary)
+        content = b''.join(self.iter_encode(cb))
 
-            # Get the encoded output of the data
-            block = field.encode()
+        return content.decode('utf-8'), self.headers
 
-            # Track the size of our output
-            position += len(block)
 
-            # Add the content to our result
-            content += block
+def _callback_parts(field, cb, boundary=None):
+    """
+    The parts of a field to encode one after the other. With a callback, a
+    FieldTable is encoded a row at a time, so the callback is still called
+    once per text field with a FormData object, as if it had been added with
+    :meth:`Form.add_data`.
 
-            # If we have a callback, call it
-            if cb:
-                cb(field, position, total)
-
-        # Print a --[boundary]-- at the end to terminate the sequence
-        content += '--{}--'.format(self.boundary)
+    :rtype: iterable
+    """
 
-        headers = {
-            'Content-Type': 'multipart/form-data; boundary=--{}'.format(self.boundary),
-            'Content-Length': str(len(content)),
-        }
+    if cb and isinstance(field, FieldTable):
+        return field.rows(boundary)
 
-        return content, headers
+    return (field,)
@@ -1,19 +1,127 @@
 from io import UnsupportedOperation
 
-from email.header import Header
-from mimetypes import guess_type
-from collections import OrderedDict
+from . import cache
+from .cursor import Cursor, _raw_file
+from .sources import ContentSource, Splice
 
 import os
-import re
 
-try:  # pragma: no cover
-    from urllib import quote_plus
-except ImportError:  # pragma: no cover
-    from urllib.parse import quote_plus
+# NOTE: The heavier standard library modules (re, mimetypes, collections and
+# urllib.parse) are imported where they are first needed, so that importing
+# poster stays cheap for short-lived processes.
+
+CHUNK_SIZE = 64 * 1024
+""" int: The default number of bytes read from a file at a time when streaming """
+
+
+def _quote_plus(value):
+    """
+    A lazy wrapper around ``urllib.parse.quote_plus``, which skips the import
+    entirely for values that are already safe (such as generated boundaries).
+
+    :param value: The string to quote
+    :type value: str
+
+    :returns: The quoted string
+    :rtype: str
+    """
+
+    if value.isalnum() and len(value.encode('utf-8')) == len(value):
+        return value
+
+    try:  # pragma: no cover
+        from urllib import quote_plus as quote
+    except ImportError:  # pragma: no cover
+        from urllib.parse import quote_plus as quote
+
+    return quote(value)
+
+
+# Header parameters are memoized, since big forms tend to repeat the same
+# field names (and often the same filenames) over and over
+_PARAM_CACHE = {}
+_PARAM_CACHE_SIZE = 4096
+
+# The characters RFC 5987 allows unescaped in an ext-value, on top of the
+# letters, digits and _.-~ that are never quoted
+_ATTR_CHARS = '!#$&+^`|'
+
+
+def _escape_param(value):
+    """
+    Escapes a name or filename for use in a quoted header parameter, the way
+    RFC 7578 and browsers do: double quotes, carriage returns and line feeds
+    become %22, %0D and %0A, and anything else (including non-ASCII text) is
+    sent as is, in UTF-8.
+
+    :param value: The name or filename
+    :type value: str
+
+    :rtype: str
+    """
+
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+def _encode_disposition(name, filename=None):
+    """
+    Builds the value of the Content-Disposition header of a part.
+
+    Non-ASCII filenames are also given as an RFC 5987 ``filename*`` parameter,
+    for servers that don't read UTF-8 in the plain ``filename``. The results
+    are memoized.
+
+    :param name:        The name of the field
+    :param filename:    The name of the file, if any
+
+    :rtype: str
+    """
+
+    key = (name, filename)
+    disposition = _PARAM_CACHE.get(key)
+
+    if disposition is not None:
+        return disposition
+
+    disposition = 'form-data; name="{}"'.format(_escape_param(name))
+
+    if filename is not None:
+        disposition += '; filename="{}"'.format(_escape_param(filename))
+
+        try:
+            filename.encode('ascii')
+        except UnicodeError:
+            try:  # pragma: no cover
+                from urllib import quote
+            except ImportError:  # pragma: no cover
+                from urllib.parse import quote
+
+            disposition += "; filename*=UTF-8''{}".format(quote(filename.encode('utf-8'), safe=_ATTR_CHARS))
+
+    if len(_PARAM_CACHE) >= _PARAM_CACHE_SIZE:
+        _PARAM_CACHE.clear()
+
+    _PARAM_CACHE[key] = disposition
+
+    return disposition
 
 
 class FormData(object):
+    # FormData objects are created in large numbers for big forms, so they
+    # don't carry a __dict__
+    __slots__ = ('file', 'filename', 'mime_type', 'filesize', 'payload', 'boundary', 'name', 'content',
+                 'callback', '_header')
+
+    # The attributes the encoded headers are built from
+    _HEADER_ATTRIBUTES = frozenset(['file', 'filename', 'mime_type', 'name'])
+
+    def __setattr__(self, attribute, value):
+        # Changing what the headers are built from means building them again
+        if attribute in self._HEADER_ATTRIBUTES:
+            object.__setattr__(self, '_header', None)
+
+        object.__setattr__(self, attribute, value)
+
     def __init__(self, name, content, filename=None, mime_type=None, cb=None):
         """
         Creates a new FormData object, which will take a content that is either
@@ -35,8 +143,10 @@ class FormData(object):
 
         :param name:        The key to identify the data with
 
-        :param content:     The content to include, can be either a string or a file-like
-                            object that will read the contents
+        :param content:     The content to include, can be either a string, a file-like
+                            object that will read the contents, or a
+                            :class:`poster.sources.ContentSource` that is opened when
+                            the form is encoded
 
         :param filename:    The filename to include in the request, default of None will
                             automatically determine the filename. If a value is provided, it will
@@ -50,7 +160,7 @@ class FormData(object):
         """
 
         # Validate that some form of content was provided
-        if not content and not (isinstance(content, str) or hasattr(content, 'read')):
+        if not content and not (isinstance(content, (str, ContentSource)) or hasattr(content, 'read')):
             raise ValueError('You must provide a content of type str or a file-like object')
 
         self.file = None
@@ -63,17 +173,26 @@ class FormData(object):
         """ str: The MIME type of the content, if not provided, will attempt to detect based
                  on the filename """
 
+        self.filesize = None
+        """ int: The size of the file in bytes, if the content is a buffer """
+
+        self.payload = None
+        """ bytes: The cached content of a small file, read instead of the file """
+
         # Set the boundary
         self.boundary = None
         """ str: A random string that is used to separate the elements of the form """
 
+        self._header = None
+        """ bytes: The encoded headers, built the first time they are needed """
+
         # Detect if the content provided is a buffer object, that has
-        # a .read() method.
-        if content and hasattr(content, 'read'):
+        # a .read() method, or a source that is opened when we're encoded.
+        if content and (hasattr(content, 'read') or isinstance(content, ContentSource)):
             self.file = content
 
-        self.name = Header(name).encode()
-        """ str: The name of this value, the identifier for this data. The value is automatically encoded. """
+        self.name = name
+        """ str: The name of this value, the identifier for this data. It is escaped when the headers are built. """
 
         # Make the content None if the content is a file object
         self.content = None if self.file else content
@@ -90,48 +209,97 @@ class FormData(object):
             if not filename and hasattr(self.file, 'name'):
                 filename = self.file.name
 
-            # Encode whatever we've got.
+            # The filename is escaped when the headers are built
             if filename:
-                self.filename = filename.encode('ascii', 'xmlcharrefreplace') \
-                    .decode('utf-8').replace('"', '\\"')
+                self.filename = filename
 
             # Validate the mime_type parameter
             if mime_type and not isinstance(mime_type, str):
                 mime_type = None
 
-                # Use mimetypes package to guess the MIME type based off of the file name
-            if not mime_type and self.filename:
-                mime_type = guess_type(filename)[0]
+            # Files that were already attached to another form can skip the
+            # stat, MIME type guessing and boundary scan entirely
+            part_cache = cache.get_cache()
+            key = part_cache.key(self.file, self.filename, mime_type) if part_cache is not None else None
+            info = part_cache.get(key) if key else None
 
-            self.mime_type = mime_type
+            if info is None:
+                info = self._inspect_file(filename, mime_type)
 
-            try:
-                # Use fstat to find the length of the file
-                self.filesize = os.fstat(self.file.fileno()).st_size
-            except (OSError, AttributeError, UnsupportedOperation):
-                if self.file:
-                    # Go to the last byte in the file
-                    self.file.seek(0, 2)
+                if key:
+                    part_cache.put(key, info, self.file)
 
-                    # .tell() us the position of that byte
-                    self.filesize = self.file.tell()
-
-                    # Seek back to the beginning of the file
-                    self.file.seek(0)
-            except AttributeError:
-                # FIXME: Throw a real error here
-                self.filesize = -1
-            finally:
-                if self.file:
-                    boundary_match = re.compile(r'^--[\w]+$', re.MULTILINE)
-                    contents = str(self.file.read())
-
-                    if re.match(boundary_match, contents):
-                        raise ValueError('Boundary was found in file contents')
+            self.mime_type = info.mime_type
+            self.filesize = info.filesize
+            self.payload = info.payload
 
         # The callback method
         self.callback = cb
 
+    def _inspect_file(self, filename, mime_type):
+        """
+        Finds the size and MIME type of our file, and makes sure it doesn't
+        start with something that looks like a boundary.
+
+        :param filename:    The unencoded filename, used to guess the MIME type
+        :param mime_type:   The MIME type provided by the user, if any
+
+        :rtype: poster.cache.PartInfo
+        """
+
+        # Use mimetypes package to guess the MIME type based off of the file name
+        if not mime_type and self.filename:
+            from mimetypes import guess_type
+
+            mime_type = guess_type(filename)[0]
+
+        # Sources know their size, and aren't opened until they're encoded
+        if isinstance(self.file, ContentSource):
+            return cache.PartInfo(self.file.size, mime_type)
+
+        try:
+            # Use fstat to find the length of plain files, the descriptor of a
+            # wrapper such as GzipFile holds the compressed size
+            if _raw_file(self.file) is None:
+                raise UnsupportedOperation
+
+            filesize = os.fstat(self.file.fileno()).st_size
+        except (OSError, AttributeError, UnsupportedOperation):
+            # Go to the last byte in the file
+            self.file.seek(0, 2)
+
+            # .tell() us the position of that byte
+            filesize = self.file.tell()
+
+            # Seek back to the beginning of the file
+            self.file.seek(0)
+
+        import re
+
+        # re.match() only ever looks at the start of the contents, so
+        # reading the first chunk is enough and keeps memory constant
+        boundary_match = re.compile(r'^--[\w]+$', re.MULTILINE)
+        contents = self.file.read(CHUNK_SIZE)
+
+        if isinstance(contents, str):
+            # Text is sent as UTF-8, the size of which is only known by
+            # encoding it, one chunk at a time
+            filesize = 0
+            block = contents
+
+            while block:
+                filesize += len(block.encode('utf-8'))
+                block = self.file.read(CHUNK_SIZE)
+
+        contents = str(contents)
+
+        self.file.seek(0)
+
+        if re.match(boundary_match, contents):
+            raise ValueError('Boundary was found in file contents')
+
+        return cache.PartInfo(filesize, mime_type)
+
     def __len__(self):
         """
         The __len__ magic method, which returns the length of the content.
@@ -175,7 +343,7 @@ class FormData(object):
         :type boundary: str
         """
 
-        self.boundary = quote_plus(boundary)
+        self.boundary = _quote_plus(boundary)
 
     @property
     def headers(self):
@@ -191,26 +359,230 @@ class FormData(object):
         :rtype: dict
         """
 
-        # Prefix with the multipart boundary '--[boundary]'
-        headers = {}
+        from collections import OrderedDict
 
-        disposition = 'form-data; name="{}"'.format(self.name)
+        return OrderedDict(self._header_items())
+
+    def _header_items(self):
+        """
+        Returns the headers of this parameter as a list of (name, value) tuples
+
+        :rtype: list
+        """
 
-        if self.file and self.filename:
-            disposition += '; filename="{}"'.format(self.filename)
+        filename = self.filename if self.file else None
 
-        headers = OrderedDict([
-            ('Content-Disposition', disposition),
+        return [
+            ('Content-Disposition', _encode_disposition(self.name, filename)),
             ('Content-Type', self.mime_type or 'text/plain; charset=utf-8')
-        ])
+        ]
+
+    @property
+    def header_block(self):
+        """
+        The encoded headers of this parameter, followed by the blank line that
+        separates them from the content. They don't depend on the boundary, so
+        they are only built once, and again after the name, filename or MIME
+        type changes.
+
+        :rtype: bytes
+        """
+
+        if self._header is None:
+            content = '\r\n'.join(['{}: {}'.format(k, v) for k, v in self._header_items()])
+
+            self._header = (content + '\r\n\r\n').encode('utf-8')
+
+        return self._header
+
+    @property
+    def payload_length(self):
+        """
+        The number of bytes of content in this parameter, without its headers.
+
+        This is known without reading the file, since its size was found when
+        the parameter was created, unless the content is a source that can't
+        tell its size in advance, then this is None.
+
+        :rtype: int
+        """
+
+        if self.file:
+            return self.filesize
 
-        return headers
+        return len(self.content.encode('utf-8'))
 
     @property
     def content_length(self):
-        content_length = self.filesize if self.file else len(self.content)
+        """
+        The exact number of bytes that :meth:`iter_encode` yields for the
+        current boundary: the boundary line and headers, the content and the
+        trailing line break.
+
+        The content length is None if the size of the content isn't known.
+
+        :rtype: int
+        """
+
+        return self.encoded_length()
+
+    def encoded_length(self, boundary=None):
+        """
+        The exact number of bytes that :meth:`iter_encode` yields for
+        ``boundary``, see :attr:`content_length`.
+
+        :param boundary:    The quoted boundary, our own by default
+
+        :raises ValueError: If no boundary is given and we don't have one yet
+
+        :rtype: int
+        """
+
+        boundary = self._boundary(boundary)
+        payload_length = self.payload_length
+
+        if payload_length is None:
+            return None
+
+        # The boundary is always quoted, so its length in bytes is the same
+        # -- (2) + [boundary] + \r\n (2) + [headers] + [content] + \r\n (2)
+        return len(boundary) + len(self.header_block) + payload_length + 6
+
+    def _boundary(self, boundary):
+        """
+        Returns ``boundary``, or our own if it's None
+
+        :rtype: str
+        """
+
+        if boundary is None:
+            boundary = self.boundary
+
+        if boundary is None:
+            raise ValueError('\'{}\' has no boundary, add it to a Form or call set_boundary() first'.format(
+                self.name))
+
+        return boundary
+
+    def encode_headers(self, boundary=None):
+        """
+        Returns the encoded boundary line and headers that precede the content
+        of this parameter, including the blank line that separates them.
+
+        :param boundary:    The quoted boundary, our own by default
+
+        :rtype: bytes
+        """
+
+        boundary = self._boundary(boundary)
 
-        return len('\r\n'.join(self.headers)) + 2 + content_length
+        return b''.join([b'--', boundary.encode('utf-8'), b'\r\n', self.header_block])
+
+    def iter_encode(self, chunk_size=CHUNK_SIZE, pool=None, splice=False, boundary=None):
+        """
+        Yields the encoding of this parameter as a series of byte strings, the
+        file content is read ``chunk_size`` bytes at a time so that it is never
+        held in memory all at once.
+
+        If a callback was provided, it is called after every chunk read from the
+        file with the number of bytes read so far.
+
+        :param chunk_size:  The maximum number of bytes to read from the file at once
+        :type chunk_size:   int
+        :param pool:        A pool to read the file into with ``readinto()``, the
+                            file content is then yielded as memoryviews of its
+                            buffers, see :mod:`poster.buffers`
+        :type pool:         poster.buffers.BufferPool
+        :param splice:      Yield :class:`poster.sources.Splice` objects for sources
+                            that read from a pipe, which the consumer must write to
+                            its socket before asking for the next block
+        :param boundary:    The quoted boundary of the form being encoded, our own
+                            by default. A part can belong to several forms at once,
+                            so forms pass theirs here rather than setting it on us.
+
+        :rtype: generator
+        """
+
+        yield self.encode_headers(boundary)
+
+        if self.payload is not None:
+            yield self.payload
+
+            if self.callback:
+                self.callback(self, self.filesize, self.filesize)
+        elif self.file:
+            position = 0
+
+            for block in self._read(chunk_size, pool, splice):
+                yield block
+
+                # A Splice only knows its length once it has been written
+                position += len(block)
+
+                if self.callback:
+                    self.callback(self, position, self.filesize)
+        else:
+            yield self.content.encode('utf-8')
+
+        yield b'\r\n'
+
+    def _read(self, chunk_size, pool=None, splice=False):
+        """
+        Yields the content of our file or source, ``chunk_size`` bytes at a time,
+        or into the buffers of ``pool`` if the file supports ``readinto()``.
+        A source is opened here, and closed as soon as it has been read.
+
+        A file object is read through a :class:`poster.cursor.Cursor`, which
+        doesn't depend on its file position, so the same part can be encoded
+        by several threads at once.
+
+        :rtype: generator
+        """
+
+        if isinstance(self.file, ContentSource):
+            fh = opened = self.file.open()
+        else:
+            fh = self.file
+            opened = None
+
+        # Text mode files can't readinto()
+        if pool is not None and not hasattr(fh, 'readinto'):
+            pool = None
+
+        if opened is None:
+            fh = Cursor(fh)
+
+        splice_fd = getattr(fh, 'splice_fd', None) if splice else None
+
+        try:
+            while splice_fd is not None:
+                block = Splice(splice_fd, chunk_size)
+
+                yield block
+
+                if block.count is None:
+                    raise IOError('Splice blocks must be written with write_to()')
+
+                # Lets the source check how its output ended
+                fh.spliced(block.count)
+
+                if not block.count:
+                    return
+
+            while True:
+                block = pool.read(fh) if pool is not None else fh.read(chunk_size)
+
+                if not block:
+                    break
+
+                # Allow files opened in text mode
+                if not isinstance(block, (bytes, memoryview)):
+                    block = block.encode('utf-8')
+
+                yield block
+        finally:
+            if opened is not None:
+                opened.close()
 
     def encode(self):
         """
@@ -225,16 +597,4 @@ class FormData(object):
         >>> world
         """
 
-        content = '--{}\r\n'.format(self.boundary)
-        content += '\r\n'.join(['{}: {}'.format(k, v) for k, v in self.headers.items()])
-        content += '\r\n\r\n'
-
-        if self.file:
-            self.file.seek(0)
-            block = self.file.read().decode('utf-8')
-
-            content += block
-        else:
-            content += self.content
-
-        return content + '\r\n'
+        return b''.join(self.iter_encode()).decode('utf-8')
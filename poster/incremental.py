@@ -0,0 +1,173 @@
+"""
+Forms that can still be added to while they are being sent, so an upload
+overlaps with producing its later parts instead of waiting for all of them.
+
+    >>> form = IncrementalForm()
+    >>> thread = threading.Thread(target=send, args=(url, form))
+    >>> thread.start()
+    >>> for report in generate_reports():
+    ...     form.add_file('report', report)
+    >>> form.close()
+    >>> thread.join()
+
+Parts are encoded in the order they were added. When the encoder catches up
+with the producers it waits for the next part, and the form ends once it has
+been closed and every part has been sent. Until then its size isn't known, so
+it is sent with chunked transfer encoding.
+"""
+
+from .form import Form, MULTIPART, _callback_parts
+from .form_data import CHUNK_SIZE
+
+import time
+
+
+class IncrementalForm(Form):
+    def __init__(self, data=None, boundary=None, timeout=None):
+        """
+        A multipart form that accepts parts while it is being encoded, from any
+        thread, with the usual ``add_*`` methods, until :meth:`close` is called.
+
+        :param data:        The FormData objects to start with
+        :param boundary:    The boundary to use, see :class:`poster.Form`
+        :param timeout:     How long to wait for the next part, or for the form to
+                            be closed, in seconds, before giving up with an IOError.
+                            The default is to wait forever.
+        """
+
+        import threading
+
+        super(IncrementalForm, self).__init__(data, boundary=boundary, encoding=MULTIPART)
+
+        self.timeout = timeout
+        """ float: How long to wait for the next part, None to wait forever """
+
+        self.closed = False
+        """ bool: Whether the form is complete, parts can't be added once it is """
+
+        self._changed = threading.Condition()
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError('Parts can\'t be added to a form that was closed')
+
+    def add_form_data(self, form_data):
+        with self._changed:
+            self._check_open()
+            super(IncrementalForm, self).add_form_data(form_data)
+            self._changed.notify_all()
+
+    def add_field_table(self, table):
+        with self._changed:
+            self._check_open()
+            super(IncrementalForm, self).add_field_table(table)
+            self._changed.notify_all()
+
+    def add_many(self, fields):
+        # The fields may come from a slow generator, so they are validated
+        # before taking the lock
+        staging = Form()
+        staging.add_many(fields)
+
+        with self._changed:
+            self._check_open()
+            self.data.extend(staging.data)
+            self._changed.notify_all()
+
+    def close(self):
+        """
+        Marks the form as complete, the encoder ends it after the parts that
+        were already added.
+        """
+
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def content_length(self):
+        """
+        The exact size of the encoded form, which is only known once the form
+        has been closed. See :attr:`poster.Form.content_length`.
+
+        :rtype: int
+        """
+
+        with self._changed:
+            if not self.closed:
+                return None
+
+        return super(IncrementalForm, self).content_length
+
+    def plan(self):
+        if not self.closed:
+            raise ValueError('The parts of a form aren\'t known until it is closed')
+
+        return super(IncrementalForm, self).plan()
+
+    def iter_encode(self, cb=None, chunk_size=CHUNK_SIZE, pool=None, splice=False):
+        """
+        Yields the encoded form like :meth:`poster.Form.iter_encode`, waiting for
+        parts as they are added until the form is closed. An empty string is
+        yielded every time it has to wait, so a sender can write what it has
+        queued in the meantime.
+
+        The ``total`` passed to the callback is None unless the form was
+        closed before the encoding started.
+
+        :rtype: generator
+        """
+
+        position = 0
+        total = self.content_length
+        index = 0
+
+        while True:
+            with self._changed:
+                waiting = index >= len(self.data) and not self.closed
+
+            if waiting:
+                yield b''
+
+                with self._changed:
+                    self._wait(lambda: index < len(self.data) or self.closed)
+
+            with self._changed:
+                if index >= len(self.data):
+                    break
+
+                field = self.data[index]
+
+            index += 1
+
+            for part in _callback_parts(field, cb, self.boundary):
+                for block in part.iter_encode(chunk_size, pool, splice, self.boundary):
+                    yield block
+
+                    position += len(block)
+
+                if cb:
+                    cb(part, position, total)
+
+        yield self._terminator()
+
+    def _wait(self, predicate):
+        """
+        Waits until ``predicate`` is true, for at most :attr:`timeout` seconds
+        """
+
+        deadline = None if self.timeout is None else time.time() + self.timeout
+
+        while not predicate():
+            remaining = None if deadline is None else deadline - time.time()
+
+            if remaining is not None and remaining <= 0:
+                raise IOError('No part was added to the form for {} seconds'.format(self.timeout))
+
+            self._changed.wait(remaining)
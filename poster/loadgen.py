@@ -0,0 +1,748 @@
+"""
+A load generator for upload endpoints, which sends generated forms from a
+number of concurrent workers, optionally at a target rate, and reports the
+throughput, error rate and latency percentiles.
+
+    >>> report = run(url, synthetic_forms(10 * 1024 ** 2), concurrency=8, rate=20, duration=30)
+    >>> print(report.format())
+
+Workers are threads, or tasks on an asyncio event loop with ``mode='asyncio'``.
+Every upload records its time to first byte, from the start of the request
+until the response headers arrive, and its total time, until the whole
+response has been read. :class:`SinkServer` is a local server that accepts
+and discards uploads, so the load generator can be tried without a network.
+
+It is also available from the command line:
+
+    $ poster loadgen https://example.com/upload --concurrency 8 --rate 20 --duration 30 --size 10M
+    $ poster loadgen --sink --requests 100 --size 1M --mode asyncio
+"""
+
+from .form import Form
+from .form_data import CHUNK_SIZE
+from .streaminghttp import connect, Writer, _send_body, _send_chunked, _send_headers
+
+import sys
+import time
+
+THREADS = 'threads'
+""" str: Run the workers in threads """
+
+ASYNCIO = 'asyncio'
+""" str: Run the workers as tasks on an asyncio event loop """
+
+PERCENTILES = (50, 95, 99)
+""" tuple: The latency percentiles that are reported """
+
+_SIZE_SUFFIXES = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+_BODYLESS = (204, 304)
+""" tuple: The status codes of responses that never have a body (RFC 7230, section 3.3.3) """
+
+
+class Sample(object):
+    def __init__(self, index, start):
+        """
+        The measurements of one upload.
+
+        :param index:   The number of the upload
+        :param start:   When it started, as a time.time() timestamp
+        """
+
+        self.index = index
+        self.start = start
+
+        self.ttfb = None
+        """ float: The seconds until the response headers arrived """
+
+        self.latency = None
+        """ float: The seconds until the whole response was read """
+
+        self.status = None
+        """ int: The HTTP status of the response """
+
+        self.sent = 0
+        """ int: The size of the request body """
+
+        self.error = None
+        """ Exception: What stopped the upload, if it failed before a response arrived """
+
+    @property
+    def ok(self):
+        """
+        Whether the upload succeeded, with a 2xx or 3xx status
+
+        :rtype: bool
+        """
+
+        return self.error is None and self.status is not None and 200 <= self.status < 400
+
+
+def percentile(values, p):
+    """
+    The nearest-rank percentile of a list of values
+
+    :param values:  The values, in any order
+    :param p:       The percentile, from 0 to 100
+
+    :rtype: float
+    """
+
+    if not values:
+        return None
+
+    import math
+
+    ordered = sorted(values)
+
+    return ordered[max(int(math.ceil(p / 100.0 * len(ordered))) - 1, 0)]
+
+
+class Report(object):
+    def __init__(self, samples, elapsed):
+        """
+        The summary of a load test.
+
+        :param samples: A Sample for every upload
+        :param elapsed: The length of the test, in seconds
+        """
+
+        self.samples = samples
+        """ list: A Sample for every upload """
+
+        self.elapsed = elapsed
+        """ float: The length of the test, in seconds """
+
+        self.count = len(samples)
+        """ int: The number of uploads """
+
+        self.errors = sum(1 for sample in samples if not sample.ok)
+        """ int: The number of uploads that failed or got an error status """
+
+        self.bytes = sum(sample.sent for sample in samples if sample.ok)
+        """ int: The combined size of the successful uploads """
+
+        successful = [sample for sample in samples if sample.ok]
+
+        self.ttfb = dict((p, percentile([s.ttfb for s in successful], p)) for p in PERCENTILES)
+        """ dict: The time to first byte of successful uploads, in seconds, by percentile """
+
+        self.latency = dict((p, percentile([s.latency for s in successful], p)) for p in PERCENTILES)
+        """ dict: The total time of successful uploads, in seconds, by percentile """
+
+    @property
+    def error_rate(self):
+        """
+        The fraction of the uploads that failed
+
+        :rtype: float
+        """
+
+        return float(self.errors) / self.count if self.count else 0.0
+
+    @property
+    def throughput(self):
+        """
+        The bytes uploaded successfully per second
+
+        :rtype: float
+        """
+
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def rate(self):
+        """
+        The uploads completed per second
+
+        :rtype: float
+        """
+
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def format(self):
+        """
+        The report as a few lines of text
+
+        :rtype: str
+        """
+
+        def milliseconds(values):
+            return '  '.join('p{} {}'.format(p, '-' if values[p] is None else '{:.1f}ms'.format(values[p] * 1000))
+                             for p in PERCENTILES)
+
+        return '\n'.join([
+            'uploads:     {} in {:.2f}s ({:.1f}/s)'.format(self.count, self.elapsed, self.rate),
+            'errors:      {} ({:.2%})'.format(self.errors, self.error_rate),
+            'throughput:  {:.2f} MB/s ({:.1f} Mbit/s)'.format(self.throughput / 1e6, self.throughput * 8 / 1e6),
+            'first byte:  ' + milliseconds(self.ttfb),
+            'total:       ' + milliseconds(self.latency),
+        ])
+
+
+def synthetic_forms(size, files=1, seed=0, fields=None):
+    """
+    Returns a factory of forms with ``files`` random file parts of ``size``
+    bytes each, see :class:`poster.synthetic.RandomSource`. The sources are
+    created once and shared by every form.
+
+    :param size:    The size of every file part
+    :param files:   The number of file parts
+    :param seed:    The seed of the random content
+    :param fields:  Text fields to add to every form, as (name, value) tuples
+
+    :returns: A function that takes the number of the upload and returns a Form
+    :rtype: function
+    """
+
+    from .synthetic import RandomSource
+
+    sources = [RandomSource(size, seed=seed + i, name='upload{}.bin'.format(i)) for i in range(files)]
+
+    def build(index):
+        form = Form()
+
+        if fields:
+            form.add_many(fields)
+
+        for source in sources:
+            form.add_file('file', source)
+
+        return form
+
+    return build
+
+
+def upload(url, form, index=0, method='POST', headers=None, timeout=None, chunk_size=CHUNK_SIZE):
+    """
+    Sends a form like :func:`poster.streaminghttp.send`, and measures it.
+    Errors are recorded in the sample rather than raised.
+
+    :rtype: Sample
+    """
+
+    sample = Sample(index, time.time())
+    connection = None
+
+    try:
+        connection, path = connect(url, timeout)
+        total = form.content_length
+
+        _send_headers(connection, method, path, form, total, headers)
+
+        writer = Writer(connection.sock)
+
+        if total is None:
+            _send_chunked(writer, form, chunk_size)
+        else:
+            _send_body(writer, form, total, chunk_size)
+
+        sample.sent = writer.position
+
+        response = connection.getresponse()
+        sample.ttfb = time.time() - sample.start
+        sample.status = response.status
+
+        response.read()
+        sample.latency = time.time() - sample.start
+    except Exception as e:
+        sample.error = e
+    finally:
+        if connection is not None:
+            connection.close()
+
+    return sample
+
+
+def _request_head(url, method, form, total, headers):
+    """
+    Builds the request line and headers of an upload, for the asyncio workers
+
+    :returns: The host, port, whether to use TLS and the encoded head
+    :rtype: tuple
+    """
+
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError('Unsupported URL scheme \'{}\''.format(parts.scheme))
+
+    tls = parts.scheme == 'https'
+    path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+    # Every upload has its own connection, and the server may end a response
+    # that has no length by closing it
+    request_headers = {'Host': parts.netloc, 'Content-Type': form.content_type, 'Connection': 'close'}
+
+    if total is None:
+        request_headers['Transfer-Encoding'] = 'chunked'
+    else:
+        request_headers['Content-Length'] = str(total)
+
+    request_headers.update(headers or {})
+
+    head = '{} {} HTTP/1.1\r\n'.format(method, path)
+    head += ''.join('{}: {}\r\n'.format(key, value) for key, value in request_headers.items())
+
+    return parts.hostname, parts.port or (443 if tls else 80), tls, (head + '\r\n').encode('latin-1')
+
+
+async def upload_async(url, form, index=0, method='POST', headers=None, timeout=None, chunk_size=CHUNK_SIZE):
+    """
+    Sends a form with asyncio streams, and measures it like :func:`upload`.
+
+    :rtype: Sample
+    """
+
+    import asyncio
+
+    sample = Sample(index, time.time())
+    writer = None
+
+    try:
+        total = form.content_length
+        host, port, tls, head = _request_head(url, method, form, total, headers)
+
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=tls or None), timeout)
+        writer.write(head)
+
+        for block in form.iter_encode(chunk_size=chunk_size):
+            if not len(block):
+                continue
+
+            if total is None:
+                writer.write('{:x}\r\n'.format(len(block)).encode('ascii'))
+                writer.write(block)
+                writer.write(b'\r\n')
+            else:
+                writer.write(block)
+
+            sample.sent += len(block)
+
+            await asyncio.wait_for(writer.drain(), timeout)
+
+        if total is None:
+            writer.write(b'0\r\n\r\n')
+
+        await asyncio.wait_for(writer.drain(), timeout)
+
+        status, length, chunked = await asyncio.wait_for(_read_head(reader), timeout)
+
+        sample.ttfb = time.time() - sample.start
+        sample.status = status
+
+        if method != 'HEAD' and status not in _BODYLESS:
+            await asyncio.wait_for(_read_body(reader, length, chunked), timeout)
+
+        sample.latency = time.time() - sample.start
+    except Exception as e:
+        sample.error = e
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return sample
+
+
+async def _read_head(reader):
+    """
+    Reads the status line and headers of a response, skipping 1xx responses
+
+    :returns: The status, the Content-Length (or None) and whether the body is chunked
+    :rtype: tuple
+    """
+
+    while True:
+        line = await reader.readline()
+
+        if not line:
+            raise IOError('The server closed the connection without a response')
+
+        status = int(line.split()[1])
+        length = None
+        chunked = False
+
+        while True:
+            line = await reader.readline()
+
+            if line in (b'\r\n', b'\n', b''):
+                break
+
+            key, _, value = line.decode('latin-1').partition(':')
+            key = key.strip().lower()
+
+            if key == 'content-length':
+                length = int(value)
+            elif key == 'transfer-encoding':
+                chunked = 'chunked' in value.lower()
+
+        if status >= 200:
+            return status, length, chunked
+
+
+async def _read_body(reader, length, chunked):
+    """
+    Reads and discards the body of a response
+    """
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+
+            await reader.readexactly(size + 2)
+
+            if not size:
+                return
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        while await reader.read(CHUNK_SIZE):
+            pass
+
+
+class _Schedule(object):
+    def __init__(self, rate=None, duration=None, requests=None):
+        """
+        Hands out the uploads to the workers, and when to start each of them
+        """
+
+        import threading
+
+        self.rate = rate
+        self.duration = duration
+        self.requests = requests
+        self.start = time.time()
+        self.index = 0
+        self.lock = threading.Lock()
+
+    def next(self):
+        """
+        Returns the number of the next upload and when to start it, or None
+        once the test is over
+
+        :rtype: tuple
+        """
+
+        with self.lock:
+            if self.requests is not None and self.index >= self.requests:
+                return None
+
+            at = self.start + float(self.index) / self.rate if self.rate else time.time()
+
+            if self.duration is not None and at - self.start >= self.duration:
+                return None
+
+            self.index += 1
+
+            return self.index - 1, at
+
+
+def run(url, forms, concurrency=1, rate=None, duration=10.0, requests=None, mode=THREADS, method='POST',
+        headers=None, timeout=None, chunk_size=CHUNK_SIZE):
+    """
+    Runs a load test.
+
+    Uploads are started until ``duration`` seconds have passed or ``requests``
+    uploads were started, whichever comes first, and the ones in flight are
+    waited for. With a ``rate``, uploads are started on a fixed schedule, and
+    when every worker is busy the late ones start as soon as a worker is free.
+
+    :param url:         The URL to upload to
+    :param forms:       A function that takes the number of an upload and returns
+                        the form to send, such as :func:`synthetic_forms`
+    :param concurrency: The number of uploads in flight at most
+    :param rate:        The target number of uploads started per second, as many as
+                        the workers can send by default
+    :param duration:    How long to start uploads for, in seconds, or None
+    :param requests:    How many uploads to start, or None
+    :param mode:        ``'threads'`` or ``'asyncio'``
+    :param method:      The HTTP method
+    :param headers:     Extra request headers
+    :param timeout:     The socket timeout, in seconds
+    :param chunk_size:  The number of bytes to encode at once
+
+    :rtype: Report
+    """
+
+    if duration is None and requests is None:
+        raise ValueError('A duration or a number of requests is needed')
+
+    if mode not in (THREADS, ASYNCIO):
+        raise ValueError('mode must be \'{}\' or \'{}\''.format(THREADS, ASYNCIO))
+
+    schedule = _Schedule(rate, duration, requests)
+    samples = []
+
+    def arguments(index):
+        return dict(index=index, method=method, headers=headers, timeout=timeout, chunk_size=chunk_size)
+
+    if mode == THREADS:
+        import threading
+
+        def worker():
+            while True:
+                slot = schedule.next()
+
+                if slot is None:
+                    return
+
+                index, at = slot
+                time.sleep(max(at - time.time(), 0))
+                samples.append(upload(url, forms(index), **arguments(index)))
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+    else:
+        import asyncio
+
+        async def worker():
+            while True:
+                slot = schedule.next()
+
+                if slot is None:
+                    return
+
+                index, at = slot
+                await asyncio.sleep(max(at - time.time(), 0))
+                samples.append(await upload_async(url, forms(index), **arguments(index)))
+
+        async def main():
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+        asyncio.run(main())
+
+    samples.sort(key=lambda sample: sample.index)
+
+    return Report(samples, time.time() - schedule.start)
+
+
+class SinkServer(object):
+    def __init__(self, status=200, delay=0.0, host='127.0.0.1', port=0):
+        """
+        A local HTTP server that reads and discards every upload, as a stand-in
+        for a real endpoint. Use it as a context manager:
+
+            >>> with SinkServer() as sink:
+            ...     report = run(sink.url, synthetic_forms(1024 ** 2), requests=100)
+
+        :param status:  The status to reply with
+        :param delay:   How long to wait before replying, in seconds
+        :param host:    The address to listen on
+        :param port:    The port to listen on, a free one by default
+        """
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def discard(self):
+                received = 0
+
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    while True:
+                        size = int(self.rfile.readline().split(b';')[0], 16)
+
+                        if not size:
+                            self.rfile.readline()
+                            return received
+
+                        received += _skip(self.rfile, size)
+                        self.rfile.readline()
+
+                return _skip(self.rfile, int(self.headers.get('Content-Length', 0)))
+
+            def handle_upload(self):
+                received = self.discard()
+
+                with self.server.lock:
+                    self.server.uploads += 1
+                    self.server.received += received
+
+                if delay:
+                    time.sleep(delay)
+
+                reply = 'received {} bytes'.format(received).encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(reply)))
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(reply)
+                self.close_connection = True
+
+            do_POST = do_PUT = handle_upload
+
+        import threading
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.uploads = 0
+        self.server.received = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(*self.server.server_address[:2])
+
+    @property
+    def uploads(self):
+        """ int: The number of uploads received """
+        return self.server.uploads
+
+    @property
+    def received(self):
+        """ int: The combined size of every body received """
+        return self.server.received
+
+    def start(self):
+        import threading
+
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def _skip(fh, size):
+    """
+    Reads and discards ``size`` bytes
+
+    :rtype: int
+    """
+
+    remaining = size
+
+    while remaining:
+        block = fh.read(min(remaining, CHUNK_SIZE))
+
+        if not block:
+            break
+
+        remaining -= len(block)
+
+    return size - remaining
+
+
+def parse_size(value):
+    """
+    Parses a size such as ``512``, ``64K``, ``10M`` or ``1G`` (powers of 1024)
+
+    :rtype: int
+    """
+
+    text = value.strip().upper()
+
+    if text.endswith('B'):
+        text = text[:-1]
+
+    suffix = text[-1:] if text[-1:] in _SIZE_SUFFIXES else ''
+
+    try:
+        size = int(float(text[:len(text) - len(suffix)]) * _SIZE_SUFFIXES[suffix])
+    except (ValueError, OverflowError):
+        raise ValueError('Invalid size \'{}\''.format(value))
+
+    if size < 0:
+        raise ValueError('The size must not be negative, not \'{}\''.format(value))
+
+    return size
+
+
+def build_parser():
+    """
+    Creates the argument parser for ``poster loadgen``
+
+    :rtype: argparse.ArgumentParser
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='poster loadgen', description='Load test an upload endpoint.')
+    parser.add_argument('url', nargs='?', help='The URL to upload to')
+    parser.add_argument('--sink', action='store_true', help='Upload to a local server that discards the uploads')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='The number of uploads in flight')
+    parser.add_argument('-r', '--rate', type=float, default=None, help='The target uploads started per second')
+    parser.add_argument('-d', '--duration', type=float, default=None,
+                        help='How long to start uploads for, in seconds (default: 10 without --requests)')
+    parser.add_argument('-n', '--requests', type=int, default=None, help='How many uploads to start')
+    parser.add_argument('--size', default='1M', help='The size of every file part, e.g. 64K, 10M (default: 1M)')
+    parser.add_argument('--files', type=int, default=1, help='The number of file parts in every form')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the random content')
+    parser.add_argument('--mode', choices=(THREADS, ASYNCIO), default=THREADS, help='How to run the workers')
+    parser.add_argument('-H', '--header', dest='headers', action='append', default=[], metavar='HEADER',
+                        help='An extra request header, e.g. "Authorization: Bearer ..."')
+    parser.add_argument('-X', '--request', dest='method', default='POST', help='The HTTP method (default: POST)')
+    parser.add_argument('--timeout', type=float, default=None, help='The socket timeout, in seconds')
+
+    return parser
+
+
+def main(argv=None, out=sys.stdout, err=sys.stderr):
+    """
+    The entry point of ``poster loadgen``
+
+    :returns: The exit status, 1 if any upload failed
+    :rtype: int
+    """
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if bool(args.url) == args.sink:
+        parser.error('Give either a URL or --sink')
+
+    try:
+        size = parse_size(args.size)
+    except ValueError as e:
+        parser.error(str(e))
+
+    duration = args.duration if args.duration is not None or args.requests is not None else 10.0
+    headers = {}
+
+    for header in args.headers:
+        key, _, value = header.partition(':')
+        headers[key.strip()] = value.strip()
+
+    sink = SinkServer().start() if args.sink else None
+
+    try:
+        report = run(sink.url if sink else args.url, synthetic_forms(size, args.files, args.seed),
+                     concurrency=args.concurrency, rate=args.rate, duration=duration, requests=args.requests,
+                     mode=args.mode, method=args.method, headers=headers, timeout=args.timeout)
+    finally:
+        if sink:
+            sink.stop()
+
+    out.write(report.format() + '\n')
+    out.flush()
+
+    for sample in report.samples:
+        if sample.error is not None:
+            err.write('upload {}: {}\n'.format(sample.index, sample.error))
+
+    return 0 if not report.errors else 1
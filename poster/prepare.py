@@ -0,0 +1,422 @@
+"""
+Preparing the parts of a form in worker processes, for CPU-heavy transforms
+such as compression and hashing that a single Python thread can't keep up
+with for large attachments.
+
+A :class:`FormSpec` describes a form with paths, byte ranges and options
+instead of open file handles, so it can be pickled and its parts handed out
+to a process pool. Every part that needs work is compressed into its own
+spool file and/or hashed by a worker, then the parent builds a form that
+streams the results:
+
+    >>> spec = FormSpec()
+    >>> spec.add_data('id', '1234')
+    >>> spec.add_file('log', '/var/log/big.log', compress='gzip', digest='sha256')
+    >>> prepared = spec.prepare(processes=4)
+    >>> prepared.parts[1].digest
+    >>> send(url, prepared)
+    >>> prepared.remove()
+
+The hex digest of a hashed part is sent in a text field after it, named
+after the part and the algorithm, such as ``log.sha256`` above.
+"""
+
+from .form import Form
+from .form_data import CHUNK_SIZE
+from .sources import FileRangeSource
+
+import os
+
+COMPRESSORS = ('gzip', 'bz2', 'xz')
+""" tuple: The names of the supported compression formats """
+
+# The suffix added to the filename of a compressed part
+_SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz'}
+
+
+class PartSpec(object):
+    def __init__(self, name, value=None, path=None, filename=None, mime_type=None, offset=0, length=None,
+                 compress=None, digest=None):
+        """
+        A picklable description of one field of a :class:`FormSpec`, either a
+        text ``value`` or a range of the file at ``path``.
+
+        :param name:        The name of the field
+        :param value:       The content of a text field
+        :param path:        The path of the file, for file fields
+        :param filename:    The filename to send, defaults to the name of the file
+        :param mime_type:   The MIME type to declare, guessed from the filename by default
+        :param offset:      Where the content starts in the file
+        :param length:      The number of bytes of content, defaults to the rest of the file
+        :param compress:    Compress the content with ``'gzip'``, ``'bz2'`` or ``'xz'``
+        :param digest:      The name of a :mod:`hashlib` algorithm to hash the content
+                            with, as it is sent (after compression). The hex digest
+                            is sent in a text field named ``<name>.<digest>``, right
+                            after the file.
+        """
+
+        self.name = name
+        self.value = value
+        self.path = path
+        self.filename = filename
+        self.mime_type = mime_type
+        self.offset = offset
+        self.length = length
+        self.compress = compress
+        self.digest = digest
+
+    @property
+    def needs_work(self):
+        """
+        Whether this part has to be prepared by a worker
+
+        :rtype: bool
+        """
+
+        return self.path is not None and bool(self.compress or self.digest)
+
+
+class PreparedPart(object):
+    def __init__(self, spool=None, size=None, digest=None):
+        """
+        What a worker made of a :class:`PartSpec`.
+
+        :param spool:   The path of the compressed content, None if it wasn't compressed
+        :param size:    The size of the content as it is sent
+        :param digest:  The hex digest of the content as it is sent, if one was asked for
+        """
+
+        self.spool = spool
+        """ str: The path of the compressed content, None if it wasn't compressed """
+
+        self.size = size
+        """ int: The size of the content as it is sent """
+
+        self.digest = digest
+        """ str: The hex digest of the content as it is sent """
+
+
+def _compressor(name):
+    """
+    Creates a compressor object, with ``compress()`` and ``flush()``
+
+    :param name: One of :data:`COMPRESSORS`
+    """
+
+    if name == 'gzip':
+        import zlib
+
+        # A wbits of 16 + 15 writes a gzip header, with no timestamp so the
+        # output only depends on the input
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    if name == 'bz2':
+        import bz2
+
+        return bz2.BZ2Compressor()
+
+    import lzma
+
+    return lzma.LZMACompressor()
+
+
+def prepare_part(part, spool, chunk_size=CHUNK_SIZE):
+    """
+    Compresses and/or hashes one part, this is what the worker processes run.
+
+    :param part:        The part to prepare
+    :type part:         PartSpec
+    :param spool:       Where to write the compressed content
+    :param chunk_size:  The number of bytes to read at once
+
+    :rtype: PreparedPart
+    """
+
+    import hashlib
+
+    hasher = hashlib.new(part.digest) if part.digest else None
+    compressor = _compressor(part.compress) if part.compress else None
+    remaining = part.length
+    size = 0
+
+    out = open(spool, 'wb') if compressor else None
+
+    def emit(block):
+        if hasher:
+            hasher.update(block)
+
+        if out:
+            out.write(block)
+
+        return len(block)
+
+    try:
+        with open(part.path, 'rb') as fh:
+            fh.seek(part.offset)
+
+            while remaining is None or remaining > 0:
+                block = fh.read(chunk_size if remaining is None else min(chunk_size, remaining))
+
+                if not block:
+                    break
+
+                if remaining is not None:
+                    remaining -= len(block)
+
+                size += emit(compressor.compress(block) if compressor else block)
+
+            if compressor:
+                size += emit(compressor.flush())
+    finally:
+        if out:
+            out.close()
+
+    if remaining:
+        raise IOError('\'{}\' ended {} bytes before the end of its range'.format(part.path, remaining))
+
+    return PreparedPart(spool if compressor else None, size, hasher.hexdigest() if hasher else None)
+
+
+class FormSpec(object):
+    def __init__(self, fields=None, boundary=None):
+        """
+        A picklable description of a form, with paths and options instead of
+        open files, whose parts can be prepared in worker processes with
+        :meth:`prepare`.
+
+        :param fields:      A list of PartSpec objects
+        :param boundary:    The boundary to use, see :class:`poster.Form`
+        """
+
+        self.fields = list(fields or [])
+        """ list: The PartSpec of every field, in order """
+
+        self.boundary = boundary
+        """ str: The boundary of the form, a random one is generated if it's None """
+
+    @classmethod
+    def from_form(cls, form):
+        """
+        Describes an existing Form, whose files must all be
+        :class:`poster.sources.FileSource` or FileRangeSource objects (such as
+        the ones created when :meth:`poster.Form.add_file` is given a path).
+
+        :rtype: FormSpec
+        """
+
+        from .field_table import FieldTable
+        from .sources import FileSource
+
+        from urllib.parse import unquote
+
+        # The boundary of the form is quoted, and would be quoted again
+        spec = cls(boundary=unquote(form.boundary))
+
+        for field in form.data:
+            if isinstance(field, FieldTable):
+                for name, value in field:
+                    spec.add_data(name, value)
+            elif field.file is None:
+                spec.add_data(field.name, field.content)
+            elif isinstance(field.file, FileSource):
+                spec.add_file(field.name, field.file.path, filename=field.filename, mime_type=field.mime_type)
+            elif isinstance(field.file, FileRangeSource):
+                spec.add_file(field.name, field.file.path, filename=field.filename, mime_type=field.mime_type,
+                              offset=field.file.offset, length=field.file.size)
+            else:
+                raise ValueError('\'{}\' is not a file on disk, so it can\'t be described by a FormSpec'.format(
+                    field.name))
+
+        return spec
+
+    def add_data(self, name, value):
+        """
+        Adds a text field
+
+        :rtype: PartSpec
+        """
+
+        if not name or not isinstance(name, str):
+            raise ValueError('You must provide a valid name')
+
+        if not value or not isinstance(value, str):
+            raise ValueError('You must provide a valid content as a string')
+
+        part = PartSpec(name, value=value)
+        self.fields.append(part)
+
+        return part
+
+    def add_file(self, name, path, filename=None, mime_type=None, offset=0, length=None, compress=None,
+                 digest=None):
+        """
+        Adds a file field, see :class:`PartSpec` for the parameters.
+
+        :rtype: PartSpec
+        """
+
+        if not name or not isinstance(name, str):
+            raise ValueError('You must provide a valid name')
+
+        if not os.path.isfile(path):
+            raise IOError('\'{}\' could not be located'.format(path))
+
+        if compress is not None and compress not in COMPRESSORS:
+            raise ValueError('Unknown compression \'{}\', expected one of {}'.format(compress, ', '.join(COMPRESSORS)))
+
+        if digest is not None:
+            import hashlib
+
+            # Fail now rather than in a worker
+            hashlib.new(digest)
+
+        part = PartSpec(name, path=path, filename=filename or os.path.basename(path), mime_type=mime_type,
+                        offset=offset, length=length, compress=compress, digest=digest)
+        self.fields.append(part)
+
+        return part
+
+    def build(self, prepared=None):
+        """
+        Builds the Form, streaming each part from its prepared spool file if it
+        was compressed, and from the original file otherwise.
+
+        :param prepared:    A PreparedPart (or None) for every field
+
+        :rtype: poster.Form
+        """
+
+        form = Form(boundary=self.boundary)
+        prepared = prepared or [None] * len(self.fields)
+
+        for part, result in zip(self.fields, prepared):
+            if part.path is None:
+                form.add_data(part.name, part.value)
+                continue
+
+            if result is not None and result.spool is not None:
+                source = FileRangeSource(result.spool)
+                filename = part.filename + _SUFFIXES[part.compress]
+            else:
+                source = FileRangeSource(part.path, part.offset, part.length)
+                filename = part.filename
+
+            form.add_file(part.name, source, filename=filename, mime_type=part.mime_type)
+
+            if result is not None and result.digest is not None:
+                form.add_data('{}.{}'.format(part.name, part.digest), result.digest)
+
+        return form
+
+    def prepare(self, directory=None, processes=None, executor=None, chunk_size=CHUNK_SIZE):
+        """
+        Compresses and hashes the parts that ask for it in parallel, each in a
+        worker process, and builds a form that streams the results.
+
+        :param directory:   Where to write the compressed parts, a new temporary
+                            directory by default, which :meth:`PreparedForm.remove`
+                            deletes
+        :param processes:   The number of worker processes, the number of CPUs by default
+        :param executor:    A ``concurrent.futures`` executor to use instead of
+                            starting a new process pool
+        :param chunk_size:  The number of bytes the workers read at once
+
+        :rtype: PreparedForm
+        """
+
+        created = None
+
+        if directory is None:
+            import tempfile
+
+            directory = created = tempfile.mkdtemp(prefix='poster-')
+
+        work = [(index, part) for index, part in enumerate(self.fields) if part.needs_work]
+        prepared = [None] * len(self.fields)
+
+        if work:
+            owned = executor is None
+
+            if owned:
+                from concurrent.futures import ProcessPoolExecutor
+
+                executor = ProcessPoolExecutor(max_workers=processes)
+
+            try:
+                futures = []
+
+                for index, part in work:
+                    spool = os.path.join(directory, 'part-{}'.format(index))
+                    futures.append((index, executor.submit(prepare_part, part, spool, chunk_size)))
+
+                for index, future in futures:
+                    prepared[index] = future.result()
+            except BaseException:
+                if created is not None:
+                    import shutil
+
+                    shutil.rmtree(created, ignore_errors=True)
+
+                raise
+            finally:
+                if owned:
+                    executor.shutdown()
+
+        return PreparedForm(self.build(prepared), prepared, created)
+
+
+class PreparedForm(object):
+    def __init__(self, form, parts, directory=None):
+        """
+        A form whose parts were prepared by :meth:`FormSpec.prepare`, which can
+        be passed anywhere a form can, such as :func:`poster.streaminghttp.send`.
+
+        :param form:        The form that streams the prepared parts
+        :param parts:       A PreparedPart for every field of the spec, None for
+                            the fields that needed no work
+        :param directory:   The temporary directory the spool files were written
+                            to, which :meth:`remove` deletes
+        """
+
+        self.form = form
+        """ Form: The form that streams the prepared parts """
+
+        self.parts = parts
+        """ list: A PreparedPart, or None, for every field of the spec """
+
+        self.directory = directory
+        """ str: The temporary directory that holds the spool files, None if it was given to prepare() """
+
+    @property
+    def content_type(self):
+        return self.form.content_type
+
+    @property
+    def content_length(self):
+        return self.form.content_length
+
+    @property
+    def headers(self):
+        return self.form.headers
+
+    def iter_encode(self, cb=None, chunk_size=CHUNK_SIZE, pool=None):
+        return self.form.iter_encode(cb=cb, chunk_size=chunk_size, pool=pool)
+
+    def encode(self, cb=None):
+        return self.form.encode(cb)
+
+    def remove(self):
+        """
+        Deletes the spool files of the compressed parts, and the temporary
+        directory they were written to
+        """
+
+        for part in self.parts:
+            if part is not None and part.spool is not None and os.path.exists(part.spool):
+                os.remove(part.spool)
+
+        if self.directory is not None:
+            import shutil
+
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
@@ -0,0 +1,207 @@
+"""
+A read-ahead stage for streaming forms, which reads the upcoming chunks of a
+form in a background thread while the current ones are being sent, so slow
+storage and the network are busy at the same time.
+
+    >>> from poster.readahead import ReadAhead
+    >>> reader = ReadAhead(form, depth=16, chunk_size=1024 * 1024)
+    >>> send(url, reader)
+    >>> reader.stats()
+"""
+
+from .form_data import CHUNK_SIZE
+
+import time
+
+
+class _Failure(object):
+    def __init__(self, error):
+        """
+        Carries an exception raised by the reader thread over to the sender
+        """
+
+        self.error = error
+
+
+_DONE = object()
+""" Marks the end of the form in the queue """
+
+
+class ReadAhead(object):
+    def __init__(self, form, depth=8, chunk_size=CHUNK_SIZE, pool=None):
+        """
+        Wraps a form so that its chunks are read ahead by a background thread,
+        into a queue of at most ``depth`` chunks of up to ``chunk_size`` bytes.
+
+        The wrapper has the same ``content_type``, ``content_length`` and
+        ``iter_encode()`` as the form, so it can be passed anywhere a form can,
+        such as :func:`poster.streaminghttp.send`.
+
+        :param form:        The form to read ahead
+        :type form:         poster.Form
+        :param depth:       The maximum number of chunks to hold in memory
+        :param chunk_size:  The maximum number of bytes to read from a file at once
+        :param pool:        A pool of buffers to read files into, which the sender
+                            releases, see :mod:`poster.buffers`
+        """
+
+        if depth < 1:
+            raise ValueError('depth must be at least 1')
+
+        self.form = form
+        """ Form: The form being read ahead """
+
+        self.depth = depth
+        """ int: The maximum number of chunks waiting to be sent """
+
+        self.chunk_size = chunk_size
+        """ int: The maximum number of bytes read from a file at once """
+
+        self.pool = pool
+        """ BufferPool: The pool that files are read into, if any """
+
+        self.chunks = 0
+        """ int: The number of chunks that have been read """
+
+        self.reader_stalls = 0
+        """ int: The number of times the reader had to wait because the queue was full """
+
+        self.reader_stall_time = 0.0
+        """ float: The total time the reader spent waiting for the sender, in seconds """
+
+        self.sender_stalls = 0
+        """ int: The number of times the sender had to wait because the queue was empty """
+
+        self.sender_stall_time = 0.0
+        """ float: The total time the sender spent waiting for the reader, in seconds """
+
+    @property
+    def content_type(self):
+        return self.form.content_type
+
+    @property
+    def content_length(self):
+        return self.form.content_length
+
+    @property
+    def headers(self):
+        return self.form.headers
+
+    def _read(self, queue, stopped, cb, pool):
+        """
+        The body of the reader thread, which fills the queue until the form has
+        been read or the sender has stopped.
+        """
+
+        try:
+            from Queue import Full
+        except ImportError:  # pragma: no cover
+            from queue import Full
+
+        def put(item):
+            try:
+                queue.put(item, block=False)
+                return
+            except Full:
+                pass
+
+            # The sender is the bottleneck
+            self.reader_stalls += 1
+            start = time.time()
+
+            while not stopped.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    break
+                except Full:
+                    pass
+
+            self.reader_stall_time += time.time() - start
+
+        if pool is not None:
+            blocks = self.form.iter_encode(cb=cb, chunk_size=self.chunk_size, pool=pool)
+        else:
+            blocks = self.form.iter_encode(cb=cb, chunk_size=self.chunk_size)
+
+        try:
+            for block in blocks:
+                if stopped.is_set():
+                    return
+
+                self.chunks += 1
+                put(block)
+
+            put(_DONE)
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            # Closes the files and sources the form had open when it stopped
+            blocks.close()
+
+    def iter_encode(self, cb=None, chunk_size=None, pool=None):
+        """
+        Yields the encoded form, read by a new background thread every time
+        this is called.
+
+        :param cb:          The callback passed on to the form's ``iter_encode()``,
+                            it is called from the reader thread
+        :param chunk_size:  Ignored, the chunk size is set when the ReadAhead is created
+        :param pool:        A pool of buffers to use instead of the one set when
+                            the ReadAhead was created
+
+        :rtype: generator
+        """
+
+        import threading
+
+        try:
+            from Queue import Queue, Empty
+        except ImportError:  # pragma: no cover
+            from queue import Queue, Empty
+
+        queue = Queue(maxsize=self.depth)
+        stopped = threading.Event()
+
+        thread = threading.Thread(target=self._read, args=(queue, stopped, cb, pool or self.pool))
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                try:
+                    item = queue.get(block=False)
+                except Empty:
+                    # The reader is the bottleneck
+                    self.sender_stalls += 1
+                    start = time.time()
+                    item = queue.get()
+                    self.sender_stall_time += time.time() - start
+
+                if item is _DONE:
+                    break
+
+                if isinstance(item, _Failure):
+                    raise item.error
+
+                yield item
+        finally:
+            stopped.set()
+            thread.join()
+
+    def stats(self):
+        """
+        Returns how often, and for how long, each side waited for the other.
+
+        A sender that stalls a lot means reading is the bottleneck, a deeper
+        queue won't help then. A reader that stalls a lot means the network is.
+
+        :rtype: dict
+        """
+
+        return {
+            'chunks': self.chunks,
+            'reader_stalls': self.reader_stalls,
+            'reader_stall_time': self.reader_stall_time,
+            'sender_stalls': self.sender_stalls,
+            'sender_stall_time': self.sender_stall_time,
+        }
@@ -0,0 +1,377 @@
+"""
+Content sources, which produce the content of a FormData object only when
+the form is encoded, instead of being read from a file handler that has to
+stay open for the whole lifetime of the form.
+"""
+
+import os
+
+
+class ContentSource(object):
+    """
+    The base class for content sources.
+
+    A source has a ``name``, used as the filename of the part, and a ``size``
+    in bytes that is known before the content is produced. :meth:`open` is
+    called every time the form is encoded and must return a new binary
+    file-like object, which is closed as soon as its content has been read.
+    """
+
+    name = None
+    """ str: The filename to use for the part """
+
+    size = None
+    """ int: The exact number of bytes that open() will produce, or None if it isn't known in advance """
+
+    def open(self):
+        """
+        Returns a new binary file-like object that reads the content
+
+        :rtype: file
+        """
+
+        raise NotImplementedError
+
+
+class _IterReader(object):
+    def __init__(self, blocks, close=None):
+        """
+        A read-only file-like object over an iterable of byte strings, used
+        by sources that generate their content.
+
+        :param blocks:  The byte strings to read
+        :param close:   Called when the reader is closed, if given
+        """
+
+        self.blocks = iter(blocks)
+        self.buffer = b''
+        self.on_close = close
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            content, self.buffer = self.buffer + b''.join(self.blocks), b''
+
+            return content
+
+        # Hand out whole blocks where possible, rather than copying them
+        while not self.buffer:
+            block = next(self.blocks, None)
+
+            if block is None:
+                return b''
+
+            self.buffer = block
+
+        block, self.buffer = self.buffer[:size], self.buffer[size:]
+
+        return block
+
+    def close(self):
+        close = getattr(self.blocks, 'close', None)
+
+        if close:
+            close()
+
+        if self.on_close:
+            self.on_close()
+            self.on_close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FileSource(ContentSource):
+    def __init__(self, path, filename=None):
+        """
+        The content of a file on disk, which is only opened while it is being
+        read. Only its size is looked up when the source is created.
+
+        :param path:        The path of the file
+        :param filename:    The filename to use for the part, defaults to the path
+        """
+
+        self.path = path
+        """ str: The path of the file """
+
+        self.name = filename or path
+
+        self.stat = os.stat(path)
+        """ os.stat_result: The result of stat()ing the file when the source was created """
+
+        self.size = self.stat.st_size
+
+    def open(self):
+        return open(self.path, 'rb')
+
+
+class _RangeReader(object):
+    def __init__(self, fh, length):
+        """
+        Reads at most ``length`` bytes from ``fh``, from its current position
+        """
+
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+
+        block = self.fh.read(size)
+        self.remaining -= len(block)
+
+        return block
+
+    def close(self):
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FileRangeSource(ContentSource):
+    def __init__(self, path, offset=0, length=None, filename=None):
+        """
+        A range of bytes of a file on disk, which is only opened while it is
+        being read.
+
+        :param path:        The path of the file
+        :param offset:      Where the range starts
+        :param length:      The number of bytes in the range, defaults to the rest of the file
+        :param filename:    The filename to use for the part, defaults to the path
+        """
+
+        self.path = path
+        """ str: The path of the file """
+
+        self.offset = offset
+        """ int: Where the range starts in the file """
+
+        self.name = filename or path
+
+        available = max(os.stat(path).st_size - offset, 0)
+
+        self.size = available if length is None else length
+
+        if self.size > available:
+            raise ValueError('\'{}\' is shorter than the range of {} bytes at {}'.format(path, length, offset))
+
+    def open(self):
+        fh = open(self.path, 'rb')
+        fh.seek(self.offset)
+
+        return _RangeReader(fh, self.size)
+
+
+class CommandError(IOError):
+    def __init__(self, args, returncode):
+        """
+        Raised while encoding a form when the command of a
+        :class:`CommandSource` exits with a non-zero status, so the upload
+        is aborted instead of sending truncated output.
+
+        :param args:        The command that was run
+        :param returncode:  Its exit status
+        """
+
+        IOError.__init__(self, 'Command {!r} exited with status {}'.format(args, returncode))
+
+        self.command = args
+        """ list: The command that was run """
+
+        self.returncode = returncode
+        """ int: The exit status of the command """
+
+
+class Splice(object):
+    def __init__(self, fd, limit):
+        """
+        A chunk of a pipe that the sender moves straight to its socket with
+        ``os.splice()``, instead of it being read into memory first. These are
+        only yielded when encoding with ``splice=True``.
+
+        :param fd:      The read end of the pipe
+        :param limit:   The maximum number of bytes in the chunk
+        """
+
+        self.fd = fd
+        self.limit = limit
+
+        self.count = None
+        """ int: The number of bytes that were spliced, set by :meth:`write_to` """
+
+    def __len__(self):
+        return self.count or 0
+
+    def available(self):
+        """
+        Waits for the pipe to have data in it
+
+        :returns: The number of bytes that can be spliced without blocking, up
+                  to the limit, 0 at the end of the pipe
+        :rtype: int
+        """
+
+        import fcntl
+        import select
+        import struct
+        import termios
+
+        select.select([self.fd], [], [])
+
+        waiting = struct.unpack('i', fcntl.ioctl(self.fd, termios.FIONREAD, b'\0\0\0\0'))[0]
+
+        return min(waiting, self.limit)
+
+    def write_to(self, sock, count):
+        """
+        Moves ``count`` bytes from the pipe to the socket, which has to be a
+        plain (not SSL) socket
+        """
+
+        import select
+        import socket
+
+        remaining = count
+
+        while remaining:
+            try:
+                sent = os.splice(self.fd, sock.fileno(), remaining)
+            except BlockingIOError:
+                # Sockets with a timeout are non-blocking underneath
+                if not select.select([], [sock], [], sock.gettimeout())[1]:
+                    raise socket.timeout('timed out')
+
+                continue
+
+            if not sent:
+                raise IOError('The pipe ended {} bytes early'.format(remaining))
+
+            remaining -= sent
+
+        self.count = count
+
+
+class _CommandReader(object):
+    def __init__(self, source, process):
+        """
+        Reads the output of a command started by a :class:`CommandSource`
+        """
+
+        self.source = source
+        self.process = process
+
+        self.position = 0
+        """ int: The number of bytes of output so far """
+
+    @property
+    def splice_fd(self):
+        """
+        The pipe to splice the output from, if the platform can
+
+        :rtype: int
+        """
+
+        if not hasattr(os, 'splice'):  # pragma: no cover
+            return None
+
+        return self.process.stdout.fileno()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            block = self.process.stdout.read()
+        else:
+            # Return whatever the command has written so far
+            block = self.process.stdout.read1(size)
+
+        self.spliced(len(block))
+
+        if size is None or size < 0:
+            self.spliced(0)
+
+        return block
+
+    def spliced(self, count):
+        """
+        Accounts for ``count`` bytes of output, 0 meaning the output ended,
+        and checks that the command succeeded and wrote the size it declared
+        """
+
+        size = self.source.size
+
+        if count:
+            self.position += count
+
+            if size is not None and self.position > size:
+                raise IOError('Command {!r} wrote more than the {} bytes it declared'.format(self.source.args, size))
+
+            return
+
+        returncode = self.process.wait()
+
+        if returncode:
+            raise CommandError(self.source.args, returncode)
+
+        if size is not None and self.position != size:
+            raise IOError('Command {!r} wrote {} bytes but declared {}'.format(self.source.args, self.position, size))
+
+    def close(self):
+        # The form was abandoned before the command finished
+        if self.process.poll() is None:
+            self.process.kill()
+
+        self.process.wait()
+        self.process.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CommandSource(ContentSource):
+    def __init__(self, args, name='output', size=None, cwd=None, env=None, stderr=None):
+        """
+        The output of a command, which is started every time the form is
+        encoded and streamed into the part as it is written.
+
+        The pipe provides backpressure, the command is paused while the upload
+        catches up. Unless the exact ``size`` of the output is given, the form
+        has no content length and is sent with chunked transfer encoding. A
+        command that exits with a non-zero status raises a
+        :class:`CommandError`, aborting the upload. On Linux,
+        :func:`poster.streaminghttp.send` splices the output straight from the
+        pipe to the socket.
+
+            >>> form.add_file('dump', CommandSource(['pg_dump', 'app']), filename='app.sql')
+
+        :param args:    The command and its arguments
+        :param name:    The filename of the part
+        :param size:    The exact number of bytes the command writes, if known
+        :param cwd:     The working directory of the command
+        :param env:     The environment of the command
+        :param stderr:  Where the command's stderr goes, inherited by default
+        """
+
+        self.args = args
+        """ list: The command and its arguments """
+
+        self.name = name
+        self.size = size
+        self.cwd = cwd
+        self.env = env
+        self.stderr = stderr
+
+    def open(self):
+        import subprocess
+
+        process = subprocess.Popen(self.args, stdout=subprocess.PIPE, stderr=self.stderr, cwd=self.cwd, env=self.env)
+
+        return _CommandReader(self, process)
@@ -0,0 +1,149 @@
+"""
+Pre-encoded forms, which are written to disk once and can then be sent any
+number of times without encoding them again.
+"""
+
+from .form_data import CHUNK_SIZE
+
+import os
+
+METADATA_SUFFIX = '.json'
+""" str: The suffix of the file that holds the metadata next to a spooled body """
+
+
+class SpooledForm(object):
+    def __init__(self, path):
+        """
+        Loads a form that was previously written to disk by :meth:`poster.Form.spool`.
+
+        The body is never read into memory, :func:`poster.streaminghttp.send`
+        sends it straight from the file with ``sendfile()`` where possible.
+
+        :param path:    The path of the spooled body, the metadata is read from
+                        the file next to it with the ``.json`` suffix
+        :type path:     str
+        """
+
+        import json
+
+        with open(path + METADATA_SUFFIX) as fh:
+            metadata = json.load(fh)
+
+        self.path = path
+        """ str: The path of the encoded body """
+
+        self.boundary = metadata['boundary']
+        """ str: The boundary used when the form was encoded """
+
+        self.content_length = metadata['content_length']
+        """ int: The exact size of the encoded body, in bytes """
+
+        self.headers = metadata['headers']
+        """ dict: The HTTP headers to send with the body """
+
+        # Make sure the body wasn't changed or truncated since it was spooled
+        if os.path.getsize(path) != self.content_length:
+            raise ValueError('Spooled body \'{}\' does not match its metadata'.format(path))
+
+    @classmethod
+    def write(cls, form, path, cb=None, chunk_size=CHUNK_SIZE):
+        """
+        Encodes a form into ``path`` and writes its metadata next to it.
+
+        :param form:        The form to encode
+        :type form:         poster.Form
+        :param path:        Where to write the encoded body
+        :param cb:          The callback passed on to :meth:`poster.Form.iter_encode`
+        :param chunk_size:  The maximum number of bytes to read from a file at once
+
+        :rtype: SpooledForm
+        """
+
+        import json
+
+        content_length = 0
+
+        with open(path, 'wb') as fh:
+            for block in form.iter_encode(cb=cb, chunk_size=chunk_size):
+                fh.write(block)
+                content_length += len(block)
+
+        metadata = {
+            'boundary': form.boundary,
+            'content_length': content_length,
+            'headers': {
+                'Content-Type': form.content_type,
+                'Content-Length': str(content_length),
+            },
+        }
+
+        with open(path + METADATA_SUFFIX, 'w') as fh:
+            json.dump(metadata, fh)
+
+        return cls(path)
+
+    @property
+    def content_type(self):
+        """
+        The value of the Content-Type header for this form.
+
+        :rtype: str
+        """
+
+        return self.headers['Content-Type']
+
+    def open(self):
+        """
+        Opens the encoded body for reading, the caller must close it.
+
+        :rtype: file
+        """
+
+        return open(self.path, 'rb')
+
+    def iter_encode(self, cb=None, chunk_size=CHUNK_SIZE, pool=None):
+        """
+        Yields the spooled body in chunks, just like :meth:`poster.Form.iter_encode`.
+
+        :param cb:          Called after every chunk with ``(self, position, total)``
+        :param chunk_size:  The maximum number of bytes to read at once
+        :param pool:        A pool of buffers to read the body into, see :mod:`poster.buffers`
+
+        :rtype: generator
+        """
+
+        position = 0
+
+        with self.open() as fh:
+            while True:
+                block = pool.read(fh) if pool is not None else fh.read(chunk_size)
+
+                if not len(block):
+                    break
+
+                position += len(block)
+
+                yield block
+
+                if cb:
+                    cb(self, position, self.content_length)
+
+    def encode(self, cb=None):
+        """
+        Reads the whole spooled body, just like :meth:`poster.Form.encode`.
+
+        :returns: The encoded content and the headers
+        :rtype: tuple
+        """
+
+        content = b''.join(self.iter_encode(cb))
+
+        return content.decode('utf-8'), dict(self.headers)
+
+    def remove(self):
+        """
+        Deletes the spooled body and its metadata from disk.
+        """
+
+        os.remove(self.path)
+        os.remove(self.path + METADATA_SUFFIX)
@@ -1,3 +1,559 @@
+"""
+Streaming HTTP helpers, which send an encoded :class:`poster.Form` over a
+connection chunk by chunk instead of building the whole body in memory.
+"""
+
+from poster.form_data import CHUNK_SIZE
+from poster.sources import Splice
+
+import io
+import os
+
+COALESCE_SIZE = 64 * 1024
+""" int: The default number of bytes gathered up before writing to the socket """
+
+CONTINUE_TIMEOUT = 1.0
+""" float: The default number of seconds to wait for a 100 Continue response """
+
+
+class Response(object):
+    def __init__(self, status, reason, headers, body):
+        """
+        The response returned by the server after a form has been sent.
+
+        :param status:  The HTTP status code
+        :param reason:  The HTTP reason phrase
+        :param headers: A dictionary of the response headers
+        :param body:    The body of the response
+        """
+
+        self.status = status
+        """ int: The HTTP status code """
+
+        self.reason = reason
+        """ str: The HTTP reason phrase """
+
+        self.headers = headers
+        """ dict: The response headers """
+
+        self.body = body
+        """ bytes: The body of the response """
+
+    @property
+    def ok(self):
+        """
+        Whether or not the server accepted the request (a 2xx or 3xx status)
+
+        :rtype: bool
+        """
+
+        return 200 <= self.status < 400
+
+
+def connect(url, timeout=None):
+    """
+    Opens a new HTTP(S) connection for the host in the given URL.
+
+    :param url:     The URL to connect to
+    :param timeout: The socket timeout, in seconds
+
+    :returns: A tuple of the connection and the path to request
+    :rtype: tuple
+    """
+
+    try:  # pragma: no cover
+        import httplib
+        from urlparse import urlsplit
+    except ImportError:  # pragma: no cover
+        import http.client as httplib
+        from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+
+    if parts.scheme == 'http':
+        connection = httplib.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    elif parts.scheme == 'https':
+        connection = httplib.HTTPSConnection(parts.hostname, parts.port, timeout=timeout)
+    else:
+        raise ValueError('Unsupported URL scheme \'{}\''.format(parts.scheme))
+
+    path = parts.path or '/'
+
+    if parts.query:
+        path += '?' + parts.query
+
+    return connection, path
+
+
+def send(url, form, method='POST', headers=None, timeout=None, cb=None, chunk_size=CHUNK_SIZE, pool=None,
+         coalesce=COALESCE_SIZE, expect_continue=False, continue_timeout=CONTINUE_TIMEOUT):
+    """
+    Streams the encoded form to the URL, so that memory usage stays constant
+    regardless of the size of the files.
+
+    When the form knows its ``content_length`` the body is sent with a
+    Content-Length header, otherwise chunked transfer encoding is used. Forms
+    that can ``open()`` their encoded body as a file, such as
+    :class:`poster.SpooledForm`, are sent with ``sendfile()`` so the body is
+    copied straight from the disk to the socket by the kernel. Likewise, on
+    Linux the output of :class:`poster.sources.CommandSource` parts is spliced
+    straight from the pipe to plain (not TLS) sockets.
+
+    If you specify the callback method, it is called after every write to the
+    socket with these three parameters:
+
+        - form      (The ``Form`` object)
+        - current   (The number of body bytes sent so far)
+        - total     (The total number of bytes to send, or None if unknown)
+
+    :param url:         The URL to send the form to
+    :param form:        The form to send
+    :type form:         poster.Form
+    :param method:      The HTTP method to use
+    :param headers:     Any extra headers to send with the request
+    :type headers:      dict
+    :param timeout:     The socket timeout, in seconds
+    :param cb:          The progress callback
+    :param chunk_size:  The maximum number of bytes to read from a file at once
+    :param pool:        A pool of buffers to read files into, each buffer is
+                        released back to the pool once its chunk has been sent
+    :type pool:         poster.buffers.BufferPool
+    :param coalesce:    Small blocks, such as part headers and short text fields,
+                        are gathered up until this many bytes are waiting and
+                        written with a single ``sendmsg()``, see :class:`Writer`
+    :param expect_continue:     Send ``Expect: 100-continue`` and wait for the server
+                                to accept the headers before sending the body. If the
+                                server replies with a final status instead, such as
+                                401 or 413, it is returned without sending the body.
+    :param continue_timeout:    How long to wait for the server to answer, in seconds,
+                                before sending the body anyway
+
+    :returns: The response from the server
+    :rtype: Response
+    """
+
+    connection, path = connect(url, timeout)
+    total = getattr(form, 'content_length', None)
+
+    try:
+        _send_headers(connection, method, path, form, total, headers, expect_continue)
+
+        if expect_continue:
+            early = _await_continue(connection, method, continue_timeout)
+
+            # The server rejected the request before we sent the body
+            if early is not None:
+                return early
+
+        if hasattr(form, 'open') and total is not None:
+            _send_file(connection, form, total, cb, chunk_size)
+        else:
+            writer = Writer(connection.sock, pool=pool, coalesce=coalesce, cb=cb, form=form, total=total)
+            splice = _can_splice(form, connection.sock)
+
+            if total is None:
+                _send_chunked(writer, form, chunk_size, pool, splice)
+            else:
+                _send_body(writer, form, total, chunk_size, pool, splice)
+
+        response = connection.getresponse()
+
+        return Response(response.status, response.reason, dict(response.getheaders()), response.read())
+    finally:
+        connection.close()
+
+
+def _send_headers(connection, method, path, form, total, headers=None, expect_continue=False):
+    """
+    Sends the request line and headers for a form, with a Content-Length if
+    ``total`` is known and chunked transfer encoding otherwise.
+    """
+
+    connection.putrequest(method, path)
+
+    request_headers = {'Content-Type': form.content_type}
+
+    if total is None:
+        request_headers['Transfer-Encoding'] = 'chunked'
+    else:
+        request_headers['Content-Length'] = str(total)
+
+    if expect_continue:
+        request_headers['Expect'] = '100-continue'
+
+    request_headers.update(headers or {})
+
+    for key, value in request_headers.items():
+        connection.putheader(key, value)
+
+    connection.endheaders()
+
+
+def _await_continue(connection, method, timeout):
+    """
+    Waits for the server to answer a request that was sent with
+    ``Expect: 100-continue``.
+
+    :returns: None if the body should be sent, which is the case when the server
+              replied with 100 Continue or didn't reply in time, otherwise the
+              final response that the server replied with
+    :rtype: Response
+    """
+
+    import select
+
+    sock = connection.sock
+
+    if not select.select([sock], [], [], timeout)[0]:
+        # Servers that don't know about 100-continue just wait for the body
+        return None
+
+    # Read without buffering, so nothing after the interim response is consumed
+    raw = sock.makefile('rb', 0)
+    status_line = raw.readline()
+
+    try:
+        status = int(status_line.split(None, 2)[1])
+    except (IndexError, ValueError):
+        raise IOError('Invalid response to Expect: 100-continue: {!r}'.format(status_line))
+
+    if status == 100:
+        # Skip the rest of the interim response
+        while raw.readline() not in (b'\r\n', b'\n', b''):
+            pass
+
+        return None
+
+    return _read_response(status_line, raw, method)
+
+
+class _Prefixed(io.RawIOBase):
+    def __init__(self, prefix, raw):
+        """
+        A stream that returns ``prefix`` before the rest of ``raw``, used to put
+        back a status line that has already been read.
+        """
+
+        self.prefix = prefix
+        self.raw = raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.prefix:
+            return self.raw.readinto(buffer)
+
+        length = min(len(buffer), len(self.prefix))
+        buffer[:length] = self.prefix[:length]
+        self.prefix = self.prefix[length:]
+
+        return length
+
+
+class _ResponseSocket(object):
+    def __init__(self, stream):
+        """
+        Hands a stream to HTTPResponse, which expects a socket
+        """
+
+        self.stream = stream
+
+    def makefile(self, *args, **kwargs):
+        return self.stream
+
+
+def _read_response(status_line, raw, method):
+    """
+    Reads a whole response, of which the status line has already been read.
+
+    :rtype: Response
+    """
+
+    try:  # pragma: no cover
+        import httplib
+    except ImportError:  # pragma: no cover
+        import http.client as httplib
+
+    stream = io.BufferedReader(_Prefixed(status_line, raw))
+
+    response = httplib.HTTPResponse(_ResponseSocket(stream), method=method)
+    response.begin()
+
+    return Response(response.status, response.reason, dict(response.getheaders()), response.read())
+
+
+class Writer(object):
+    def __init__(self, sock, pool=None, coalesce=COALESCE_SIZE, cb=None, form=None, total=None):
+        """
+        Writes blocks to a socket, gathering small blocks up into a single
+        ``sendmsg()`` call so that forms with thousands of small fields don't
+        need thousands of system calls and packets.
+
+        Blocks are queued until at least ``coalesce`` bytes, or as many blocks
+        as the platform allows in one call, are waiting. Sockets without
+        ``sendmsg()``, such as SSL sockets, get the queued blocks joined
+        together instead.
+
+        :param sock:        The connected socket
+        :param pool:        The pool to release sent buffers to, if any
+        :param coalesce:    The number of bytes to gather before writing, 0 writes
+                            every block on its own
+        :param cb:          The progress callback, called after every write
+        :param form:        The form passed to the progress callback
+        :param total:       The total passed to the progress callback
+        """
+
+        self.sock = sock
+        self.pool = pool
+        self.coalesce = coalesce
+        self.cb = cb
+        self.form = form
+        self.total = total
+
+        self.pending = []
+        """ list: The blocks waiting to be written """
+
+        self.pending_size = 0
+        """ int: The number of bytes waiting to be written """
+
+        self.position = 0
+        """ int: The number of bytes written so far """
+
+        self.writes = 0
+        """ int: The number of system calls made to write the body """
+
+        self.max_blocks = _iov_max()
+
+    def write(self, *blocks):
+        """
+        Queues blocks to be written, writing them if enough are waiting.
+        """
+
+        pooled = False
+
+        # A chunk adds several blocks at once, which mustn't take the queue
+        # past the most that sendmsg() accepts
+        if len(self.pending) + len(blocks) > self.max_blocks:
+            self.flush()
+
+        for block in blocks:
+            if not len(block):
+                continue
+
+            self.pending.append(block)
+            self.pending_size += len(block)
+
+            # Pooled buffers are whole file chunks, which gain little from
+            # waiting and should go back to the pool as soon as possible
+            pooled = pooled or (self.pool is not None and isinstance(block, memoryview))
+
+        if pooled or self.pending_size >= self.coalesce or len(self.pending) >= self.max_blocks:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all of the queued blocks.
+        """
+
+        if not self.pending:
+            return
+
+        if hasattr(self.sock, 'sendmsg'):
+            try:
+                self._sendmsg(self.pending)
+            except NotImplementedError:
+                # SSL sockets can't scatter-gather
+                self.writes += 1
+                self.sock.sendall(b''.join(self.pending))
+        else:  # pragma: no cover
+            self.writes += 1
+            self.sock.sendall(b''.join(self.pending))
+
+        self.position += self.pending_size
+
+        if self.pool is not None:
+            for block in self.pending:
+                if isinstance(block, memoryview):
+                    self.pool.release(block)
+
+        self.pending = []
+        self.pending_size = 0
+
+        if self.cb:
+            self.cb(self.form, self.position, self.total)
+
+    def splice(self, block, count):
+        """
+        Writes everything that is queued, then moves ``count`` bytes of a
+        :class:`poster.sources.Splice` straight from its pipe to the socket.
+        """
+
+        if count:
+            self.flush()
+
+        block.write_to(self.sock, count)
+
+        if not count:
+            return
+
+        self.writes += 1
+        self.position += count
+
+        if self.cb:
+            self.cb(self.form, self.position, self.total)
+
+    def _sendmsg(self, blocks):
+        """
+        Sends all of the blocks with sendmsg(), which may only send some of them,
+        at most :attr:`max_blocks` at a time
+        """
+
+        blocks = list(blocks)
+
+        while blocks:
+            sent = self.sock.sendmsg(blocks[:self.max_blocks])
+            self.writes += 1
+
+            # Drop everything that was sent, and the start of a partly sent block
+            while blocks and sent >= len(blocks[0]):
+                sent -= len(blocks.pop(0))
+
+            if sent:
+                blocks[0] = memoryview(blocks[0])[sent:]
+
+
+def _iov_max():
+    """
+    Returns the maximum number of blocks that can be sent with one sendmsg()
+
+    :rtype: int
+    """
+
+    try:
+        return max(1, min(os.sysconf('SC_IOV_MAX'), 1024))
+    except (AttributeError, ValueError, OSError):  # pragma: no cover
+        return 1024
+
+
+def _can_splice(form, sock):
+    """
+    Whether the output of commands in the form can be spliced straight from
+    their pipes to the socket, which needs a Linux kernel and a plain socket
+    (TLS has to encrypt everything in user space).
+
+    :rtype: bool
+    """
+
+    import sys
+
+    from poster.form import Form
+
+    if not hasattr(os, 'splice') or not isinstance(form, Form):
+        return False
+
+    # If ssl was never imported this can't be an SSL socket
+    ssl = sys.modules.get('ssl')
+
+    return ssl is None or not isinstance(sock, ssl.SSLSocket)
+
+
+def _iter_blocks(form, chunk_size, pool, splice=False):
+    """
+    Yields the encoded blocks of the form, with its buffers read from the pool
+    if there is one.
+    """
+
+    kwargs = {'chunk_size': chunk_size}
+
+    if pool is not None:
+        kwargs['pool'] = pool
+
+    if splice:
+        kwargs['splice'] = True
+
+    return form.iter_encode(**kwargs)
+
+
+def _send_chunked(writer, form, chunk_size, pool=None, splice=False):
+    """
+    Sends the form with chunked transfer encoding
+    """
+
+    for block in _iter_blocks(form, chunk_size, pool, splice):
+        if isinstance(block, Splice):
+            count = block.available()
+
+            # Frame whatever is waiting in the pipe as a single HTTP chunk
+            if count:
+                writer.write('{:x}\r\n'.format(count).encode('ascii'))
+
+            writer.splice(block, count)
+
+            if count:
+                writer.write(b'\r\n')
+
+            continue
+
+        # An empty block means the form is waiting for more data, so send
+        # what is queued rather than holding it back until then
+        if not len(block):
+            writer.flush()
+            continue
+
+        # Frame the block as a single HTTP chunk
+        writer.write('{:x}\r\n'.format(len(block)).encode('ascii'), block, b'\r\n')
+
+    # The zero-length chunk terminates the body
+    writer.write(b'0\r\n\r\n')
+    writer.flush()
+
+
+def _send_body(writer, form, total, chunk_size, pool=None, splice=False):
+    """
+    Sends the form as a plain body of a known length
+    """
+
+    for block in _iter_blocks(form, chunk_size, pool, splice):
+        if isinstance(block, Splice):
+            writer.splice(block, block.available())
+        else:
+            writer.write(block)
+
+    writer.flush()
+
+    # A file that changed size since it was added would corrupt the request
+    if writer.position != total:
+        raise IOError('Sent {} bytes but declared a Content-Length of {}'.format(writer.position, total))
+
+
+def _send_file(connection, form, total, cb, chunk_size):
+    """
+    Sends an already encoded body from a file, using sendfile() where the
+    platform supports it.
+    """
+
+    with form.open() as fh:
+        if not hasattr(connection.sock, 'sendfile'):
+            # Python 2 sockets can't sendfile(), the form streams from the file instead
+            return _send_body(Writer(connection.sock, cb=cb, form=form, total=total), form, total, chunk_size)
+
+        if not cb:
+            connection.sock.sendfile(fh)
+            return
+
+        position = 0
+
+        while position < total:
+            sent = connection.sock.sendfile(fh, position, chunk_size)
+
+            if not sent:
+                raise IOError('Spooled body ended after {} of {} bytes'.format(position, total))
+
+            position += sent
+            cb(form, position, total)
+
+
 def register_openers():
     """
     DEPRECATED - This function will be removed in version 1.0.0
@@ -0,0 +1,299 @@
+"""
+Fan-out uploads, which send one form to several URLs at once while encoding
+it (and reading its files) only once.
+
+    >>> from poster.streaminghttp.fanout import fanout
+    >>> results = fanout(['https://a.example.com/upload', 'https://b.example.com/upload'], form)
+    >>> [(result.url, result.ok) for result in results]
+
+Every URL gets its own connection and sender thread, fed from a bounded
+queue of the chunks read by the calling thread. A slow endpoint holds the
+others back only while its queue is full, and one that can't accept a chunk
+for ``stall_timeout`` seconds is dropped, so it can't stall the rest. An
+endpoint that fails only fails its own result.
+"""
+
+from . import CHUNK_SIZE, COALESCE_SIZE, Response, Writer, connect, _send_headers
+
+import time
+
+DEPTH = 16
+""" int: The default number of chunks queued for each endpoint """
+
+STALL_TIMEOUT = 30.0
+""" float: The default number of seconds an endpoint may stop accepting data before it is dropped """
+
+_DONE = object()
+""" Marks the end of the form in a queue """
+
+
+class FanoutResult(object):
+    def __init__(self, url):
+        """
+        The outcome of sending a form to one of the URLs of :func:`fanout`.
+
+        :param url: The URL the form was sent to
+        """
+
+        self.url = url
+        """ str: The URL the form was sent to """
+
+        self.response = None
+        """ Response: The response from the server, None if the upload failed """
+
+        self.error = None
+        """ Exception: Why the upload failed, None if it didn't """
+
+        self.sent = 0
+        """ int: The number of body bytes written to the connection """
+
+        self.stall_time = 0.0
+        """ float: How long the reader waited for this endpoint to catch up, in seconds """
+
+    @property
+    def ok(self):
+        """
+        Whether the form was sent and the server accepted it
+
+        :rtype: bool
+        """
+
+        return self.error is None and self.response is not None and self.response.ok
+
+
+class _Target(object):
+    def __init__(self, url, depth):
+        """
+        The connection, queue and sender thread for one URL
+        """
+
+        try:
+            from Queue import Queue
+        except ImportError:  # pragma: no cover
+            from queue import Queue
+
+        self.result = FanoutResult(url)
+        self.queue = Queue(maxsize=depth)
+        self.connection = None
+        self.thread = None
+
+    def start(self, *args):
+        import threading
+
+        self.thread = threading.Thread(target=self._run, args=args)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self, form, total, method, headers, timeout, coalesce):
+        """
+        The body of the sender thread, which writes the queued chunks until the
+        end of the form and reads the response.
+        """
+
+        try:
+            self.connection, path = connect(self.result.url, timeout)
+
+            # The form may have failed while we were connecting
+            if self.result.error is not None:
+                return
+
+            _send_headers(self.connection, method, path, form, total, headers)
+
+            writer = Writer(self.connection.sock, coalesce=coalesce)
+
+            while True:
+                block = self.queue.get()
+
+                if block is _DONE or self.result.error is not None:
+                    break
+
+                if total is None:
+                    writer.write('{:x}\r\n'.format(len(block)).encode('ascii'), block, b'\r\n')
+                else:
+                    writer.write(block)
+
+                self.result.sent = writer.position
+
+            if self.result.error is not None:
+                return
+
+            if total is None:
+                writer.write(b'0\r\n\r\n')
+
+            writer.flush()
+            self.result.sent = writer.position
+
+            if total is not None and writer.position != total:
+                raise IOError('Sent {} bytes but declared a Content-Length of {}'.format(writer.position, total))
+
+            response = self.connection.getresponse()
+
+            self.result.response = Response(response.status, response.reason, dict(response.getheaders()),
+                                            response.read())
+        except Exception as e:
+            if self.result.error is None:
+                self.result.error = e
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+    def put(self, item, stall_timeout):
+        """
+        Queues an item for the sender, waiting for at most ``stall_timeout``
+        seconds for there to be room before dropping this endpoint.
+        """
+
+        try:
+            from Queue import Full
+        except ImportError:  # pragma: no cover
+            from queue import Full
+
+        try:
+            self.queue.put(item, block=False)
+            return
+        except Full:
+            pass
+
+        start = time.time()
+
+        while self.result.error is None:
+            try:
+                self.queue.put(item, timeout=0.1)
+                break
+            except Full:
+                pass
+
+            if stall_timeout is not None and time.time() - start >= stall_timeout:
+                self.abort(IOError('{} accepted no data for {} seconds'.format(self.result.url, stall_timeout)))
+
+        self.result.stall_time += time.time() - start
+
+    def stop(self, stall_timeout):
+        """
+        Queues the end of the form, or if this endpoint failed, replaces
+        whatever is still queued with it, so its sender never waits for a
+        chunk that won't come.
+        """
+
+        try:
+            from Queue import Empty, Full
+        except ImportError:  # pragma: no cover
+            from queue import Empty, Full
+
+        if self.result.error is None:
+            self.put(_DONE, stall_timeout)
+
+        if self.result.error is None:
+            return
+
+        while True:
+            try:
+                self.queue.put(_DONE, block=False)
+                return
+            except Full:
+                pass
+
+            try:
+                self.queue.get(block=False)
+            except Empty:  # pragma: no cover
+                pass
+
+    def abort(self, error):
+        """
+        Fails this endpoint, and unblocks its sender if it's stuck writing
+        """
+
+        import socket
+
+        if self.result.error is None:
+            self.result.error = error
+
+        sock = getattr(self.connection, 'sock', None)
+
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (OSError, socket.error):  # pragma: no cover
+                pass
+
+
+def fanout(urls, form, method='POST', headers=None, timeout=None, cb=None, chunk_size=CHUNK_SIZE,
+           coalesce=COALESCE_SIZE, depth=DEPTH, stall_timeout=STALL_TIMEOUT):
+    """
+    Streams the encoded form to every one of the URLs at the same time,
+    encoding it only once, so files are read once rather than once per URL.
+
+    At most ``depth`` chunks are queued for each URL, so memory usage doesn't
+    depend on the size of the form or on how far the slowest endpoint lags
+    behind. The chunks are shared between the queues, not copied.
+
+    If you specify the callback method, it is called after every chunk has
+    been queued with these three parameters:
+
+        - form      (The ``Form`` object)
+        - current   (The number of body bytes read so far)
+        - total     (The total number of bytes to send, or None if unknown)
+
+    :param urls:            The URLs to send the form to
+    :param form:            The form to send
+    :type form:             poster.Form
+    :param method:          The HTTP method to use
+    :param headers:         Any extra headers to send with every request
+    :type headers:          dict
+    :param timeout:         The socket timeout, in seconds
+    :param cb:              The progress callback
+    :param chunk_size:      The maximum number of bytes to read from a file at once
+    :param coalesce:        See :func:`poster.streaminghttp.send`
+    :param depth:           The maximum number of chunks queued for each URL
+    :param stall_timeout:   How long an endpoint may accept no data before it is
+                            dropped, in seconds, None to wait for it indefinitely
+
+    :returns: A FanoutResult for every URL, in the same order
+    :rtype: list
+    """
+
+    if depth < 1:
+        raise ValueError('depth must be at least 1')
+
+    total = getattr(form, 'content_length', None)
+    targets = [_Target(url, depth) for url in urls]
+
+    for target in targets:
+        target.start(form, total, method, headers, timeout, coalesce)
+
+    position = 0
+
+    try:
+        for block in form.iter_encode(chunk_size=chunk_size):
+            if not len(block):
+                continue
+
+            live = [target for target in targets if target.result.error is None]
+
+            # Every endpoint failed, there is no point reading any further
+            if not live:
+                break
+
+            for target in live:
+                target.put(block, stall_timeout)
+
+            position += len(block)
+
+            if cb:
+                cb(form, position, total)
+    except Exception as e:
+        # Without the rest of the form none of the uploads can succeed
+        for target in targets:
+            target.abort(e)
+
+        raise
+    finally:
+        for target in targets:
+            target.stop(stall_timeout)
+
+        # The sockets of aborted senders were shut down, so they only wait for
+        # their queue, and each one closes its own connection
+        for target in targets:
+            target.thread.join()
+
+    return [target.result for target in targets]
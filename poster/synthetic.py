@@ -0,0 +1,245 @@
+"""
+Synthetic content sources, for load testing upload endpoints without
+creating large files on disk first.
+
+    >>> form.add_file('blob', RandomSource(10 * 1024 ** 3, seed=42))
+    >>> form.add_file('zeros', ZeroSource(1024 ** 3))
+    >>> form.add_file('text', PatternSource(1024 ** 2, b'poster '))
+
+The content is generated from small precomputed buffers, and is handed out as
+slices of them without copying, so a source produces data much faster than a
+network can carry it. Every byte only depends on the parameters of the source
+and its offset, so the receiving side can check any chunk it gets with a
+:class:`Verifier`, or :meth:`SyntheticSource.verify`, using a source created
+with the same parameters.
+"""
+
+from .sources import ContentSource
+
+MAX_READ = 1024 * 1024
+""" int: The most a synthetic source hands out in a single read """
+
+RANDOM_BLOCK_SIZE = 64 * 1024
+""" int: Random content is made of blocks of this size, each taken from a different place in the pool """
+
+
+class SyntheticSource(ContentSource):
+    """
+    The base class for synthetic sources, whose content is generated from
+    their parameters instead of being read from anywhere.
+    """
+
+    def __init__(self, size, name):
+        if size < 0:
+            raise ValueError('size must not be negative')
+
+        self.size = size
+        self.name = name
+
+    def _window(self, offset, length):
+        """
+        Returns the content that starts at ``offset``, which may be shorter
+        than ``length`` but is never empty
+
+        :rtype: memoryview
+        """
+
+        raise NotImplementedError
+
+    def content(self, offset, length):
+        """
+        Generates ``length`` bytes of content starting at ``offset``
+
+        :rtype: bytes
+        """
+
+        length = max(min(length, self.size - offset), 0)
+        blocks = []
+
+        while length:
+            block = self._window(offset, length)
+            blocks.append(block)
+            offset += len(block)
+            length -= len(block)
+
+        return b''.join(blocks)
+
+    def verify(self, data, offset=0):
+        """
+        Checks that ``data`` is the content that starts at ``offset``.
+
+        :raises ValueError: With the offset of the first wrong byte, if it isn't
+
+        :param data:    The received bytes
+        :param offset:  Where they are in the content
+        """
+
+        data = memoryview(data)
+
+        if offset + len(data) > self.size:
+            raise ValueError('Received {} bytes past the end of the content'.format(offset + len(data) - self.size))
+
+        position = 0
+
+        while position < len(data):
+            expected = self._window(offset + position, len(data) - position)
+            received = data[position:position + len(expected)]
+
+            if received != expected:
+                wrong = next(i for i in range(len(expected)) if received[i] != expected[i])
+
+                raise ValueError('Byte {} does not match the content'.format(offset + position + wrong))
+
+            position += len(expected)
+
+    def open(self):
+        return _SyntheticReader(self)
+
+
+class _SyntheticReader(object):
+    def __init__(self, source):
+        """
+        Reads the content of a synthetic source, as memoryviews of its buffers
+        """
+
+        self.source = source
+        self.position = 0
+
+    def read(self, size=-1):
+        remaining = self.source.size - self.position
+
+        if size is None or size < 0:
+            block = self.source.content(self.position, remaining)
+        elif not remaining or not size:
+            return b''
+        else:
+            block = self.source._window(self.position, min(size, remaining, MAX_READ))
+
+        self.position += len(block)
+
+        return block
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PatternSource(SyntheticSource):
+    def __init__(self, size, pattern=b'poster', name='pattern.bin'):
+        """
+        Content made of a repeated pattern.
+
+        :param size:    The size of the content, in bytes
+        :param pattern: The bytes to repeat
+        :param name:    The filename of the part
+        """
+
+        if not pattern or not isinstance(pattern, bytes):
+            raise ValueError('pattern must be a non-empty byte string')
+
+        super(PatternSource, self).__init__(size, name)
+
+        self.pattern = pattern
+
+        # Enough copies of the pattern to start a read of MAX_READ bytes
+        # anywhere in it
+        self._tile = memoryview(pattern * (MAX_READ // len(pattern) + 2))
+
+    def _window(self, offset, length):
+        start = offset % len(self.pattern)
+
+        return self._tile[start:start + min(length, MAX_READ)]
+
+
+class ZeroSource(PatternSource):
+    def __init__(self, size, name='zeros.bin'):
+        """
+        Content made of zero bytes.
+
+        :param size:    The size of the content, in bytes
+        :param name:    The filename of the part
+        """
+
+        super(ZeroSource, self).__init__(size, b'\0', name)
+
+
+class RandomSource(SyntheticSource):
+    def __init__(self, size, seed=0, name='random.bin', pool_size=4 * 1024 * 1024):
+        """
+        Pseudo-random content, which is the same for the same seed.
+
+        A pool of random bytes is generated once, and every block of
+        :data:`RANDOM_BLOCK_SIZE` bytes of content is taken from a different
+        place in it. The content doesn't compress, but it repeats blocks of the
+        pool, so storage that deduplicates could shrink it.
+
+        :param size:        The size of the content, in bytes
+        :param seed:        The seed of the random generator
+        :param name:        The filename of the part
+        :param pool_size:   The size of the pool of random bytes
+        """
+
+        import random
+
+        super(RandomSource, self).__init__(size, name)
+
+        self.seed = seed
+        self.pool_size = pool_size
+
+        generator = random.Random(seed)
+        self._pool = memoryview(generator.getrandbits(8 * (pool_size + RANDOM_BLOCK_SIZE)).to_bytes(
+            pool_size + RANDOM_BLOCK_SIZE, 'little'))
+
+    def _window(self, offset, length):
+        index, skip = divmod(offset, RANDOM_BLOCK_SIZE)
+
+        # Spread the blocks over the pool with a multiplicative hash
+        start = ((index + 1) * 0x9E3779B97F4A7C15 >> 16) % self.pool_size + skip
+
+        return self._pool[start:start + min(length, RANDOM_BLOCK_SIZE - skip)]
+
+
+class Verifier(object):
+    def __init__(self, source):
+        """
+        Checks content as it is received, one chunk at a time, against a
+        synthetic source created with the same parameters as the sender's.
+
+            >>> verifier = Verifier(RandomSource(size, seed=42))
+            >>> for chunk in chunks:
+            ...     verifier.update(chunk)
+            >>> verifier.finish()
+
+        :param source:  The source that produced the content
+        :type source:   SyntheticSource
+        """
+
+        self.source = source
+
+        self.position = 0
+        """ int: The number of bytes checked so far """
+
+    def update(self, chunk):
+        """
+        Checks the next chunk of content
+
+        :raises ValueError: If it doesn't match
+        """
+
+        self.source.verify(chunk, self.position)
+        self.position += len(chunk)
+
+    def finish(self):
+        """
+        Checks that the whole content was received
+
+        :raises ValueError: If it was cut short
+        """
+
+        if self.position != self.source.size:
+            raise ValueError('Received {} of {} bytes'.format(self.position, self.source.size))
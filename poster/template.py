@@ -0,0 +1,228 @@
+"""
+Precompiled forms, for sending large numbers of forms that only differ in the
+values of a few text fields.
+
+Unlike :meth:`poster.Form.encode`, which returns the body as a str for
+backwards compatibility, rendering returns it as bytes, since that's what is
+sent and a static file part doesn't have to be text.
+"""
+
+from .form import Form
+from .form_data import FormData
+
+_BOUNDARY = object()
+""" A placeholder for the boundary in the compiled pieces of a template """
+
+
+class RenderedForm(object):
+    def __init__(self, segments, content_type):
+        """
+        A single rendering of a :class:`FormTemplate`, which can be passed to
+        :func:`poster.streaminghttp.send` just like a :class:`poster.Form`.
+
+        :param segments:        The encoded body, as a list of byte strings
+        :param content_type:    The value of the Content-Type header
+        """
+
+        self.segments = segments
+        """ list: The encoded body, as a list of byte strings """
+
+        self.content_type = content_type
+        """ str: The value of the Content-Type header """
+
+        self.content_length = sum(len(s) for s in segments)
+        """ int: The exact size of the encoded body, in bytes """
+
+    @property
+    def headers(self):
+        """
+        The HTTP headers to send with the body
+
+        :rtype: dict
+        """
+
+        return {
+            'Content-Type': self.content_type,
+            'Content-Length': str(self.content_length),
+        }
+
+    def iter_encode(self, cb=None, chunk_size=None, pool=None):
+        """
+        Yields the encoded body, just like :meth:`poster.Form.iter_encode`.
+        The body is already in memory, so ``chunk_size`` and ``pool`` are ignored.
+
+        :rtype: generator
+        """
+
+        position = 0
+
+        for segment in self.segments:
+            position += len(segment)
+
+            yield segment
+
+            if cb:
+                cb(self, position, self.content_length)
+
+    def encode(self):
+        """
+        Returns the whole encoded body, as bytes, and its headers.
+
+        :rtype: tuple
+        """
+
+        return b''.join(self.segments), self.headers
+
+
+class FormTemplate(object):
+    def __init__(self, fields, boundary=None):
+        """
+        Compiles a form into byte segments once, so that rendering it only has
+        to splice in the values of the variable fields.
+
+        Every item of ``fields`` is either the name of a variable text field,
+        a ``(name, value)`` tuple for a static text field or a static
+        :class:`poster.FormData` object, whose file is read once here. The
+        order of the fields is kept, and the FormData objects are left as
+        they are.
+
+            >>> template = FormTemplate(['user', ('type', 'event'), 'payload'])
+            >>> body, headers = template.render(user='1', payload='{}')
+
+        :param fields:      The fields of the form
+        :type fields:       list
+        :param boundary:    The boundary to use, one is generated if not provided.
+                            Each render can still use its own boundary.
+        :type boundary:     str
+        """
+
+        form = Form(boundary=boundary)
+
+        self.boundary = form.boundary
+        """ str: The boundary used when a render doesn't provide its own """
+
+        self.variables = []
+        """ list: The names of the variable fields, in order """
+
+        # The pieces are byte strings, the _BOUNDARY placeholder or the index
+        # of a variable value
+        pieces = []
+
+        import copy
+
+        for field in fields:
+            if isinstance(field, str):
+                data = FormData(field, 'value')
+                value = len(self.variables)
+
+                self.variables.append(field)
+            elif isinstance(field, tuple) and len(field) == 2:
+                data = FormData(*field)
+                value = None
+            elif isinstance(field, FormData):
+                # A copy, so the caller's object keeps its boundary
+                data = copy.copy(field)
+                value = None
+            else:
+                raise ValueError('Template fields must be names, (name, value) tuples or FormData objects')
+
+            # Encode with the boundary left out, so it can change per render
+            data.set_boundary('')
+
+            header = data.encode_headers()
+
+            pieces += [b'--', _BOUNDARY, header[2:]]
+
+            if value is None:
+                pieces += [b''.join(data.iter_encode())[len(header):]]
+            else:
+                pieces += [value, b'\r\n']
+
+        pieces += [b'--', _BOUNDARY, b'--']
+
+        if len(set(self.variables)) != len(self.variables):
+            raise ValueError('Variable field names must be unique')
+
+        self.pieces = pieces
+        """ list: The compiled form, with placeholders for the boundary and values """
+
+        self.segments = self._compile(self.boundary)
+        """ list: The compiled form for the default boundary, only values are placeholders """
+
+    def _compile(self, boundary):
+        """
+        Replaces the boundary placeholders and joins all of the static pieces
+        in between the variable values.
+
+        :rtype: list
+        """
+
+        boundary = boundary.encode('utf-8')
+        segments = []
+        static = []
+
+        for piece in self.pieces:
+            if piece is _BOUNDARY:
+                static.append(boundary)
+            elif isinstance(piece, bytes):
+                static.append(piece)
+            else:
+                segments += [b''.join(static), piece]
+                static = []
+
+        segments.append(b''.join(static))
+
+        return segments
+
+    def render_form(self, values=None, boundary=None, **kwargs):
+        """
+        Renders the template into a form object that can be streamed with
+        :func:`poster.streaminghttp.send`.
+
+        The values can be passed as a dictionary, as keyword arguments, or both.
+        Fields named ``values`` or ``boundary`` must be passed in the dictionary.
+
+        :param values:      The values of the variable fields
+        :type values:       dict
+        :param boundary:    A boundary to use for this render only
+
+        :rtype: RenderedForm
+        """
+
+        values = dict(values or {}, **kwargs)
+
+        if len(values) != len(self.variables) or not all(name in values for name in self.variables):
+            raise ValueError('Expected values for exactly these fields: {}'.format(', '.join(self.variables)))
+
+        encoded = []
+
+        for name in self.variables:
+            value = values[name]
+
+            if not isinstance(value, str):
+                raise ValueError('The value of \'{}\' must be a string'.format(name))
+
+            encoded.append(value.encode('utf-8'))
+
+        if boundary is None:
+            boundary = self.boundary
+            segments = self.segments
+        else:
+            boundary = Form(boundary=boundary).boundary
+            segments = self._compile(boundary)
+
+        body = [s if isinstance(s, bytes) else encoded[s] for s in segments]
+
+        return RenderedForm(body, 'multipart/form-data; boundary=--{}'.format(boundary))
+
+    def render(self, values=None, boundary=None, **kwargs):
+        """
+        Renders the template into an encoded body.
+
+        Takes the same parameters as :meth:`render_form`.
+
+        :returns: The encoded body, as bytes, and the headers
+        :rtype: tuple
+        """
+
+        return self.render_form(values, boundary, **kwargs).encode()
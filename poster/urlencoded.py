@@ -0,0 +1,121 @@
+"""
+A fast ``application/x-www-form-urlencoded`` encoder, used by forms that only
+contain text fields (see the ``encoding`` parameter of :class:`poster.Form`).
+
+Values are encoded exactly like ``urllib.parse.quote_plus``, but the whole
+body is escaped at once, with one ``bytes.replace()`` call for each distinct
+character that needs escaping instead of looking at every byte in Python.
+The encoded length is counted with ``bytes.translate()``, without building
+the body.
+"""
+
+CONTENT_TYPE = 'application/x-www-form-urlencoded'
+""" str: The Content-Type of a urlencoded form """
+
+# The bytes that quote_plus() never escapes, space becomes a single +
+_SAFE = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~'
+_SAFE_OR_SPACE = _SAFE + b' '
+
+# Used to join the names and values of all of the fields so that they can be
+# escaped in a single pass, before being replaced by = and &
+_EQUALS = b'\x00'
+_AMPERSAND = b'\x01'
+
+# What every byte is replaced with when it needs escaping
+_ESCAPES = ['%{:02X}'.format(i).encode('ascii') for i in range(256)]
+
+
+def _escape_all(value):
+    """
+    Escapes every byte of ``value`` that quote_plus() would, apart from the
+    ``_EQUALS`` and ``_AMPERSAND`` markers.
+
+    Rather than looking at every byte in Python, each distinct byte that needs
+    escaping is replaced throughout the whole value with ``bytes.replace()``.
+
+    :rtype: bytes
+    """
+
+    unsafe = set(bytearray(value.translate(None, _SAFE_OR_SPACE + _EQUALS + _AMPERSAND)))
+
+    # The escapes contain %, so it must be replaced first
+    if 37 in unsafe:
+        value = value.replace(b'%', _ESCAPES[37])
+        unsafe.discard(37)
+
+    for byte in unsafe:
+        value = value.replace(bytes(bytearray([byte])), _ESCAPES[byte])
+
+    # Any + has been escaped by now
+    return value.replace(b' ', b'+')
+
+
+def quote(value):
+    """
+    Quotes a UTF-8 encoded name or value, with the same output as ``quote_plus``
+
+    :param value:   The encoded string to quote
+    :type value:    bytes
+
+    :rtype: bytes
+    """
+
+    if not value.translate(None, _SAFE_OR_SPACE):
+        return value.replace(b' ', b'+')
+
+    # The markers have to be escaped too when they're on their own
+    return _escape_all(value).replace(_EQUALS, b'%00').replace(_AMPERSAND, b'%01')
+
+
+def quoted_length(value):
+    """
+    The length of :func:`quote` for a UTF-8 encoded string, without quoting it
+
+    :rtype: int
+    """
+
+    # Every byte that needs escaping grows from one byte to three (%XX)
+    return len(value) + 2 * len(value.translate(None, _SAFE_OR_SPACE))
+
+
+def encode_fields(fields):
+    """
+    Encodes (name, value) tuples of UTF-8 encoded strings, returning one
+    ``name=value`` piece per field, joined with ``&`` they make up the body.
+
+    All of the fields are escaped together in one pass, unless one of them
+    contains the bytes used to mark where each name and value ends.
+
+    :rtype: list
+    """
+
+    fields = list(fields)
+
+    if not fields:
+        return []
+
+    body = _AMPERSAND.join([name + _EQUALS + value for name, value in fields])
+
+    if body.count(_EQUALS) != len(fields) or body.count(_AMPERSAND) != len(fields) - 1:
+        return [quote(name) + b'=' + quote(value) for name, value in fields]
+
+    return _escape_all(body).replace(_EQUALS, b'=').split(_AMPERSAND)
+
+
+def fields_length(fields):
+    """
+    The exact length of the body made from (name, value) tuples of UTF-8
+    encoded strings, worked out without encoding them.
+
+    :rtype: int
+    """
+
+    length = 0
+    count = 0
+
+    for name, value in fields:
+        length += quoted_length(name) + quoted_length(value) + 1
+        count += 1
+
+    # The & separators
+    return length + max(count - 1, 0)
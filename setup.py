@@ -25,9 +25,10 @@ multipart/form-data encoding of string or file parameters""",
       author_email='evan@relta.net',
       url='https://github.com/EvanDarwin/poster3',
       license='MIT',
-      packages=find_packages(exclude=['tests', 'tests.*']),
+      packages=find_packages(exclude=['tests', 'tests.*', 'benchmarks', 'benchmarks.*']),
       include_package_data=True,
       zip_safe=True,
+      entry_points={'console_scripts': ['poster = poster.cli:main']},
       extras_require={'poster': ["buildutils", "sphinx"]},
       tests_require=["nose", "webob", "paste"],
       test_suite='nose.collector',
@@ -0,0 +1,104 @@
+"""
+A small HTTP server that records the requests it receives, used by the tests
+that stream forms over a real socket.
+"""
+
+import threading
+
+try:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = b''
+
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+
+                if not size:
+                    self.rfile.readline()
+                    return body
+
+                body += self.rfile.read(size)
+                self.rfile.readline()
+
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def handle_request(self):
+        body = self.read_body()
+
+        self.server.requests.append((self.command, self.path, dict(self.headers.items()), body))
+
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        reply = 'received {} bytes'.format(len(body)).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    do_POST = do_PUT = handle_request
+
+
+class RecordingServer(object):
+    def __init__(self, statuses=None, handler=RecordingHandler):
+        """
+        Runs an HTTP server on a random local port in a background thread.
+
+        :param statuses: The status codes to reply with, in order, then 200
+        """
+
+        self.server = HTTPServer(('127.0.0.1', 0), handler)
+        self.server.requests = []
+        self.server.statuses = list(statuses or [])
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/upload'.format(self.server.server_port)
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ContinueHandler(RecordingHandler):
+    """
+    Supports Expect: 100-continue, and rejects requests with a 413 before
+    reading their body if the server has a ``max_length`` set.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def handle_expect_100(self):
+        length = int(self.headers.get('Content-Length', 0))
+        max_length = getattr(self.server, 'max_length', None)
+
+        if max_length is not None and length > max_length:
+            self.server.rejected.append(length)
+
+            self.send_response(413)
+            self.send_header('Content-Length', '0')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            return False
+
+        return RecordingHandler.handle_expect_100(self)
@@ -0,0 +1,140 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form
+from poster.archive import TarSource, ZipSource
+from poster.streaminghttp import send
+from io import BytesIO
+from tempfile import mkdtemp
+
+import os
+import shutil
+import tarfile
+import zipfile
+
+
+class TestArchive(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.files = {
+            'a.txt': b'hello, world\n',
+            'empty.bin': b'',
+            'sub/b.bin': os.urandom(70000),
+            'sub/deeper/c.txt': b'c' * 513,
+            u'sub/ünicode.txt': b'unicode',
+        }
+
+        for name, content in self.files.items():
+            path = os.path.join(self.directory, *name.split('/'))
+
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            with open(path, 'wb') as fh:
+                fh.write(content)
+
+        os.mkdir(os.path.join(self.directory, 'nothing'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, source):
+        with source.open() as fh:
+            return fh.read()
+
+    def test_tar(self):
+        source = TarSource(self.directory)
+        content = self.read(source)
+
+        self.assertEqual(source.size, len(content))
+
+        with tarfile.open(fileobj=BytesIO(content)) as archive:
+            names = archive.getnames()
+
+            for name, expected in self.files.items():
+                self.assertEqual(expected, archive.extractfile(name).read())
+
+            self.assertTrue(archive.getmember('nothing').isdir())
+
+        self.assertEqual(['nothing', 'sub', 'a.txt', 'empty.bin', 'sub/deeper', 'sub/b.bin', u'sub/ünicode.txt',
+                          'sub/deeper/c.txt'], names)
+
+    def test_tar_file_list(self):
+        source = TarSource([os.path.join(self.directory, 'a.txt'),
+                            (os.path.join(self.directory, 'sub', 'deeper'), 'renamed')])
+
+        with tarfile.open(fileobj=BytesIO(self.read(source))) as archive:
+            self.assertEqual(['a.txt', 'renamed', 'renamed/c.txt'], archive.getnames())
+
+    def test_zip_stored(self):
+        source = ZipSource(self.directory)
+        content = self.read(source)
+
+        self.assertEqual(source.size, len(content))
+
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+
+            for name, expected in self.files.items():
+                self.assertEqual(expected, archive.read(name))
+
+            self.assertEqual(zipfile.ZIP_STORED, archive.getinfo('a.txt').compress_type)
+            self.assertTrue(archive.getinfo('nothing/').is_dir())
+
+    def test_zip_deflated(self):
+        source = ZipSource(self.directory, compress=True)
+
+        self.assertIsNone(source.size)
+
+        with zipfile.ZipFile(BytesIO(self.read(source))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(zipfile.ZIP_DEFLATED, archive.getinfo('sub/deeper/c.txt').compress_type)
+            self.assertEqual(self.files['sub/b.bin'], archive.read('sub/b.bin'))
+
+    def test_form_content_length(self):
+        form = Form()
+        form.add_data('foo', 'bar')
+        form.add_file('tar', TarSource(self.directory), filename='data.tar')
+        form.add_file('zip', ZipSource(self.directory))
+
+        body = b''.join(form.iter_encode())
+
+        self.assertEqual(form.content_length, len(body))
+        self.assertIn(b'Content-Type: application/x-tar', body)
+        self.assertIn(b'Content-Type: application/zip', body)
+
+        with RecordingServer() as server:
+            response = send(server.url, form)
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(str(len(body)), server.requests[0][2]['Content-Length'])
+
+    def test_form_unknown_length(self):
+        form = Form()
+        form.add_file('zip', ZipSource(self.directory, compress=True))
+
+        self.assertIsNone(form.content_length)
+        self.assertNotIn('Content-Length', form.headers)
+        self.assertRaises(ValueError, form.plan)
+
+        with RecordingServer() as server:
+            response = send(server.url, form)
+
+        request = server.requests[0]
+
+        self.assertEqual(200, response.status)
+        self.assertEqual('chunked', request[2]['Transfer-Encoding'])
+
+        with zipfile.ZipFile(BytesIO(request[3].split(b'\r\n\r\n', 1)[1].rsplit(b'\r\n--', 1)[0])) as archive:
+            self.assertEqual(self.files['a.txt'], archive.read('a.txt'))
+
+    def test_file_shrank(self):
+        source = TarSource(self.directory)
+
+        with open(os.path.join(self.directory, 'a.txt'), 'wb') as fh:
+            fh.write(b'short')
+
+        self.assertRaises(IOError, self.read, source)
+
+    def test_missing(self):
+        self.assertRaises(IOError, TarSource, [os.path.join(self.directory, 'missing')])
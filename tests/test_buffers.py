@@ -0,0 +1,73 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form
+from poster.buffers import BufferPool
+from poster.readahead import ReadAhead
+from poster.streaminghttp import send
+
+import io
+
+
+class TestBufferPool(TestCase):
+    def build_form(self):
+        form = Form()
+        form.add_data('foo', 'bar')
+        form.add_file('file', io.BytesIO(bytes(bytearray(range(256))) * 40), filename='x.bin')
+
+        return form
+
+    def test_acquire_release(self):
+        pool = BufferPool(count=1, size=16)
+
+        first = pool.acquire()
+        second = pool.acquire()
+
+        pool.release(memoryview(first)[:4])
+        pool.release(second)
+        pool.release(bytearray(8))
+
+        self.assertEqual({'acquisitions': 2, 'allocations': 2, 'reuses': 1, 'releases': 2, 'free': 1},
+                         pool.stats())
+        self.assertIs(first, pool.acquire())
+
+    def test_read(self):
+        pool = BufferPool(count=1, size=4)
+        fh = io.BytesIO(b'abcdef')
+
+        self.assertEqual(b'abcd', pool.read(fh).tobytes())
+        self.assertEqual(b'ef', pool.read(fh).tobytes())
+        self.assertEqual(0, len(pool.read(fh)))
+
+    def test_iter_encode_without_release(self):
+        form = self.build_form()
+        pool = BufferPool(count=2, size=1000)
+
+        blocks = list(form.iter_encode(pool=pool))
+
+        # Nothing was released, so every chunk still has its own buffer
+        self.assertEqual(b''.join(form.iter_encode()), b''.join(blocks))
+        self.assertEqual(12, pool.stats()['allocations'])
+
+    def test_send_reuses_buffers(self):
+        form = self.build_form()
+        pool = BufferPool(count=2, size=1000)
+
+        with RecordingServer() as server:
+            send(server.url, form, pool=pool)
+            send(server.url, ReadAhead(form, depth=1), pool=pool)
+
+        for request in server.requests:
+            self.assertEqual(b''.join(form.iter_encode()), request[3])
+
+        stats = pool.stats()
+
+        self.assertEqual(stats['acquisitions'], stats['releases'])
+        self.assertLessEqual(stats['allocations'], 4)
+        self.assertGreater(stats['reuses'], 15)
+
+    def test_text_mode_file(self):
+        form = Form()
+        form.add_file('file', io.StringIO(u'text'), filename='a.txt')
+
+        self.assertEqual(b''.join(form.iter_encode()), b''.join(form.iter_encode(pool=BufferPool())))
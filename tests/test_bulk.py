@@ -0,0 +1,122 @@
+from tests import TestCase
+
+from poster import Form, FormData, FieldTable
+from poster.sources import FileSource
+
+import io
+import os
+import shutil
+import tempfile
+
+
+class TestAddMany(TestCase):
+    def test_add_many(self):
+        fh = io.BytesIO(b'file content')
+
+        form = Form(boundary='bulk')
+        form.add_many([('foo', 'bar'), ('id[]', '1'), ('file', fh), ('after', 'x')])
+
+        expected = Form(boundary='bulk')
+        expected.add_data('foo', 'bar')
+        expected.add_data('id[]', '1')
+        expected.add_form_data(FormData('file', fh))
+        expected.add_data('after', 'x')
+
+        self.assertEqual(expected.encode(), form.encode())
+        self.assertEqual([FieldTable, FormData, FieldTable], [type(d) for d in form.data])
+
+    def test_add_many_generator(self):
+        form = Form()
+        form.add_many(('id[]', str(i)) for i in range(1000))
+
+        self.assertEqual(1000, len(form.data[0]))
+        self.assertEqual(len(b''.join(form.iter_encode())), form.content_length)
+
+    def test_add_many_is_atomic(self):
+        form = Form()
+
+        for fields in ([('foo', 'bar'), ('', 'x')],
+                       [('foo', 'bar'), ('a', '')],
+                       [('foo', 'bar'), ('a', 123)],
+                       [('foo', 'bar'), 'not a pair']):
+            self.assertRaises(ValueError, form.add_many, fields)
+
+        self.assertEqual([], form.data)
+
+        form.add_data('keep', 'me')
+        self.assertRaises(ValueError, form.add_many, [('foo', 'bar'), ('file', io.BytesIO(b'x')), ('', 'x')])
+        self.assertEqual(1, len(form.data))
+
+    def test_copy_data(self):
+        form = Form(boundary='bulk')
+        form.add_many([('foo', 'bar'), ('file', io.BytesIO(b'file content'))])
+
+        self.assertEqual(form.encode(), Form(list(form.data), boundary='bulk').encode())
+
+    def test_callback_per_field(self):
+        form = Form()
+        form.add_many([('foo', 'bar'), ('id[]', '1'), ('file', io.BytesIO(b'file content')), ('after', 'x')])
+
+        calls = []
+        body = b''.join(form.iter_encode(cb=lambda field, position, total: calls.append((field, position, total))))
+
+        self.assertEqual(b''.join(form.iter_encode()), body)
+        self.assertTrue(all(isinstance(field, FormData) for field, _, _ in calls))
+        self.assertEqual(['foo', 'id[]', 'file', 'after'], [field.name for field, _, _ in calls])
+        self.assertEqual(len(body) - len(form._terminator()), calls[-1][1])
+
+
+class TestFromMapping(TestCase):
+    def test_dict(self):
+        form = Form.from_mapping({'foo': 'bar', 'id[]': ['1', '2']}, boundary='map')
+        content = form.encode()[0]
+
+        self.assertEqual(1, content.count('name="foo"'))
+        self.assertEqual(2, content.count('name="id[]"'))
+
+    def test_multidict(self):
+        class MultiDict(object):
+            def items(self, multi=False):
+                return [('a', '1'), ('a', '2')] if multi else [('a', '1')]
+
+        content = Form.from_mapping(MultiDict()).encode()[0]
+
+        self.assertEqual(2, content.count('name="a"'))
+
+
+class TestFromDirectory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        os.mkdir(os.path.join(self.directory, 'sub'))
+
+        for path in ['b.txt', 'a.txt', 'c.log', 'sub/d.txt']:
+            with open(os.path.join(self.directory, path), 'wb') as fh:
+                fh.write(path.encode('utf-8'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def filenames(self, form):
+        return [data.filename for data in form.data]
+
+    def test_from_directory(self):
+        form = Form.from_directory(self.directory, pattern='*.txt')
+
+        self.assertEqual(['a.txt', 'b.txt'], self.filenames(form))
+        self.assertIsInstance(form.data[0].file, FileSource)
+        self.assertEqual('text/plain', form.data[0].mime_type)
+
+        content = form.encode()[0]
+
+        self.assertIn('filename="a.txt"\r\nContent-Type: text/plain\r\n\r\na.txt\r\n', content)
+        self.assertEqual(len(content), form.content_length)
+
+    def test_recursive(self):
+        form = Form.from_directory(self.directory, recursive=True, name='files[]')
+
+        self.assertEqual(['a.txt', 'b.txt', 'c.log', 'sub/d.txt'], self.filenames(form))
+        self.assertEqual(['files[]'] * 4, [data.name for data in form.data])
+
+    def test_missing(self):
+        self.assertRaises(IOError, Form.from_directory, os.path.join(self.directory, 'missing'))
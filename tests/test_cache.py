@@ -0,0 +1,144 @@
+from tests import TestCase
+
+from poster import Form, FormData, cache
+from tempfile import NamedTemporaryFile
+
+import io
+
+
+class TestPartCache(TestCase):
+    def setUp(self):
+        self.cache = cache.configure(max_entries=2, max_payload_size=1024)
+
+    def tearDown(self):
+        cache.disable()
+
+    def make_file(self, content=b'hello, world'):
+        f = NamedTemporaryFile(suffix='.html')
+        f.write(content)
+        f.flush()
+
+        self.addCleanup(f.close)
+
+        return f
+
+    def test_hit(self):
+        f = self.make_file()
+
+        first = FormData('a', f)
+        second = FormData('b', f)
+
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0, 'entries': 1,
+                          'bytes': 12, 'hit_rate': 0.5}, self.cache.stats())
+
+        self.assertEqual('text/html', second.mime_type)
+        self.assertEqual(first.filesize, second.filesize)
+        self.assertEqual(b'hello, world', second.payload)
+
+    def test_encode_payload(self):
+        f = self.make_file()
+
+        FormData('a', f)
+
+        form = Form()
+        form.add_file('b', f, filename='b.html')
+        form.add_file('c', f, filename='b.html')
+
+        content, headers = form.encode()
+
+        self.assertEqual(2, content.count('hello, world'))
+        self.assertEqual(str(len(content)), headers['Content-Length'])
+
+    def test_modified_file(self):
+        f = self.make_file()
+
+        FormData('a', f)
+
+        f.seek(0, 2)
+        f.write(b'!')
+        f.flush()
+
+        data = FormData('a', f)
+
+        self.assertEqual(13, data.filesize)
+        self.assertEqual(0, self.cache.hits)
+
+    def test_mime_type_in_key(self):
+        f = self.make_file()
+
+        FormData('a', f)
+
+        self.assertEqual('image/png', FormData('a', f, mime_type='image/png').mime_type)
+        self.assertEqual(0, self.cache.hits)
+
+    def test_large_payload_not_cached(self):
+        data = FormData('a', self.make_file(b'x' * 2048))
+
+        self.assertIsNone(data.payload)
+        self.assertEqual(0, self.cache.stats()['bytes'])
+
+    def test_eviction(self):
+        files = [self.make_file() for _ in range(3)]
+
+        for f in files:
+            FormData('a', f)
+
+        stats = self.cache.stats()
+
+        self.assertEqual(2, stats['entries'])
+        self.assertEqual(1, stats['evictions'])
+        self.assertEqual(24, stats['bytes'])
+
+    def test_max_bytes(self):
+        self.cache = cache.configure(max_bytes=20, max_payload_size=1024)
+
+        FormData('a', self.make_file())
+        FormData('b', self.make_file())
+
+        self.assertEqual(1, len(self.cache))
+        self.assertEqual(12, self.cache.stats()['bytes'])
+
+    def test_not_a_real_file(self):
+        FormData('a', io.BytesIO(b'hello'))
+
+        self.assertEqual(0, len(self.cache))
+
+    def test_decoded_handles_not_cached(self):
+        import gzip
+
+        text = self.make_file(u'h\u00e9llo, world\r\n'.encode('utf-8') * 10)
+        zipped = self.make_file(gzip.compress(b'hello, world' * 100))
+
+        with open(text.name, encoding='utf-8', newline='') as fh:
+            FormData('text', fh)
+
+        with gzip.open(zipped.name) as fh:
+            FormData('zipped', fh)
+
+        self.assertEqual(0, len(self.cache))
+
+        # The binary handles of the same files aren't given their sizes
+        for f in (text, zipped):
+            with open(f.name, 'rb') as fh:
+                form = Form()
+                form.add_file('file', fh)
+
+                self.assertEqual(form.content_length, len(b''.join(form.iter_encode())))
+
+    def test_disabled(self):
+        cache.disable()
+
+        FormData('a', self.make_file())
+
+        self.assertIsNone(cache.get_cache())
+        self.assertEqual(0, len(self.cache))
+
+    def test_clear(self):
+        f = self.make_file()
+
+        FormData('a', f)
+        FormData('a', f)
+        self.cache.clear()
+
+        self.assertEqual({'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0,
+                          'bytes': 0, 'hit_rate': 0.0}, self.cache.stats())
@@ -0,0 +1,156 @@
+from tests import TestCase
+from tests.server import RecordingHandler, RecordingServer
+
+from poster.cli import Field, main
+
+import io
+import os
+import shutil
+import tempfile
+
+
+class TestField(TestCase):
+    def test_parse_text(self):
+        field = Field.parse('foo=bar=baz')
+
+        self.assertEqual('foo', field.name)
+        self.assertEqual('bar=baz', field.value)
+        self.assertIsNone(field.path)
+
+    def test_parse_file(self):
+        field = Field.parse('image=@/tmp/a.jpg;type=image/png;filename=b.png')
+
+        self.assertEqual('/tmp/a.jpg', field.path)
+        self.assertEqual('image/png', field.mime_type)
+        self.assertEqual('b.png', field.filename)
+
+    def test_parse_invalid(self):
+        self.assertRaises(ValueError, Field.parse, 'foo')
+        self.assertRaises(ValueError, Field.parse, 'foo=@a;bad=1')
+
+
+class TestMain(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+
+        for i in range(3):
+            path = os.path.join(self.directory, 'file{}.txt'.format(i))
+
+            with open(path, 'wb') as fh:
+                fh.write('contents {}'.format(i).encode('utf-8') * 100)
+
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_main(self, argv):
+        out, err = io.StringIO(), io.StringIO()
+
+        return main(argv, out=out, err=err), out.getvalue(), err.getvalue()
+
+    def test_single(self):
+        with RecordingServer() as server:
+            status, out, err = self.run_main([server.url, '-F', 'foo=bar', '-F', 'file=@' + self.paths[0],
+                                              '-H', 'X-Test: yes', '--progress'])
+
+        self.assertEqual(0, status)
+        self.assertEqual(1, len(server.requests))
+
+        headers, body = server.requests[0][2], server.requests[0][3]
+
+        self.assertEqual('yes', headers['X-Test'])
+        self.assertIn(b'name="foo"', body)
+        self.assertIn(b'filename="file0.txt"', body)
+        self.assertIn(b'contents 0' * 100, body)
+        self.assertEqual('received {} bytes'.format(len(body)), out)
+        self.assertIn('bytes', err)
+
+    def test_readahead(self):
+        with RecordingServer() as server:
+            status, out, err = self.run_main([server.url, '-F', 'file=@' + self.paths[0], '--readahead', '4'])
+
+        self.assertEqual(0, status)
+        self.assertIn(b'contents 0' * 100, server.requests[0][3])
+
+    def test_split_jobs(self):
+        with RecordingServer() as server:
+            status, out, err = self.run_main([server.url, '-F', 'foo=bar', '--jobs', '2',
+                                              '-F', 'file=@' + self.paths[0],
+                                              '-F', 'file=@' + self.paths[1],
+                                              '-F', 'file=@' + self.paths[2]])
+
+        self.assertEqual(0, status)
+        self.assertEqual(3, len(server.requests))
+
+        for _, _, _, body in server.requests:
+            self.assertIn(b'name="foo"', body)
+            self.assertEqual(1, body.count(b'name="file"'))
+
+    def test_retries(self):
+        with RecordingServer(statuses=[503, 502]) as server:
+            status, out, err = self.run_main([server.url, '-F', 'foo=bar', '--retries', '2', '--retry-delay', '0'])
+
+        self.assertEqual(0, status)
+        self.assertEqual(3, len(server.requests))
+
+    def test_retries_exhausted(self):
+        with RecordingServer(statuses=[503, 503]) as server:
+            status, out, err = self.run_main([server.url, '-F', 'foo=bar', '--retries', '1', '--retry-delay', '0'])
+
+        self.assertEqual(1, status)
+        self.assertIn('503', err)
+
+    def test_resume(self):
+        journal = os.path.join(self.directory, 'journal')
+        argv = ['--split', '--resume', journal]
+
+        for path in self.paths:
+            argv += ['-F', 'file=@' + path]
+
+        with RecordingServer(statuses=[200, 500, 200]) as server:
+            self.assertEqual(1, self.run_main([server.url] + argv)[0])
+
+        self.assertEqual(3, len(server.requests))
+
+        with RecordingServer() as server:
+            self.assertEqual(0, self.run_main([server.url] + argv)[0])
+
+        # Only the file that failed is sent again
+        self.assertEqual(1, len(server.requests))
+
+    def test_split_without_files(self):
+        with RecordingServer() as server:
+            status, out, err = self.run_main([server.url, '-F', 'foo=bar', '--jobs', '4'])
+
+        self.assertEqual(0, status)
+        self.assertEqual(1, len(server.requests))
+        self.assertIn(b'name="foo"', server.requests[0][3])
+
+    def test_empty_value(self):
+        self.assertRaises(SystemExit, self.run_main, ['http://localhost/', '-F', 'foo='])
+
+    def test_bad_response(self):
+        class GarbageHandler(RecordingHandler):
+            def handle_request(self):
+                self.read_body()
+                self.wfile.write(b'NOT HTTP\r\n\r\n')
+
+            do_POST = handle_request
+
+        with RecordingServer(handler=GarbageHandler) as server:
+            status, out, err = self.run_main([server.url, '-F', 'foo=bar'])
+
+        self.assertEqual(1, status)
+        self.assertIn('NOT HTTP', err)
+
+    def test_unsupported_scheme(self):
+        status, out, err = self.run_main(['ftp://localhost/', '-F', 'foo=bar', '--retries', '2'])
+
+        self.assertEqual(1, status)
+        self.assertIn('ftp', err)
+        self.assertNotIn('retrying', err)
+
+    def test_missing_file(self):
+        self.assertRaises(SystemExit, self.run_main, ['http://localhost/', '-F', 'file=@/does/not/exist'])
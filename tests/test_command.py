@@ -0,0 +1,111 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form
+from poster.sources import CommandError, CommandSource
+from poster.streaminghttp import send
+
+import os
+import sys
+
+# Writes 300000 bytes, in a few separate writes
+WRITER = 'import sys, time\n' \
+         'for i in range(3):\n' \
+         '    sys.stdout.buffer.write(bytes([65 + i]) * 100000)\n' \
+         '    sys.stdout.buffer.flush()\n' \
+         '    time.sleep(0.01)\n'
+
+EXPECTED = b'A' * 100000 + b'B' * 100000 + b'C' * 100000
+
+
+class TestCommandSource(TestCase):
+    def build_form(self, script=WRITER, size=None):
+        form = Form(boundary='command')
+        form.add_data('foo', 'bar')
+        form.add_file('output', CommandSource([sys.executable, '-c', script], size=size), filename='out.bin')
+
+        return form
+
+    def expected_body(self):
+        form = Form(boundary='command')
+        form.add_data('foo', 'bar')
+        form.add_data('output', 'x')
+
+        body = b''.join(form.iter_encode())
+
+        return body.replace(b'name="output"\r\nContent-Type: text/plain; charset=utf-8\r\n\r\nx',
+                            b'name="output"; filename="out.bin"\r\nContent-Type: application/octet-stream\r\n\r\n' +
+                            EXPECTED)
+
+    def test_encode(self):
+        form = self.build_form()
+
+        self.assertIsNone(form.content_length)
+        self.assertEqual(self.expected_body(), b''.join(form.iter_encode()))
+
+        # Every encoding runs the command again
+        self.assertEqual(self.expected_body(), b''.join(form.iter_encode()))
+
+    def test_send_chunked(self):
+        spliced = []
+        splice = getattr(os, 'splice', None)
+
+        def counting_splice(*args):
+            count = splice(*args)
+            spliced.append(count)
+
+            return count
+
+        with RecordingServer() as server:
+            if splice:
+                os.splice = counting_splice
+
+            try:
+                response = send(server.url, self.build_form())
+            finally:
+                if splice:
+                    os.splice = splice
+
+        self.assertEqual(200, response.status)
+        self.assertEqual('chunked', server.requests[0][2]['Transfer-Encoding'])
+        self.assertEqual(self.expected_body(), server.requests[0][3])
+
+        if splice:
+            self.assertEqual(len(EXPECTED), sum(spliced))
+
+    def test_send_declared_size(self):
+        form = self.build_form(size=len(EXPECTED))
+
+        self.assertEqual(len(self.expected_body()), form.content_length)
+
+        with RecordingServer() as server:
+            response = send(server.url, form)
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(str(form.content_length), server.requests[0][2]['Content-Length'])
+        self.assertEqual(self.expected_body(), server.requests[0][3])
+
+    def test_wrong_size(self):
+        for size in (len(EXPECTED) - 1, len(EXPECTED) + 1):
+            form = self.build_form(size=size)
+
+            self.assertRaises(IOError, b''.join, form.iter_encode())
+
+    def test_failure(self):
+        form = self.build_form(script=WRITER + 'sys.exit(3)\n')
+
+        with self.assertRaises(CommandError) as context:
+            b''.join(form.iter_encode())
+
+        self.assertEqual(3, context.exception.returncode)
+
+    def test_abandoned(self):
+        script = 'import sys, time\nsys.stdout.buffer.write(b"x")\nsys.stdout.flush()\ntime.sleep(60)\n'
+        source = CommandSource([sys.executable, '-c', script])
+
+        with source.open() as fh:
+            self.assertEqual(b'x', fh.read(10))
+            process = fh.process
+
+        # Closing the reader early kills the command
+        self.assertIsNotNone(process.returncode)
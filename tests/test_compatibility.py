@@ -1,6 +1,7 @@
 from . import TestCase
 
-from poster.encode import multipart_encode, MultipartParam
+from poster import Form, FormData
+from poster.encode import gen_boundary, get_body_size, get_headers, multipart_encode, MultipartParam
 from poster.streaminghttp import register_openers
 
 import tempfile
@@ -12,11 +13,12 @@ class TestCompatibility(TestCase):
             file.write(b'world')
             file.flush()
 
-            response, headers = multipart_encode({
+            datagen, headers = multipart_encode({
                 'foo': 'bar',
                 'hello': file,
             })
 
+            response = b''.join(datagen).decode('utf-8')
             boundary = response[-34:-2]
 
         expected_foo = '\r\n'.join([
@@ -40,6 +42,60 @@ class TestCompatibility(TestCase):
         self.assertIn('Content-Type', list(headers.keys()))
 
         self.assertEqual('multipart/form-data; boundary=--' + boundary, headers.get('Content-Type'))
+        self.assertEqual(str(len(response)), headers['Content-Length'])
+
+    def test_multipart_encode_is_lazy(self):
+        with tempfile.NamedTemporaryFile('w+b') as file:
+            file.write(b'world')
+            file.flush()
+
+            datagen, headers = multipart_encode([('foo', 'bar'), ('hello', file)], 'XYZ')
+
+            # Nothing is read until the body is iterated
+            file.seek(0)
+            file.write(b'WORLD')
+            file.flush()
+
+            body = b''.join(datagen)
+
+        self.assertIn(b'\r\n\r\nWORLD\r\n--XYZ--', body)
+
+    def test_multipart_encode_params(self):
+        params = [FormData('foo', 'bar'), ('key', 'value1'), ('key', 'value2')]
+        expected = Form(boundary='XYZ')
+        expected.add_data('foo', 'bar')
+        expected.add_data('key', 'value1')
+        expected.add_data('key', 'value2')
+        body = b''.join(expected.iter_encode())
+
+        datagen, headers = multipart_encode(params, 'XYZ')
+
+        self.assertEqual(body, b''.join(datagen))
+        self.assertEqual(len(body), get_body_size(params, 'XYZ'))
+        self.assertEqual(expected.headers, headers)
+        self.assertEqual(headers, get_headers(params, 'XYZ'))
+
+        # The body can be generated again
+        self.assertEqual(b'', b''.join(datagen))
+        datagen.reset()
+        self.assertEqual(body, b''.join(datagen))
+
+        self.assertRaises(ValueError, multipart_encode, ['foo'])
+        self.assertRaises(ValueError, multipart_encode, 'foo=bar')
+
+    def test_multipart_encode_cb(self):
+        log = []
+
+        datagen, headers = multipart_encode({'foo': 'bar'}, 'XYZ', cb=lambda *args: log.append(args))
+        b''.join(datagen)
+
+        length = int(headers['Content-Length'])
+
+        self.assertEqual(2, len(log))
+        self.assertEqual((None, length, length), log[-1])
+
+    def test_gen_boundary(self):
+        self.assertNotEqual(gen_boundary(), gen_boundary())
 
     def test_multipart_encode_list(self):
         with tempfile.NamedTemporaryFile('w+b') as file:
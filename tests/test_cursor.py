@@ -0,0 +1,136 @@
+from tests import TestCase
+
+from poster import Form
+from poster.buffers import BufferPool
+from poster.cursor import Cursor
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+
+import os
+import threading
+
+
+class TestCursor(TestCase):
+    def test_pread(self):
+        with NamedTemporaryFile() as f:
+            f.write(b'hello, world')
+            f.seek(3)
+
+            cursor = Cursor(f)
+
+            self.assertIsNotNone(cursor.fd)
+            self.assertEqual(b'hello', cursor.read(5))
+            self.assertEqual(b', world', cursor.read(100))
+            self.assertEqual(b'', cursor.read(100))
+
+            # The file position isn't used or changed
+            self.assertEqual(3, f.tell())
+
+    def test_readinto(self):
+        with NamedTemporaryFile() as f:
+            f.write(b'hello, world')
+            f.flush()
+
+            cursor = Cursor(f, offset=7)
+            buffer = bytearray(3)
+
+            self.assertEqual(3, cursor.readinto(buffer))
+            self.assertEqual(b'wor', bytes(buffer))
+            self.assertEqual(2, cursor.readinto(buffer))
+            self.assertEqual(0, cursor.readinto(buffer))
+
+    def test_fallback(self):
+        fh = BytesIO(b'hello, world')
+        cursor = Cursor(fh)
+        other = Cursor(fh)
+
+        self.assertIsNone(cursor.fd)
+        self.assertEqual(b'hello', cursor.read(5))
+        self.assertEqual(b'hel', other.read(3))
+        self.assertEqual(b', world', cursor.read(100))
+
+        buffer = bytearray(4)
+
+        self.assertEqual(4, other.readinto(buffer))
+        self.assertEqual(b'lo, ', bytes(buffer))
+
+    def test_text_mode(self):
+        with NamedTemporaryFile('w+') as f:
+            f.write(u'héllo')
+            f.flush()
+
+            cursor = Cursor(f)
+
+            self.assertIsNone(cursor.fd)
+            self.assertEqual(u'héllo', cursor.read(100))
+
+    def test_compressed_files(self):
+        import bz2
+        import gzip
+
+        content = b'hello, world\n' * 1000
+
+        for module in (gzip, bz2):
+            with NamedTemporaryFile() as f:
+                with module.open(f.name, 'wb') as out:
+                    out.write(content)
+
+                with module.open(f.name, 'rb') as fh:
+                    # The descriptor would read the compressed bytes
+                    self.assertIsNone(Cursor(fh).fd)
+
+                    form = Form(boundary='XYZ')
+                    form.add_file('file', fh, filename='data.txt')
+
+                    body = b''.join(form.iter_encode())
+
+                self.assertIn(b'\r\n\r\n' + content + b'\r\n--XYZ--', body)
+                self.assertEqual(form.content_length, len(body))
+
+
+class TestConcurrentEncoding(TestCase):
+    def encode_concurrently(self, form, count=8, **kwargs):
+        results = [None] * count
+
+        def encode(index):
+            results[index] = b''.join(bytes(block) for block in form.iter_encode(chunk_size=1024, **kwargs))
+
+        threads = [threading.Thread(target=encode, args=(i,)) for i in range(count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_shared_form(self):
+        with NamedTemporaryFile() as f:
+            f.write(os.urandom(256 * 1024))
+            f.flush()
+
+            form = Form()
+            form.add_data('foo', 'bar')
+            form.add_file('file', f, filename='random.bin')
+            form.add_file('memory', BytesIO(os.urandom(64 * 1024)), filename='memory.bin')
+
+            expected = b''.join(form.iter_encode())
+            results = self.encode_concurrently(form)
+
+            self.assertEqual([expected] * len(results), results)
+
+    def test_shared_form_with_pool(self):
+        with NamedTemporaryFile() as f:
+            f.write(os.urandom(256 * 1024))
+            f.flush()
+
+            form = Form()
+            form.add_file('file', f, filename='random.bin')
+
+            expected = b''.join(form.iter_encode())
+
+            pool = BufferPool(size=1024)
+            results = self.encode_concurrently(form, pool=pool)
+
+            self.assertEqual([expected] * len(results), results)
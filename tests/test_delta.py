@@ -0,0 +1,153 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster.delta import Chunker, ChunkIndex, DeltaReceiver, DeltaUpload
+from poster.streaminghttp import send
+from io import BytesIO
+from tempfile import mkdtemp
+
+import os
+import random
+import shutil
+
+
+class TestDelta(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.path = os.path.join(self.directory, 'data.bin')
+        self.content = random.Random(1).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, 'little')
+        self.chunker = Chunker(min_size=2048, avg_size=8192, max_size=32768)
+        self.index = ChunkIndex(os.path.join(self.directory, 'sent.idx'))
+        self.receiver = DeltaReceiver(os.path.join(self.directory, 'server'))
+
+        self.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, content):
+        with open(self.path, 'wb') as fh:
+            fh.write(content)
+
+    def upload(self):
+        upload = DeltaUpload(ChunkIndex(self.index.path), chunker=self.chunker)
+        upload.add_file('data', self.path)
+
+        form = upload.build()
+        body = b''.join(form.iter_encode())
+
+        self.assertEqual(form.content_length, len(body))
+
+        paths = self.receiver.receive(body)
+        upload.commit()
+
+        with open(paths['data'], 'rb') as rebuilt, open(self.path, 'rb') as original:
+            self.assertEqual(original.read(), rebuilt.read())
+
+        return upload, body
+
+    def test_split(self):
+        chunks = list(self.chunker.split(BytesIO(self.content), read_size=10000))
+
+        self.assertEqual(len(self.content), sum(length for _, length, _ in chunks))
+        self.assertEqual([0] + [offset + length for offset, length, _ in chunks[:-1]],
+                         [offset for offset, _, _ in chunks])
+        self.assertTrue(all(2048 <= length <= 32768 for _, length, _ in chunks[:-1]))
+
+        # The chunks don't depend on how the file is read
+        self.assertEqual(chunks, list(self.chunker.split(BytesIO(self.content))))
+
+    def test_cut_matches_rolling_hash(self):
+        def cut(chunker, data, start):
+            # The hash rolled one byte at a time, which the chunks must never stop matching
+            h = 0
+            limit = min(len(data), start + chunker.max_size)
+
+            for position in range(start + chunker.min_size, limit):
+                h = ((h << 1) + chunker.gear[data[position]]) & 0xFFFFFFFF
+
+                if not h & chunker.mask:
+                    return position + 1 - start
+
+            return limit - start
+
+        content = self.content[:200000] + b'\0' * 50000 + b'abc' * 30000
+
+        for chunker in [self.chunker, Chunker(min_size=16, avg_size=64, max_size=20000), Chunker()]:
+            start = 0
+
+            while start < len(content):
+                length = chunker._cut(content, start, len(content))
+
+                self.assertEqual(cut(chunker, content, start), length)
+
+                start += length
+
+    def test_unchanged(self):
+        first, body = self.upload()
+
+        self.assertEqual(len(self.content), first.new_bytes)
+        self.assertGreater(len(body), len(self.content))
+
+        second, body = self.upload()
+
+        self.assertEqual(0, second.new_bytes)
+        self.assertEqual(len(self.content), second.total_bytes)
+        self.assertLess(len(body), 10000)
+
+    def test_small_changes(self):
+        self.upload()
+
+        # Insert, overwrite and remove a few bytes, which shifts everything after them
+        content = bytearray(self.content)
+        content[600000:600100] = b''
+        content[300000:300010] = b'x' * 10
+        content[1000:1000] = b'inserted'
+
+        self.write(bytes(content))
+
+        upload, body = self.upload()
+
+        self.assertLess(upload.new_bytes, 5 * 32768)
+        self.assertLess(len(body), 6 * 32768)
+        self.assertEqual(len(content), upload.total_bytes)
+
+    def test_repeated_chunks(self):
+        self.write(self.content[:100000] * 4)
+
+        upload, _ = self.upload()
+
+        self.assertLess(upload.new_bytes, 2 * 100000)
+
+    def test_index(self):
+        self.upload()
+
+        index = ChunkIndex(self.index.path)
+
+        self.assertGreater(len(index), 0)
+        self.assertIn(next(self.chunker.split(BytesIO(self.content)))[2], index)
+
+    def test_missing_chunks(self):
+        upload = DeltaUpload(ChunkIndex(), chunker=self.chunker)
+        upload.add_file('data', self.path)
+        upload.new_chunks.pop()
+
+        self.assertRaises(ValueError, self.receiver.receive, b''.join(upload.build().iter_encode()))
+
+    def test_send(self):
+        upload = DeltaUpload(self.index, chunker=self.chunker)
+        upload.add_file('data', self.path)
+
+        with RecordingServer() as server:
+            response = send(server.url, upload.build())
+
+        self.assertEqual(200, response.status)
+
+        paths = self.receiver.receive(server.requests[0][3])
+
+        with open(paths['data'], 'rb') as fh:
+            self.assertEqual(self.content, fh.read())
+
+    def test_invalid_chunker(self):
+        self.assertRaises(ValueError, Chunker, avg_size=5000)
+        self.assertRaises(ValueError, Chunker, min_size=10, avg_size=8, max_size=100)
@@ -0,0 +1,158 @@
+from tests import TestCase
+from tests.server import RecordingHandler, RecordingServer
+
+from poster import Form
+from poster.sources import ContentSource
+from poster.streaminghttp.fanout import fanout
+from io import BytesIO
+
+import socket
+import threading
+
+
+class CountingSource(ContentSource):
+    name = 'counted.bin'
+
+    def __init__(self, content):
+        self.size = len(content)
+        self.content = content
+        self.opened = 0
+        self.read = 0
+
+    def open(self):
+        self.opened += 1
+        source = self
+
+        class Reader(BytesIO):
+            def read(self, size=-1):
+                block = BytesIO.read(self, size)
+                source.read += len(block)
+
+                return block
+
+        return Reader(self.content)
+
+
+class StallingHandler(RecordingHandler):
+    def handle_request(self):
+        # Never read the body, until the test is over
+        self.server.release.wait(10)
+
+    do_POST = handle_request
+
+
+class TestFanout(TestCase):
+    def build_form(self, size=512 * 1024):
+        source = CountingSource(b'0123456789abcdef' * (size // 16))
+
+        form = Form()
+        form.add_data('foo', 'bar')
+        form.add_file('file', source)
+
+        return form, source
+
+    def test_reads_once(self):
+        form, source = self.build_form()
+        expected = b''.join(form.iter_encode())
+        source.read = source.opened = 0
+
+        with RecordingServer() as a, RecordingServer() as b, RecordingServer() as c:
+            results = fanout([a.url, b.url, c.url], form, chunk_size=16 * 1024, depth=2)
+
+        self.assertEqual([a.url, b.url, c.url], [result.url for result in results])
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([len(expected)] * 3, [result.sent for result in results])
+
+        for server in (a, b, c):
+            self.assertEqual(expected, server.requests[0][3])
+
+        self.assertEqual(1, source.opened)
+        self.assertEqual(source.size, source.read)
+
+    def test_failure_is_isolated(self):
+        form, _ = self.build_form()
+
+        # Nothing is listening on a port we just closed
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        closed = 'http://127.0.0.1:{}/upload'.format(sock.getsockname()[1])
+        sock.close()
+
+        with RecordingServer(statuses=[500]) as a, RecordingServer() as b:
+            results = fanout([a.url, closed, b.url], form)
+
+        self.assertEqual(500, results[0].response.status)
+        self.assertFalse(results[0].ok)
+        self.assertIsNotNone(results[1].error)
+        self.assertIsNone(results[1].response)
+        self.assertTrue(results[2].ok)
+        self.assertEqual(b''.join(form.iter_encode()), b.requests[0][3])
+
+    def test_slow_endpoint_dropped(self):
+        # Large enough to fill the socket buffers of the stalled connection
+        form, _ = self.build_form(size=48 * 1024 * 1024)
+
+        with RecordingServer(handler=StallingHandler) as slow, RecordingServer() as fast:
+            slow.server.release = threading.Event()
+
+            try:
+                results = fanout([slow.url, fast.url], form, depth=4, stall_timeout=0.2)
+            finally:
+                slow.server.release.set()
+
+        self.assertIsInstance(results[0].error, IOError)
+        self.assertGreater(results[0].stall_time, 0.2)
+        self.assertTrue(results[1].ok)
+        self.assertEqual(form.content_length, len(fast.requests[0][3]))
+
+    def test_chunked(self):
+        form, _ = self.build_form()
+        expected = b''.join(form.iter_encode())
+
+        class Unsized(object):
+            content_type = form.content_type
+            content_length = None
+            iter_encode = form.iter_encode
+
+        with RecordingServer() as a, RecordingServer() as b:
+            results = fanout([a.url, b.url], Unsized())
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual('chunked', a.requests[0][2]['Transfer-Encoding'])
+        self.assertEqual(expected, a.requests[0][3])
+        self.assertEqual(expected, b.requests[0][3])
+
+    def test_source_failure(self):
+        def fail():
+            raise IOError('gone')
+
+        form = Form()
+        form.add_file('file', CountingSource(b'data'))
+        form.data[0].file.open = fail
+
+        with RecordingServer() as a:
+            self.assertRaises(IOError, fanout, [a.url], form)
+
+        # The upload was cut short, if it had started at all
+        self.assertTrue(all(len(request[3]) < form.content_length for request in a.requests))
+
+    def test_source_failure_stops_senders(self):
+        from poster.sources import CommandError, CommandSource
+
+        form = Form()
+
+        for i in range(100):
+            form.add_data('field{}'.format(i), str(i))
+
+        form.add_file('output', CommandSource(['sh', '-c', 'echo hi; exit 3']), filename='out.txt')
+
+        before = threading.active_count()
+
+        with RecordingServer() as a, RecordingServer() as b:
+            self.assertRaises(CommandError, fanout, [a.url, b.url], form)
+
+        # Every sender thread ended and closed its connection
+        self.assertEqual(before, threading.active_count())
+
+    def test_invalid_depth(self):
+        self.assertRaises(ValueError, fanout, [], Form(), depth=0)
@@ -0,0 +1,127 @@
+from tests import TestCase
+
+from poster import Form, FormData, FormSpec, FieldTable
+
+
+class TestFieldTable(TestCase):
+    fields = [('foo', 'bar'), ('id[]', '1'), ('id[]', '2'), (u'\N{SNOWMAN}', u'bár'), ('"quoted"', 'q')]
+
+    def build_form(self, boundary='table'):
+        form = Form(boundary=boundary)
+
+        for name, value in self.fields:
+            form.add_data(name, value)
+
+        return form
+
+    def test_encode_matches_add_data(self):
+        form = Form(boundary='table')
+        form.add_field_table(FieldTable(self.fields))
+
+        self.assertEqual(self.build_form().encode(), form.encode())
+
+    def test_mixed_with_form_data(self):
+        form = Form(boundary='table')
+        form.add_data('before', 'a')
+        form.add_field_table(FieldTable(self.fields))
+        form.add_data('after', 'b')
+
+        expected = Form(boundary='table')
+        expected.add_data('before', 'a')
+
+        for name, value in self.fields:
+            expected.add_data(name, value)
+
+        expected.add_data('after', 'b')
+
+        self.assertEqual(expected.encode(), form.encode())
+        self.assertEqual(len(b''.join(form.iter_encode())), form.content_length)
+
+    def test_small_chunks(self):
+        form = Form(boundary='table')
+        form.add_field_table(FieldTable(self.fields))
+
+        chunks = list(form.iter_encode(chunk_size=1))
+
+        self.assertEqual(len(self.fields) + 1, len(chunks))
+        self.assertEqual(self.build_form().encode()[0].encode('utf-8'), b''.join(chunks))
+
+    def test_plan(self):
+        form = Form(boundary='table')
+        form.add_field_table(FieldTable(self.fields))
+
+        plan = form.plan()
+        expected = self.build_form().plan()
+
+        self.assertEqual([(p.offset, p.header_length, p.payload_length) for p in expected],
+                         [(p.offset, p.header_length, p.payload_length) for p in plan])
+        self.assertEqual(('id[]', '1'), plan[1].field)
+
+    def test_len_and_iter(self):
+        table = FieldTable()
+        table.add('foo', 'bar')
+        table.extend([('a', 'b')])
+
+        self.assertEqual(2, len(table))
+        self.assertEqual([('foo', 'bar'), ('a', 'b')], list(table))
+
+    def test_iter_returns_raw_names(self):
+        self.assertEqual(self.fields, list(FieldTable(self.fields)))
+
+        # Names that look escaped already come back as they were added
+        self.assertEqual([('100%0A', 'x'), ('a%22b', 'y')], list(FieldTable([('100%0A', 'x'), ('a%22b', 'y')])))
+
+    def test_escaped_looking_names(self):
+        table_form = Form(boundary='XYZ')
+        table_form.add_many([('100%0A', 'x'), ('"q"', 'y')])
+
+        data_form = Form(boundary='XYZ')
+        data_form.add_data('100%0A', 'x')
+        data_form.add_data('"q"', 'y')
+
+        body = b''.join(table_form.iter_encode())
+
+        self.assertEqual(b''.join(data_form.iter_encode()), body)
+        self.assertEqual(table_form.content_length, len(body))
+        self.assertIn(b'name="%22q%22"', body)
+        self.assertEqual(['100%0A', '"q"'], [part.name for part in FormSpec.from_form(table_form).fields])
+
+        urlencoded = Form(encoding='urlencoded')
+        urlencoded.add_many([('discount%22', '10')])
+
+        self.assertEqual(b'discount%2522=10', b''.join(urlencoded.iter_encode()))
+
+    def test_invalid(self):
+        table = FieldTable()
+
+        self.assertRaises(ValueError, table.add, '', 'bar')
+        self.assertRaises(ValueError, table.add, 'foo', '')
+        self.assertRaises(ValueError, table.add, 'foo', 123)
+        self.assertRaises(ValueError, Form().add_field_table, [('foo', 'bar')])
+
+    def test_memory_per_field(self):
+        import tracemalloc
+
+        tracemalloc.start()
+        table = FieldTable(('record[{}]'.format(i), 'value {}'.format(i)) for i in range(20000))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # The names and values are about 20 bytes per field
+        self.assertEqual(20000, len(table))
+        self.assertLess(memory / 20000.0, 40)
+
+    def test_header_follows_changes(self):
+        field = FormData('foo', 'bar')
+        field.boundary = 'XYZ'
+        before = field.encode_headers()
+
+        field.name = 'renamed'
+        field.mime_type = 'text/csv'
+
+        self.assertNotEqual(before, field.encode_headers())
+        self.assertIn(b'name="renamed"', field.encode_headers())
+        self.assertIn(b'Content-Type: text/csv', field.encode_headers())
+
+    def test_form_data_has_no_dict(self):
+        self.assertFalse(hasattr(FormData('foo', 'bar'), '__dict__'))
@@ -147,3 +147,81 @@ hello_world
 
     def test_boundary_space(self):
         form = Form()
+
+    def test_custom_boundary_quoted_once(self):
+        form = Form(boundary='per render')
+        form.add_data('foo', 'bar')
+
+        content, headers = form.encode()
+
+        self.assertEqual('per%2Brender', form.boundary)
+        self.assertTrue(content.startswith('--per%2Brender\r\n'))
+        self.assertTrue(content.endswith('--per%2Brender--'))
+
+    def test_content_length(self):
+        with NamedTemporaryFile() as f:
+            f.write(b'\x00\x01 binary' * 100)
+            f.flush()
+
+            form = Form()
+            form.add_data('foo', u'bár')
+            form.add_file('file', f, filename=u'café.bin')
+
+            self.assertEqual(len(b''.join(form.iter_encode())), form.content_length)
+
+    def test_content_length_empty(self):
+        form = Form(boundary='abc')
+
+        self.assertEqual(len(b'--abc--'), form.content_length)
+        self.assertEqual([], form.plan())
+
+    def test_plan(self):
+        with NamedTemporaryFile() as f:
+            f.write(b'hello, world')
+            f.flush()
+
+            form = Form()
+            form.add_data('foo', 'bar')
+            form.add_file('file', f, filename='test.html')
+
+            plan = form.plan()
+            encoded = b''.join(form.iter_encode())
+
+        self.assertEqual([0, plan[0].end], [p.offset for p in plan])
+
+        for part in plan:
+            self.assertEqual(b'--' + form.boundary.encode('ascii'),
+                             encoded[part.offset:part.offset + len(form.boundary) + 2])
+            self.assertEqual(part.field.encode_headers(form.boundary), encoded[part.offset:part.payload_offset])
+
+        self.assertEqual(b'bar', encoded[plan[0].payload_offset:plan[0].payload_offset + plan[0].payload_length])
+        self.assertEqual(b'hello, world', encoded[plan[1].payload_offset:plan[1].end - 2])
+
+    def test_shared_form_data(self):
+        data = FormData('shared', 'value')
+        first = Form([data], boundary='AAA')
+        second = Form([data], boundary='BBB')
+
+        blocks = first.iter_encode()
+        head = next(blocks)
+
+        # Encoding another form with the same part doesn't change this one
+        second_body = b''.join(second.iter_encode())
+        first_body = head + b''.join(blocks)
+
+        self.assertEqual(b'--AAA\r\n', first_body[:7])
+        self.assertNotIn(b'BBB', first_body)
+        self.assertNotIn(b'AAA', second_body)
+        self.assertEqual(first.content_length, len(first_body))
+        self.assertIsNone(data.boundary)
+
+    def test_callback_total(self):
+        calls = []
+
+        form = Form()
+        form.add_data('foo', 'bar')
+        form.add_data('hello', 'world')
+        content, headers = form.encode(cb=lambda *args: calls.append(args))
+
+        self.assertEqual([len(content)] * 2, [total for _, _, total in calls])
+        self.assertEqual(str(len(content)), headers['Content-Length'])
@@ -10,7 +10,39 @@ class TestFormData(TestCase):
 
         self.assertEqual('foo', data.name)
         self.assertEqual('bar', data.content)
-        self.assertEqual(38, data.content_length)
+
+        # The encoded length depends on the boundary of the form
+        self.assertRaises(ValueError, len, data)
+
+        data.set_boundary('testing')
+
+        self.assertEqual(len(data.encode()), data.content_length)
+        self.assertEqual(3, data.payload_length)
+
+    def test_content_length_unicode(self):
+        data = FormData('foo', u'b\u00e1r')
+        data.set_boundary('testing')
+
+        self.assertEqual(len(data.encode().encode('utf-8')), data.content_length)
+        self.assertEqual(4, data.payload_length)
+
+    def test_content_length_text_file(self):
+        from io import StringIO
+
+        text = u'héllo\r\n' * 5000
+
+        with NamedTemporaryFile('w+', encoding='latin-1', newline='') as tmp_file:
+            tmp_file.write(text)
+            tmp_file.flush()
+            tmp_file.seek(0)
+
+            for fh in (StringIO(text), tmp_file):
+                data = FormData('foo', fh)
+                data.set_boundary('testing')
+
+                # The size is the UTF-8 encoded text, not characters or bytes on disk
+                self.assertEqual(len(text.encode('utf-8')), data.payload_length)
+                self.assertEqual(len(b''.join(data.iter_encode())), data.content_length)
 
     def test_file_construct(self):
         with NamedTemporaryFile() as tmp_file:
@@ -65,6 +97,43 @@ Content-Type: text/plain; charset=utf-8
 value
 """.replace('\n', '\r\n'), content)
 
+    def test_escaped_name(self):
+        data = FormData('a "b"\r\nc', 'value')
+
+        self.assertEqual('a "b"\r\nc', data.name)
+        self.assertEqual('form-data; name="a %22b%22%0D%0Ac"', data.headers['Content-Disposition'])
+
+    def test_unicode_name(self):
+        data = FormData(u'n\u00e4me', 'value')
+        data.set_boundary('xxxxx')
+
+        # Names are sent as raw UTF-8, as RFC 7578 recommends
+        self.assertEqual(u'form-data; name="n\u00e4me"', data.headers['Content-Disposition'])
+        self.assertEqual(len(data.encode().encode('utf-8')), data.content_length)
+
+    def test_unicode_filename(self):
+        from io import BytesIO
+
+        data = FormData('file', BytesIO(b'data'), filename=u'r\u00e9sum\u00e9 "1".txt')
+
+        self.assertEqual(
+            u'form-data; name="file"; filename="r\u00e9sum\u00e9 %221%22.txt"; '
+            u"filename*=UTF-8''r%C3%A9sum%C3%A9%20%221%22.txt",
+            data.headers['Content-Disposition'])
+
+    def test_ascii_filename(self):
+        from io import BytesIO
+
+        data = FormData('file', BytesIO(b'data'), filename='a&b.txt')
+
+        self.assertEqual('form-data; name="file"; filename="a&b.txt"', data.headers['Content-Disposition'])
+
+    def test_disposition_memoized(self):
+        first = FormData('repeated', 'a').headers['Content-Disposition']
+        second = FormData('repeated', 'b').headers['Content-Disposition']
+
+        self.assertIs(first, second)
+
     def test_construct_options(self):
         pass
 
@@ -0,0 +1,29 @@
+from tests import TestCase
+
+import subprocess
+import sys
+
+
+class TestImport(TestCase):
+    # Modules that should only be loaded once they are actually needed
+    lazy_modules = ['uuid', 'email.header', 'mimetypes', 're', 'collections', 'urllib.parse']
+
+    def _loaded_after(self, code):
+        script = 'import sys; before = set(sys.modules); {}; ' \
+                 'print(" ".join(sorted(set(sys.modules) - before)))'.format(code)
+
+        output = subprocess.check_output([sys.executable, '-S', '-c', script])
+
+        return output.decode('utf-8').split()
+
+    def test_import_is_lazy(self):
+        loaded = self._loaded_after('import poster')
+
+        for module in self.lazy_modules:
+            self.assertNotIn(module, loaded)
+
+    def test_build_form_is_lazy(self):
+        loaded = self._loaded_after('import poster; poster.Form().add_data("foo", "bar")')
+
+        for module in self.lazy_modules:
+            self.assertNotIn(module, loaded)
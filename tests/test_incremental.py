@@ -0,0 +1,94 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form, IncrementalForm
+from poster.streaminghttp import send
+from io import BytesIO
+
+import threading
+import time
+
+
+class TestIncrementalForm(TestCase):
+    def expected(self, form):
+        expected = Form(boundary=form.boundary)
+        expected.add_data('first', 'value')
+        expected.add_file('file', BytesIO(b'x' * 100000), filename='data.bin')
+        expected.add_many([('a', '1'), ('b', '2')])
+
+        return b''.join(expected.iter_encode())
+
+    def test_encodes_parts_as_they_are_added(self):
+        form = IncrementalForm()
+        form.add_data('first', 'value')
+
+        blocks = form.iter_encode()
+        body = b''
+
+        # The encoder sends what it has, then waits for more
+        for block in blocks:
+            if not block:
+                break
+
+            body += block
+
+        self.assertIn(b'name="first"', body)
+        self.assertIsNone(form.content_length)
+        self.assertRaises(ValueError, form.plan)
+
+        form.add_file('file', BytesIO(b'x' * 100000), filename='data.bin')
+        form.add_many([('a', '1'), ('b', '2')])
+        form.close()
+
+        body += b''.join(blocks)
+
+        self.assertEqual(self.expected(form), body)
+        self.assertEqual(len(body), form.content_length)
+
+    def test_closed_before_encoding(self):
+        with IncrementalForm() as form:
+            form.add_data('first', 'value')
+            form.add_file('file', BytesIO(b'x' * 100000), filename='data.bin')
+            form.add_many([('a', '1'), ('b', '2')])
+
+        self.assertEqual(self.expected(form), b''.join(form.iter_encode()))
+        self.assertIn('Content-Length', form.headers)
+
+    def test_add_after_close(self):
+        form = IncrementalForm()
+        form.close()
+
+        self.assertRaises(ValueError, form.add_data, 'foo', 'bar')
+        self.assertRaises(ValueError, form.add_many, [('foo', 'bar')])
+        self.assertEqual('--{}--'.format(form.boundary).encode('ascii'), b''.join(form.iter_encode()))
+
+    def test_timeout(self):
+        form = IncrementalForm(timeout=0.05)
+
+        self.assertRaises(IOError, b''.join, form.iter_encode())
+
+    def test_send_while_producing(self):
+        form = IncrementalForm()
+        progress = []
+
+        def produce():
+            form.add_data('first', 'value')
+            time.sleep(0.1)
+            form.add_file('file', BytesIO(b'x' * 100000), filename='data.bin')
+            time.sleep(0.1)
+            form.add_many([('a', '1'), ('b', '2')])
+            form.close()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        with RecordingServer() as server:
+            response = send(server.url, form, cb=lambda form, position, total: progress.append(position))
+
+        producer.join()
+        request = server.requests[0]
+
+        self.assertEqual(200, response.status)
+        self.assertEqual('chunked', request[2]['Transfer-Encoding'])
+        self.assertEqual(self.expected(form), request[3])
+        self.assertTrue(progress)
@@ -0,0 +1,134 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster.cli import main
+from poster.loadgen import (ASYNCIO, SinkServer, Report, Sample, parse_size, percentile, run, synthetic_forms,
+                            upload)
+
+import io
+
+
+class TestLoadgen(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(95, percentile(values, 95))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(7, percentile([7], 99))
+        self.assertIsNone(percentile([], 50))
+
+    def test_parse_size(self):
+        self.assertEqual(512, parse_size('512'))
+        self.assertEqual(64 * 1024, parse_size('64K'))
+        self.assertEqual(10 * 1024 ** 2, parse_size('10MB'))
+        self.assertEqual(1536 * 1024 ** 2, parse_size('1.5g'))
+        self.assertRaises(ValueError, parse_size, 'lots')
+        self.assertRaises(ValueError, parse_size, '-1K')
+        self.assertRaises(ValueError, parse_size, 'inf')
+
+    def test_threads(self):
+        with SinkServer() as sink:
+            report = run(sink.url, synthetic_forms(100000, files=2), concurrency=4, requests=20, duration=None)
+
+        self.assertEqual(20, report.count)
+        self.assertEqual(0, report.errors)
+        self.assertEqual(20, sink.uploads)
+        self.assertEqual(report.bytes, sink.received)
+        self.assertGreater(report.bytes, 20 * 200000)
+        self.assertTrue(all(0 < report.ttfb[p] <= report.latency[p] for p in (50, 95, 99)))
+        self.assertEqual(list(range(20)), [sample.index for sample in report.samples])
+
+    def test_asyncio(self):
+        with SinkServer() as sink:
+            report = run(sink.url, synthetic_forms(100000), concurrency=4, requests=12, duration=None, mode=ASYNCIO)
+
+        self.assertEqual(12, report.count)
+        self.assertEqual(0, report.errors, [sample.error for sample in report.samples])
+        self.assertEqual(report.bytes, sink.received)
+
+    def test_asyncio_no_content(self):
+        from tests.server import RecordingHandler
+
+        class NoContentHandler(RecordingHandler):
+            # Keeps the connection open after a response without a length
+            protocol_version = 'HTTP/1.1'
+
+            def handle_request(self):
+                self.read_body()
+                self.send_response(204)
+                self.end_headers()
+
+            do_POST = handle_request
+
+        with RecordingServer(handler=NoContentHandler) as server:
+            report = run(server.url, synthetic_forms(1000), requests=2, duration=None, mode=ASYNCIO, timeout=5)
+
+        self.assertEqual(0, report.errors, [sample.error for sample in report.samples])
+        self.assertEqual([204, 204], [sample.status for sample in report.samples])
+
+    def test_rate_and_duration(self):
+        with SinkServer() as sink:
+            report = run(sink.url, synthetic_forms(1000), concurrency=2, rate=40, duration=0.5)
+
+        # Uploads start every 25ms for half a second
+        self.assertEqual(20, report.count)
+        self.assertGreaterEqual(report.elapsed, 0.45)
+
+    def test_errors(self):
+        with SinkServer(status=503) as sink:
+            report = run(sink.url, synthetic_forms(1000), requests=3, duration=None)
+
+        self.assertEqual(3, report.errors)
+        self.assertEqual(1.0, report.error_rate)
+        self.assertIsNone(report.latency[50])
+        self.assertIn('p50 -', report.format())
+
+        sample = upload('http://127.0.0.1:1/', synthetic_forms(10)(0))
+
+        self.assertIsNotNone(sample.error)
+        self.assertFalse(sample.ok)
+
+    def test_upload_matches_send(self):
+        form = synthetic_forms(5000, fields=[('id', '1')])(0)
+
+        with RecordingServer() as server:
+            sample = upload(server.url, form, headers={'X-Test': 'yes'})
+
+        self.assertTrue(sample.ok)
+        self.assertEqual(b''.join(form.iter_encode()), server.requests[0][3])
+        self.assertEqual('yes', server.requests[0][2]['X-Test'])
+
+    def test_report(self):
+        samples = [Sample(i, 0) for i in range(4)]
+
+        for i, sample in enumerate(samples):
+            sample.status, sample.sent, sample.ttfb, sample.latency = 200, 1000, 0.01 * i, 0.02 * i
+
+        samples[3].status = 500
+
+        report = Report(samples, 2.0)
+
+        self.assertEqual(0.25, report.error_rate)
+        self.assertEqual(1500, report.throughput)
+        self.assertEqual(2.0, report.rate)
+        self.assertEqual(0.04, report.latency[99])
+
+    def test_cli(self):
+        out, err = io.StringIO(), io.StringIO()
+
+        status = main(['loadgen', '--sink', '-n', '5', '-c', '2', '--size', '64K', '--mode', 'asyncio'],
+                      out=out, err=err)
+
+        self.assertEqual(0, status, err.getvalue())
+        self.assertIn('uploads:     5 ', out.getvalue())
+        self.assertIn('p99', out.getvalue())
+
+    def test_cli_negative_size(self):
+        out, err = io.StringIO(), io.StringIO()
+
+        self.assertRaises(SystemExit, main, ['loadgen', '--sink', '-n', '1', '--size', '-10'], out=out, err=err)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, run, 'http://localhost/', synthetic_forms(10), duration=None)
+        self.assertRaises(ValueError, run, 'http://localhost/', synthetic_forms(10), mode='processes')
@@ -0,0 +1,170 @@
+from tests import TestCase
+
+from poster import Form, FormSpec
+from poster.prepare import PartSpec, prepare_part
+from poster.sources import FileRangeSource
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import mkdtemp
+
+import gzip
+import hashlib
+import os
+import pickle
+import shutil
+
+
+class TestFormSpec(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.content = b''.join(b'line %d\n' % i for i in range(20000))
+        self.path = os.path.join(self.directory, 'data.log')
+
+        with open(self.path, 'wb') as fh:
+            fh.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def build_spec(self):
+        spec = FormSpec(boundary='spec')
+        spec.add_data('id', '1234')
+        spec.add_file('log', self.path, compress='gzip', digest='sha256')
+        spec.add_file('head', self.path, offset=5, length=100, digest='md5')
+        spec.add_file('plain', self.path, mime_type='text/plain')
+
+        return spec
+
+    def test_picklable(self):
+        spec = pickle.loads(pickle.dumps(self.build_spec()))
+
+        self.assertEqual(['id', 'log', 'head', 'plain'], [part.name for part in spec.fields])
+        self.assertEqual('gzip', spec.fields[1].compress)
+
+    def test_prepare_processes(self):
+        prepared = self.build_spec().prepare(directory=self.directory, processes=2)
+
+        try:
+            self.assertIsNone(prepared.parts[0])
+            self.assertIsNone(prepared.parts[3])
+
+            log = prepared.parts[1]
+
+            with open(log.spool, 'rb') as fh:
+                compressed = fh.read()
+
+            self.assertEqual(self.content, gzip.decompress(compressed))
+            self.assertEqual(len(compressed), log.size)
+            self.assertEqual(hashlib.sha256(compressed).hexdigest(), log.digest)
+
+            head = prepared.parts[2]
+
+            self.assertIsNone(head.spool)
+            self.assertEqual(hashlib.md5(self.content[5:105]).hexdigest(), head.digest)
+
+            body = b''.join(prepared.iter_encode())
+
+            self.assertEqual(prepared.content_length, len(body))
+            self.assertIn(b'filename="data.log.gz"', body)
+            self.assertIn(compressed, body)
+            self.assertIn(b'\r\n\r\n' + self.content[5:105] + b'\r\n--spec', body)
+            self.assertIn(b'name="log.sha256"', body)
+            self.assertIn(b'\r\n\r\n' + log.digest.encode('ascii') + b'\r\n--spec', body)
+            self.assertIn(b'\r\n\r\n' + head.digest.encode('ascii') + b'\r\n--spec', body)
+            self.assertIn(b'\r\n\r\n' + self.content + b'\r\n--spec--', body)
+        finally:
+            prepared.remove()
+
+        self.assertFalse(os.path.exists(log.spool))
+
+    def test_prepare_executor(self):
+        with ThreadPoolExecutor(2) as executor:
+            prepared = self.build_spec().prepare(directory=self.directory, executor=executor)
+
+        expected = Form(boundary='spec')
+        expected.add_data('id', '1234')
+        expected.add_file('log', FileRangeSource(prepared.parts[1].spool), filename='data.log.gz')
+        expected.add_data('log.sha256', prepared.parts[1].digest)
+        expected.add_file('head', FileRangeSource(self.path, 5, 100), filename='data.log')
+        expected.add_data('head.md5', prepared.parts[2].digest)
+        expected.add_file('plain', self.path, filename='data.log', mime_type='text/plain')
+
+        self.assertEqual(b''.join(expected.iter_encode()), b''.join(prepared.iter_encode()))
+
+    def test_build_without_work(self):
+        form = self.build_spec().build()
+
+        self.assertEqual(4, len(form.data))
+        self.assertEqual(len(self.content), form.data[1].filesize)
+        self.assertEqual(100, form.data[2].filesize)
+
+    def test_from_form(self):
+        form = Form(boundary='spec')
+        form.add_data('id', '1234')
+        form.add_file('log', self.path)
+
+        spec = FormSpec.from_form(form)
+
+        self.assertEqual(b''.join(form.iter_encode()), b''.join(spec.build().iter_encode()))
+
+    def test_from_form_boundary(self):
+        form = Form(boundary='per render')
+        form.add_data('id', '1234')
+
+        spec = FormSpec.from_form(form)
+
+        self.assertEqual(form.boundary, spec.build().boundary)
+
+    def test_remove_temporary_directory(self):
+        with ThreadPoolExecutor(1) as executor:
+            prepared = self.build_spec().prepare(executor=executor)
+
+        directory = prepared.directory
+
+        self.assertTrue(os.path.isdir(directory))
+
+        prepared.remove()
+
+        self.assertFalse(os.path.exists(directory))
+
+        # A directory that was passed in is left alone
+        with ThreadPoolExecutor(1) as executor:
+            prepared = self.build_spec().prepare(directory=self.directory, executor=executor)
+
+        prepared.remove()
+
+        self.assertIsNone(prepared.directory)
+        self.assertTrue(os.path.isfile(self.path))
+
+    def test_from_form_with_handle(self):
+        form = Form()
+
+        with open(self.path, 'rb') as fh:
+            form.add_file('log', fh)
+
+            self.assertRaises(ValueError, FormSpec.from_form, form)
+
+    def test_invalid(self):
+        spec = FormSpec()
+
+        self.assertRaises(IOError, spec.add_file, 'log', os.path.join(self.directory, 'missing'))
+        self.assertRaises(ValueError, spec.add_file, 'log', self.path, compress='rar')
+        self.assertRaises(ValueError, spec.add_file, 'log', self.path, digest='nope')
+
+    def test_short_range(self):
+        part = PartSpec('log', path=self.path, offset=len(self.content) - 10, length=20, digest='md5')
+
+        self.assertRaises(IOError, prepare_part, part, None)
+
+    def test_other_compressors(self):
+        import bz2
+        import lzma
+
+        for name, module in [('bz2', bz2), ('xz', lzma)]:
+            part = PartSpec('log', path=self.path, compress=name)
+            spool = os.path.join(self.directory, name)
+            prepared = prepare_part(part, spool)
+
+            self.assertEqual(os.path.getsize(spool), prepared.size)
+
+            with open(spool, 'rb') as fh:
+                self.assertEqual(self.content, module.decompress(fh.read()))
@@ -0,0 +1,101 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form
+from poster.readahead import ReadAhead
+from poster.sources import ContentSource
+from poster.streaminghttp import send
+
+import io
+import threading
+import time
+
+
+class Broken(ContentSource):
+    name = 'broken.bin'
+    size = 10
+
+    def open(self):
+        raise IOError('disk on fire')
+
+
+class Tracked(ContentSource):
+    name = 'tracked.bin'
+    size = 100000
+
+    def __init__(self):
+        self.closed = []
+
+    def open(self):
+        fh = io.BytesIO(b'x' * self.size)
+        self.closed.append(fh)
+
+        return fh
+
+
+class TestReadAhead(TestCase):
+    def build_form(self):
+        form = Form()
+        form.add_data('foo', 'bar')
+        form.add_file('file', io.BytesIO(b'x' * 10000), filename='x.bin')
+
+        return form
+
+    def test_same_output(self):
+        form = self.build_form()
+        reader = ReadAhead(form, depth=2, chunk_size=100)
+
+        self.assertEqual(b''.join(form.iter_encode()), b''.join(reader.iter_encode()))
+        self.assertEqual(form.content_length, reader.content_length)
+        self.assertEqual(form.content_type, reader.content_type)
+        self.assertEqual(len(list(form.iter_encode(chunk_size=100))), reader.stats()['chunks'])
+
+    def test_slow_sender(self):
+        reader = ReadAhead(self.build_form(), depth=1, chunk_size=1000)
+
+        for block in reader.iter_encode():
+            time.sleep(0.01)
+
+        self.assertGreater(reader.stats()['reader_stalls'], 0)
+        self.assertGreater(reader.stats()['reader_stall_time'], 0)
+
+    def test_error(self):
+        form = Form()
+        form.add_file('file', Broken())
+
+        self.assertRaises(IOError, b''.join, ReadAhead(form).iter_encode())
+
+    def test_stop_early(self):
+        before = threading.active_count()
+        blocks = ReadAhead(self.build_form(), depth=1, chunk_size=10).iter_encode()
+
+        next(blocks)
+        blocks.close()
+
+        self.assertEqual(before, threading.active_count())
+
+    def test_stop_early_closes_sources(self):
+        source = Tracked()
+        form = Form()
+        form.add_file('file', source)
+
+        blocks = ReadAhead(form, depth=1, chunk_size=10).iter_encode()
+
+        next(blocks)
+        blocks.close()
+
+        self.assertEqual(1, len(source.closed))
+        self.assertTrue(source.closed[0].closed)
+
+    def test_invalid_depth(self):
+        self.assertRaises(ValueError, ReadAhead, Form(), depth=0)
+
+    def test_send(self):
+        form = self.build_form()
+
+        with RecordingServer() as server:
+            response = send(server.url, ReadAhead(form, chunk_size=1000))
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(b''.join(form.iter_encode()), server.requests[0][3])
+        self.assertEqual(str(form.content_length), server.requests[0][2]['Content-Length'])
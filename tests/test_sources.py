@@ -0,0 +1,114 @@
+from tests import TestCase
+
+from poster import Form, FormData, cache
+from poster.sources import ContentSource, FileSource
+
+import os
+import shutil
+import tempfile
+
+
+def open_files():
+    return len(os.listdir('/proc/self/fd'))
+
+
+class TestFileSource(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+
+        for i in range(200):
+            path = os.path.join(self.directory, 'file{}.txt'.format(i))
+
+            with open(path, 'wb') as fh:
+                fh.write('content {}'.format(i).encode('utf-8'))
+
+            self.paths.append(path)
+
+    def tearDown(self):
+        cache.disable()
+        shutil.rmtree(self.directory)
+
+    def test_add_file_path(self):
+        with open(self.paths[0], 'rb') as fh:
+            expected = Form(boundary='lazy')
+            expected.add_file('file', fh)
+
+            form = Form(boundary='lazy')
+            data = form.add_file('file', self.paths[0])
+
+            self.assertIsInstance(data.file, FileSource)
+            self.assertEqual(expected.encode(), form.encode())
+
+    def test_add_file_missing_path(self):
+        self.assertRaises(IOError, Form().add_file, 'file', os.path.join(self.directory, 'missing'))
+
+    def test_constant_file_descriptors(self):
+        if not os.path.isdir('/proc/self/fd'):
+            self.skipTest('Requires /proc/self/fd')
+
+        before = open_files()
+        form = Form()
+
+        for path in self.paths:
+            form.add_file('files[]', path)
+
+        self.assertEqual(before, open_files())
+
+        counts = []
+
+        for block in form.iter_encode():
+            counts.append(open_files())
+
+        # At most the one file that is being read is open
+        self.assertLessEqual(max(counts), before + 1)
+        self.assertEqual(before, open_files())
+
+    def test_abandoned_encode_closes_file(self):
+        form = Form()
+        form.add_file('file', self.paths[0])
+
+        blocks = form.iter_encode(chunk_size=1)
+        next(blocks)
+        next(blocks)
+        blocks.close()
+
+        if os.path.isdir('/proc/self/fd'):
+            targets = []
+
+            for fd in os.listdir('/proc/self/fd'):
+                try:
+                    targets.append(os.readlink('/proc/self/fd/' + fd))
+                except OSError:
+                    # The descriptor used to list the directory is already closed
+                    pass
+
+            self.assertNotIn(os.path.realpath(self.paths[0]), targets)
+
+    def test_cached_source(self):
+        part_cache = cache.configure(max_payload_size=1024)
+
+        FormData('file', FileSource(self.paths[0]))
+        data = FormData('file', FileSource(self.paths[0]))
+
+        self.assertEqual(1, part_cache.hits)
+        self.assertEqual(b'content 0', data.payload)
+
+    def test_custom_source(self):
+        class Repeated(ContentSource):
+            name = 'repeated.bin'
+            size = 10
+
+            def open(self):
+                import io
+
+                return io.BytesIO(b'x' * 10)
+
+        form = Form(boundary='source')
+        form.add_file('file', Repeated())
+
+        content = form.encode()[0]
+
+        self.assertIn('filename="repeated.bin"\r\nContent-Type: application/octet-stream\r\n\r\nxxxxxxxxxx\r\n',
+                      content)
+        self.assertEqual(len(content), form.content_length)
@@ -0,0 +1,113 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form, SpooledForm
+from poster.streaminghttp import send
+
+import os
+import shutil
+import tempfile
+
+
+class TestSpooledForm(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'form.bin')
+
+        self.file = tempfile.NamedTemporaryFile()
+        self.file.write(b'spooled content' * 1000)
+        self.file.flush()
+
+        self.form = Form()
+        self.form.add_data('foo', 'bar')
+        self.form.add_file('file', self.file, filename='file.txt')
+
+    def tearDown(self):
+        self.file.close()
+        shutil.rmtree(self.directory)
+
+    def test_spool(self):
+        spooled = self.form.spool(self.path)
+        content, headers = self.form.encode()
+
+        self.assertIsInstance(spooled, SpooledForm)
+        self.assertEqual(self.form.boundary, spooled.boundary)
+        self.assertEqual(len(content), spooled.content_length)
+        self.assertEqual(headers, spooled.headers)
+        self.assertEqual((content, headers), spooled.encode())
+
+        # The metadata can be loaded again by another process
+        loaded = SpooledForm(self.path)
+
+        self.assertEqual(content.encode('utf-8'), b''.join(loaded.iter_encode(chunk_size=100)))
+
+    def test_truncated(self):
+        self.form.spool(self.path)
+
+        with open(self.path, 'ab') as fh:
+            fh.write(b'extra')
+
+        self.assertRaises(ValueError, SpooledForm, self.path)
+
+    def test_remove(self):
+        self.form.spool(self.path).remove()
+
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_send_many(self):
+        spooled = self.form.spool(self.path)
+        calls = []
+
+        with RecordingServer() as server:
+            send(server.url, spooled)
+            send(server.url, spooled, cb=lambda *args: calls.append(args), chunk_size=1000)
+
+        expected = self.form.encode()[0].encode('utf-8')
+
+        for _, _, headers, body in server.requests:
+            self.assertEqual(expected, body)
+            self.assertEqual(str(len(expected)), headers['Content-Length'])
+            self.assertNotIn('Transfer-Encoding', headers)
+
+        self.assertEqual(len(expected), calls[-1][1])
+
+    def test_send_without_sendfile(self):
+        import socket
+
+        from poster.streaminghttp import _send_file
+
+        class PlainSocket(object):
+            """ A socket that can't sendfile() """
+
+            def __init__(self, sock):
+                self.sendall = sock.sendall
+
+        class Connection(object):
+            pass
+
+        spooled = self.form.spool(self.path)
+        left, right = socket.socketpair()
+        calls = []
+
+        try:
+            connection = Connection()
+            connection.sock = PlainSocket(left)
+
+            _send_file(connection, spooled, spooled.content_length, lambda *args: calls.append(args), 1000)
+            left.close()
+
+            received = b''
+
+            while True:
+                block = right.recv(65536)
+
+                if not block:
+                    break
+
+                received += block
+        finally:
+            left.close()
+            right.close()
+
+        self.assertEqual(self.form.encode()[0].encode('utf-8'), received)
+        self.assertEqual(spooled.content_length, calls[-1][1])
@@ -0,0 +1,216 @@
+from tests import TestCase
+from tests.server import ContinueHandler, RecordingServer
+
+from poster import Form
+from poster.streaminghttp import Writer, send
+from tempfile import NamedTemporaryFile
+
+
+class TestSend(TestCase):
+    def test_send(self):
+        with NamedTemporaryFile() as f:
+            f.write(b'hello, world' * 1000)
+            f.flush()
+
+            form = Form()
+            form.add_data('foo', 'bar')
+            form.add_file('file', f, filename='hello.txt')
+
+            expected, headers = form.encode()
+
+            with RecordingServer() as server:
+                response = send(server.url, form, chunk_size=100)
+
+        self.assertEqual(200, response.status)
+        self.assertTrue(response.ok)
+
+        method, path, request_headers, body = server.requests[0]
+
+        self.assertEqual('POST', method)
+        self.assertEqual('/upload', path)
+        self.assertEqual(headers['Content-Type'], request_headers['Content-Type'])
+        self.assertEqual(headers['Content-Length'], request_headers['Content-Length'])
+        self.assertNotIn('Transfer-Encoding', request_headers)
+        self.assertEqual(expected.encode('utf-8'), body)
+
+    def test_send_progress(self):
+        calls = []
+
+        form = Form()
+        form.add_data('foo', 'bar')
+
+        with RecordingServer() as server:
+            send(server.url, form, cb=lambda *args: calls.append(args))
+
+        self.assertEqual(len(server.requests[0][3]), calls[-1][1])
+        self.assertEqual(form.content_length, calls[-1][2])
+
+    def test_send_invalid_scheme(self):
+        self.assertRaises(ValueError, send, 'ftp://localhost/', Form())
+
+
+class FakeSocket(object):
+    def __init__(self, limit=None):
+        """
+        Records what was sent, sending at most ``limit`` bytes per sendmsg()
+        """
+
+        self.limit = limit
+        self.data = b''
+        self.calls = []
+
+    def sendmsg(self, blocks):
+        if len(blocks) > 1024:
+            raise OSError(90, 'Message too long')
+
+        data = b''.join(bytes(b) for b in blocks)[:self.limit]
+
+        self.calls.append(len(blocks))
+        self.data += data
+
+        return len(data)
+
+
+class FakeSSLSocket(FakeSocket):
+    def sendmsg(self, blocks):
+        raise NotImplementedError
+
+    def sendall(self, data):
+        self.calls.append(1)
+        self.data += data
+
+
+class TestWriter(TestCase):
+    def test_coalesce(self):
+        sock = FakeSocket()
+        writer = Writer(sock, coalesce=10)
+
+        writer.write(b'abc', b'def')
+        writer.write(b'ghijk')
+        writer.write(b'l')
+        writer.flush()
+
+        self.assertEqual(b'abcdefghijkl', sock.data)
+        self.assertEqual([3, 1], sock.calls)
+        self.assertEqual(2, writer.writes)
+
+    def test_partial_sends(self):
+        sock = FakeSocket(limit=4)
+        writer = Writer(sock, coalesce=100)
+
+        writer.write(b'abc', b'defgh', b'', b'ij')
+        writer.flush()
+
+        self.assertEqual(b'abcdefghij', sock.data)
+        self.assertEqual(3, writer.writes)
+
+    def test_no_sendmsg(self):
+        sock = FakeSSLSocket()
+        writer = Writer(sock, coalesce=100)
+
+        writer.write(b'abc', b'def')
+        writer.flush()
+
+        self.assertEqual(b'abcdef', sock.data)
+        self.assertEqual(1, writer.writes)
+
+    def test_small_fields_batched(self):
+        form = Form()
+
+        for i in range(1000):
+            form.add_data('field{}'.format(i), str(i))
+
+        sock = FakeSocket()
+        writer = Writer(sock)
+
+        for block in form.iter_encode():
+            writer.write(block)
+
+        writer.flush()
+
+        self.assertEqual(b''.join(form.iter_encode()), sock.data)
+        self.assertLess(writer.writes, 10)
+
+    def test_max_blocks(self):
+        sock = FakeSocket()
+        writer = Writer(sock, coalesce=100)
+        writer.max_blocks = 4
+
+        writer.write(b'a', b'b', b'c')
+        writer.write(b'd', b'e', b'f')
+        writer.write(*[b'g'] * 6)
+        writer.flush()
+
+        self.assertEqual(b'abcdefgggggg', sock.data)
+        self.assertTrue(all(calls <= 4 for calls in sock.calls))
+
+    def test_send_chunked_many_fields(self):
+        from poster.sources import CommandSource
+
+        form = Form()
+
+        # Every chunk is written as three blocks, the size line, the data and
+        # its line break, more than sendmsg() takes in one call in total
+        for i in range(400):
+            form.add_data('field{}'.format(i), str(i))
+
+        form.add_file('output', CommandSource(['echo', 'hi']), filename='out.txt')
+
+        with RecordingServer() as server:
+            response = send(server.url, form)
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(b''.join(form.iter_encode()), server.requests[0][3])
+
+    def test_send_coalesced(self):
+        form = Form()
+
+        for i in range(100):
+            form.add_data('field{}'.format(i), str(i))
+
+        with RecordingServer() as server:
+            send(server.url, form)
+            send(server.url, form, coalesce=0)
+
+        for request in server.requests:
+            self.assertEqual(b''.join(form.iter_encode()), request[3])
+
+
+class TestExpectContinue(TestCase):
+    def build_form(self):
+        form = Form()
+        form.add_data('foo', 'bar' * 1000)
+
+        return form
+
+    def test_continue(self):
+        form = self.build_form()
+
+        with RecordingServer(handler=ContinueHandler) as server:
+            response = send(server.url, form, expect_continue=True)
+
+        self.assertEqual(200, response.status)
+        self.assertEqual('100-continue', server.requests[0][2]['Expect'])
+        self.assertEqual(b''.join(form.iter_encode()), server.requests[0][3])
+
+    def test_rejected(self):
+        with RecordingServer(handler=ContinueHandler) as server:
+            server.server.max_length = 100
+            server.server.rejected = []
+
+            response = send(server.url, self.build_form(), expect_continue=True)
+
+        self.assertEqual(413, response.status)
+        self.assertEqual(b'', response.body)
+        self.assertEqual([], server.requests)
+        self.assertEqual(1, len(server.server.rejected))
+
+    def test_server_ignores_expect(self):
+        form = self.build_form()
+
+        # An HTTP/1.0 server never answers, so the body is sent after the timeout
+        with RecordingServer() as server:
+            response = send(server.url, form, expect_continue=True, continue_timeout=0.05)
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(b''.join(form.iter_encode()), server.requests[0][3])
@@ -0,0 +1,87 @@
+from tests import TestCase
+from tests.server import RecordingServer
+
+from poster import Form
+from poster.streaminghttp import send
+from poster.synthetic import PatternSource, RandomSource, Verifier, ZeroSource
+
+import zlib
+
+
+class TestSyntheticSources(TestCase):
+    def read(self, source, size=-1):
+        blocks = []
+
+        with source.open() as fh:
+            while True:
+                block = fh.read(size)
+
+                if not len(block):
+                    return b''.join(blocks)
+
+                blocks.append(bytes(block))
+
+    def test_pattern(self):
+        source = PatternSource(100001, b'abc')
+
+        self.assertEqual(b'abc' * 33333 + b'ab', self.read(source, 4096))
+        self.assertEqual(b'cab', source.content(2, 3))
+
+    def test_zeros(self):
+        self.assertEqual(b'\0' * 3000000, self.read(ZeroSource(3000000), 10 ** 7))
+
+    def test_random(self):
+        size = 5 * 1024 * 1024 + 17
+        content = self.read(RandomSource(size, seed=7), 10000)
+
+        self.assertEqual(size, len(content))
+        self.assertEqual(content, self.read(RandomSource(size, seed=7)))
+        self.assertEqual(content[123456:234567], RandomSource(size, seed=7).content(123456, 111111))
+        self.assertNotEqual(content, self.read(RandomSource(size, seed=8)))
+
+        # It doesn't compress
+        self.assertGreater(len(zlib.compress(content[:1024 * 1024])), 1024 * 1024)
+
+    def test_verifier(self):
+        source = RandomSource(1000000, seed=3)
+        content = self.read(source)
+
+        verifier = Verifier(RandomSource(1000000, seed=3))
+
+        for position in range(0, len(content), 7777):
+            verifier.update(content[position:position + 7777])
+
+        verifier.finish()
+
+        with self.assertRaises(ValueError) as context:
+            Verifier(source).update(content[:500] + b'?' + content[501:9000])
+
+        self.assertIn('Byte 500 ', str(context.exception))
+
+        short = Verifier(source)
+        short.update(content[:10])
+
+        self.assertRaises(ValueError, short.finish)
+        self.assertRaises(ValueError, source.verify, b'xx', 999999)
+
+    def test_form(self):
+        form = Form()
+        form.add_file('random', RandomSource(3 * 1024 * 1024, seed=1))
+        form.add_file('pattern', PatternSource(1000, b'0123456789'), filename='digits.txt')
+
+        with RecordingServer() as server:
+            response = send(server.url, form)
+
+        body = server.requests[0][3]
+
+        self.assertEqual(200, response.status)
+        self.assertEqual(form.content_length, len(body))
+
+        payload = body.split(b'filename="random.bin"', 1)[1].split(b'\r\n\r\n', 1)[1][:3 * 1024 * 1024]
+
+        RandomSource(3 * 1024 * 1024, seed=1).verify(payload)
+        self.assertIn(b'0123456789' * 100 + b'\r\n--', body)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, PatternSource, 10, b'')
+        self.assertRaises(ValueError, ZeroSource, -1)
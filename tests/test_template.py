@@ -0,0 +1,88 @@
+from tests import TestCase
+
+from poster import Form, FormData, FormTemplate
+from tempfile import NamedTemporaryFile
+
+
+class TestFormTemplate(TestCase):
+    def build_form(self, boundary, user, payload):
+        form = Form(boundary=boundary)
+        form.add_data('user', user)
+        form.add_data('type', 'event')
+        form.add_data('payload', payload)
+
+        return form
+
+    def test_render(self):
+        template = FormTemplate(['user', ('type', 'event'), 'payload'], boundary='fixed')
+
+        body, headers = template.render(user='1', payload=u'{"a": "☃"}')
+        content, expected_headers = self.build_form('fixed', '1', u'{"a": "☃"}').encode()
+
+        self.assertEqual(content.encode('utf-8'), body)
+        self.assertEqual(expected_headers['Content-Type'], headers['Content-Type'])
+        self.assertEqual(str(len(body)), headers['Content-Length'])
+
+    def test_render_many(self):
+        template = FormTemplate(['user', ('type', 'event'), 'payload'])
+
+        for i in range(3):
+            body, _ = template.render({'user': str(i), 'payload': 'p' * (i + 1)})
+            content, _ = self.build_form(template.boundary, str(i), 'p' * (i + 1)).encode()
+
+            self.assertEqual(content.encode('utf-8'), body)
+
+    def test_render_boundary(self):
+        template = FormTemplate(['user', ('type', 'event'), 'payload'], boundary='fixed')
+
+        body, headers = template.render(user='1', payload='2', boundary='per render')
+        content, expected_headers = self.build_form('per render', '1', '2').encode()
+
+        self.assertEqual(content.encode('utf-8'), body)
+        self.assertEqual(expected_headers['Content-Type'], headers['Content-Type'])
+
+    def test_static_form_data(self):
+        with NamedTemporaryFile(suffix='.txt') as f:
+            f.write(b'static file')
+            f.flush()
+
+            template = FormTemplate([FormData('file', f, filename='a.txt'), 'user'], boundary='fixed')
+
+            form = Form(boundary='fixed')
+            form.add_file('file', f, filename='a.txt')
+            form.add_data('user', 'me')
+
+            self.assertEqual(form.encode()[0].encode('utf-8'), template.render(user='me')[0])
+
+    def test_static_form_data_unchanged(self):
+        data = FormData('static', 'value')
+        form = Form([data], boundary='original')
+        body = form.encode()[0]
+
+        FormTemplate([data, 'user'], boundary='fixed')
+
+        self.assertIsNone(data.boundary)
+        self.assertEqual(body, form.encode()[0])
+
+    def test_render_bytes(self):
+        body, headers = FormTemplate(['user']).render(user='me')
+
+        self.assertIsInstance(body, bytes)
+        self.assertEqual(str(len(body)), headers['Content-Length'])
+
+    def test_render_form(self):
+        rendered = FormTemplate(['user'], boundary='fixed').render_form(user='me')
+
+        self.assertEqual(rendered.content_length, len(b''.join(rendered.iter_encode())))
+        self.assertEqual('multipart/form-data; boundary=--fixed', rendered.content_type)
+
+    def test_invalid_values(self):
+        template = FormTemplate(['user', 'payload'])
+
+        self.assertRaises(ValueError, template.render, user='1')
+        self.assertRaises(ValueError, template.render, user='1', payload='2', other='3')
+        self.assertRaises(ValueError, template.render, user='1', payload=2)
+
+    def test_invalid_fields(self):
+        self.assertRaises(ValueError, FormTemplate, [123])
+        self.assertRaises(ValueError, FormTemplate, ['user', 'user'])
@@ -0,0 +1,101 @@
+from tests import TestCase
+
+from poster import Form, FieldTable, urlencoded
+from io import BytesIO
+
+try:  # pragma: no cover
+    from urllib import urlencode
+except ImportError:  # pragma: no cover
+    from urllib.parse import urlencode
+
+
+class TestUrlencoded(TestCase):
+    def build_form(self, **kwargs):
+        form = Form(**kwargs)
+        form.add_data('foo', 'bar')
+        form.add_data('q', 'a b&c=d/é')
+        form.add_field_table(FieldTable([('id[]', '1'), ('id[]', '2')]))
+        form.add_data('ü', '~ok_.-')
+
+        return form
+
+    def expected(self):
+        pairs = [('foo', 'bar'), ('q', 'a b&c=d/é'), ('id[]', '1'), ('id[]', '2'), ('ü', '~ok_.-')]
+
+        return urlencode(pairs).encode('ascii')
+
+    def test_quote(self):
+        for value in ['', 'abc', 'a b', 'a+b', 'é中', '~_.-', '%&=/?', '\x00\x01%00+ ']:
+            encoded = value.encode('utf-8')
+
+            self.assertEqual(urlencode([('', value)])[1:].encode('ascii'), urlencoded.quote(encoded))
+            self.assertEqual(len(urlencoded.quote(encoded)), urlencoded.quoted_length(encoded))
+
+    def test_encode_fields(self):
+        fields = [(b'a b', b'%+&'), (b'\x00', b'\x01\x01'), (b'k', b'')]
+        expected = urlencode([(k.decode('ascii'), v.decode('ascii')) for k, v in fields]).encode('ascii')
+
+        # The markers used to escape all of the fields at once fall back to
+        # escaping each of them on its own
+        self.assertEqual(expected, b'&'.join(urlencoded.encode_fields(fields)))
+        self.assertEqual([b'a+b=%25%2B%26', b'k='], urlencoded.encode_fields([fields[0], fields[2]]))
+        self.assertEqual(len(expected), urlencoded.fields_length(fields))
+
+    def test_urlencoded(self):
+        form = self.build_form(encoding='urlencoded')
+
+        self.assertTrue(form.urlencoded)
+        self.assertEqual('application/x-www-form-urlencoded', form.content_type)
+        self.assertEqual(self.expected(), b''.join(form.iter_encode()))
+        self.assertEqual(len(self.expected()), form.content_length)
+        self.assertEqual(str(len(self.expected())), form.headers['Content-Length'])
+
+        content, headers = form.encode()
+
+        self.assertEqual(self.expected().decode('ascii'), content)
+
+    def test_multipart_by_default(self):
+        form = self.build_form()
+
+        self.assertFalse(form.urlencoded)
+        self.assertTrue(form.content_type.startswith('multipart/form-data'))
+
+    def test_auto(self):
+        form = self.build_form(encoding='auto')
+
+        self.assertTrue(form.urlencoded)
+        self.assertEqual(self.expected(), b''.join(form.iter_encode()))
+
+        form.add_file('file', BytesIO(b'data'), filename='data.bin')
+
+        self.assertFalse(form.urlencoded)
+        self.assertEqual(form.content_length, len(b''.join(form.iter_encode())))
+
+    def test_urlencoded_with_files(self):
+        form = self.build_form(encoding='urlencoded')
+        form.add_file('file', BytesIO(b'data'), filename='data.bin')
+
+        self.assertRaises(ValueError, lambda: form.content_type)
+        self.assertRaises(ValueError, form.plan)
+
+    def test_invalid_encoding(self):
+        self.assertRaises(ValueError, Form, encoding='json')
+
+    def test_empty(self):
+        form = Form(encoding='urlencoded')
+
+        self.assertEqual(0, form.content_length)
+        self.assertEqual(b'', b''.join(form.iter_encode()))
+
+    def test_callback(self):
+        form = self.build_form(encoding='urlencoded')
+        calls = []
+
+        body = b''.join(form.iter_encode(cb=lambda field, position, total: calls.append((field, position, total))))
+
+        self.assertEqual(self.expected(), body)
+        # Tables report every row, as a FormData object
+        self.assertEqual([('foo', 'bar'), ('q', 'a b&c=d/é'), ('id[]', '1'), ('id[]', '2'), ('ü', '~ok_.-')],
+                         [(field.name, field.content) for field, _, _ in calls])
+        self.assertEqual(form.data[:2], [field for field, _, _ in calls[:2]])
+        self.assertEqual((len(body), len(body)), calls[-1][1:])